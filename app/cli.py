@@ -1,6 +1,13 @@
 from app import commands
+from app.dates import parse_date
+from app.db import pool_stats
+from app.filters import FilterError, parse_filter_args
+from app.money import Money
+from app.profiler import profiler
+from app.slowlog import slow_log
+from config.config import LISTING_CONFIG
+import glob
 import shlex
-from datetime import datetime
 
 # Add a helper function to check login status
 def check_login():
@@ -9,9 +16,172 @@ def check_login():
         return False
     return True
 
+# Reports and listings return a Result, or False after printing an error.
+# True if there was a Result to render, even an empty one.
+def show(result):
+    if result is False or result is None:
+        return False
+    result.render()
+    return True
+
+# The last paged listing, continued by the next/prev commands
+last_listing = {'fetch': None, 'page': None}
+
+# Pops --page-size=<N> / --all from parsed filters. Returns the page size,
+# None for everything, or False (after printing why) if it is invalid.
+def page_size_option(filters):
+    show_all = filters.pop('all', None) is not None
+    page_size = filters.pop('page_size', None)
+    if show_all:
+        return None
+    if page_size is None:
+        return LISTING_CONFIG['page_size']
+    if not page_size.isdigit() or int(page_size) < 1:
+        print("Error: --page-size must be a positive number")
+        return False
+    return int(page_size)
+
+# Splits listing arguments into filters (see app.filters) and the page size
+# of page_size_option(). The page size is False if anything is invalid.
+def listing_options(args):
+    options = {}
+    filter_args = []
+    for arg in args:
+        if arg == "--all":
+            options['all'] = True
+        elif arg.startswith("--page-size="):
+            options['page_size'] = arg.split("=", 1)[1]
+        else:
+            filter_args.append(arg)
+    filters = filter_options(filter_args)
+    if filters is None:
+        return None, False
+    return filters, page_size_option(options)
+
+# Filters from --flag=value arguments, or None after printing why not
+def filter_options(args):
+    try:
+        return parse_filter_args(args)
+    except FilterError as e:
+        print(f"Error: {e}")
+        return None
+
+# Shows the first page of a listing and remembers it for next/prev.
+# fetch(cursor) returns a Page, or False after printing an error.
+def show_paged(fetch):
+    page = fetch(None)
+    if page:
+        last_listing.update(fetch=fetch, page=page)
+    return show(page)
+
 # Modify the main_cli function's loop:
 
 
+# The commands below also serve app.script, which needs to know whether
+# they succeeded and, with quiet=True, skips their confirmation messages
+def login_command(parts, quiet=False):
+    if len(parts) != 3:
+        print("Usage: login <username> <password>")
+        return False
+    if not commands.login(parts[1], parts[2]):
+        print("Invalid credentials")
+        return False
+    if not quiet:
+        print("Login successful")
+    return True
+
+def add_expense_command(parts, quiet=False):
+    if not check_login():
+        return False
+
+    if len(parts) < 6:
+        print("Usage: add_expense <amount> <category> <payment_method> <YYYY-MM-DD> <description> [tags]")
+        return False
+    try:
+        # Money.parse is exact to the paisa; float() is not
+        amount = Money.parse(parts[1])
+        if amount <= 0:
+            print("Amount must be greater than 0")
+            return False
+        category = parts[2].strip().lower()
+        payment_method = parts[3].strip().lower()
+        date = parse_date(parts[4])
+        description = parts[5]
+        tags = []
+
+        if len(parts) > 6:
+            tags = [tag.strip() for tag in parts[6].split(",")]
+    except ValueError:
+        print("Invalid amount/date format. Use positive numbers and YYYY-MM-DD")
+        return False
+
+    if not commands.add_expense(amount, category, payment_method, date, description, tags):
+        print("Failed to add expense. Check category/payment method.")
+        return False
+    if not quiet:
+        print("Expense added successfully.")
+    return True
+
+def add_group_expense_command(parts, quiet=False):
+    if not check_login():
+        return False
+
+    if len(parts) < 7:
+        print("Usage: add_group_expense <amount> <group_name> <category> <payment_method> <YYYY-MM-DD> <description> <comma-separated-tags> | <comma-separated-usernames>")
+        return False
+
+    # Extract required parameters
+    amount = parts[1]
+    group_name = parts[2]
+    category = parts[3]
+    payment_method = parts[4]
+    date = parts[5]
+    description = parts[6]
+
+    # Validate amount (ensure it's a positive number)
+    try:
+        amount = Money.parse(amount)
+        if amount <= 0:
+            raise ValueError
+    except ValueError:
+        print("Error: Amount must be a positive number.")
+        return False
+
+    # Validate date format
+    try:
+        date = parse_date(date)
+    except ValueError:
+        print("Invalid date format. Please use YYYY-MM-DD.")
+        return False
+
+    # Handle optional tags and users
+    tags = []
+    split_usernames = []
+
+    if len(parts) > 7:  # Check if tags/users are provided
+        extra_input = " ".join(parts[7:])
+
+        if "|" in extra_input:  # Both tags and users are provided
+            tag_part, user_part = extra_input.split("|", 1)
+            tags = [tag.strip() for tag in tag_part.split(",") if tag.strip()]
+            split_usernames = [user.strip() for user in user_part.split(",") if user.strip()]
+        else:
+            # If no "|" but has commas, assume it's just tags
+            tags = [tag.strip() for tag in extra_input.split(",") if tag.strip()]
+
+    # Ensure at least one user is provided
+    if not split_usernames:
+        print("Error: You must provide at least one user to split the expense.")
+        return False
+
+    if not commands.add_group_expense(amount, group_name, category, payment_method, date, description, tags, split_usernames):
+        print("Failed to add group expense.")
+        return False
+    if not quiet:
+        print("Group expense added successfully.")
+    return True
+
+
 def main_cli():
     print("Expense Management System")
     print("Type 'help' for commands\n")
@@ -33,9 +203,21 @@ def main_cli():
 
 
 def process_command(cmd):
+    # With profiling on, every command but profile and stats is measured
+    words = cmd.split()
+    if profiler.active and words and words[0].lower() not in ("profile", "stats"):
+        with profiler.command(cmd) as profile:
+            ok = run_command(cmd)
+        profile.render()
+        return ok
+    return run_command(cmd)
+
+
+def run_command(cmd):
+    # Returns True if the command succeeded, False after printing why not
     parts = shlex.split(cmd)
     if not parts:
-        return
+        return True
 
     command = parts[0].lower()
 
@@ -45,62 +227,63 @@ def process_command(cmd):
 
         # Authentication
         elif command == "login":
-            if len(parts) == 3:
-                if commands.login(parts[1], parts[2]):
-                    print("Login successful")
-                else:
-                    print("Invalid credentials")
-            else:
-                print("Usage: login <username> <password>")
+            return login_command(parts)
 
         elif command == "logout":
             commands.logout()
+            last_listing.update(fetch=None, page=None)
             print("Logged out")
 
         # User management
         elif command == "add_user":
             if not check_login():
-                return
+                return False
                 
             if len(parts) == 4:
                 if commands.add_user(parts[1], parts[2], parts[3]):
                     print("User added")
                 else:
                     print("Failed to add user")
+                    return False
             else:
                 print("Usage: add_user <username> <password> <role>")
+                return False
 
         # Command: Update User
         # Usage: update_user <username> <field> <new_value>
         elif command == "update_user":
             if not check_login():
-                return
+                return False
                 
             if len(parts) == 4:
                 if commands.update_user(parts[1], parts[2], parts[3]):
                     print(f"User '{parts[1]}' updated successfully.")
                 else:
                     print("Failed to update user.")
+                    return False
             else:
                 print("Usage: update_user <username> <field> <new_value>")
+                return False
 
         # Command: Delete User
         # Usage: delete_user <username>
         elif command == "delete_user":
             if not check_login():
-                return
+                return False
                 
             if len(parts) == 2:
                 if commands.delete_user(parts[1]):
                     print(f"User '{parts[1]}' deleted.")
                 else:
                     print("Failed to delete user.")
+                    return False
             else:
                 print("Usage: delete_user <username>")
+                return False
 
         elif command == "list_users":
             if not check_login():
-                return
+                return False
                 
             if commands.current_user.get('role') == 'Admin':
                 users = commands.list_users()
@@ -109,11 +292,12 @@ def process_command(cmd):
                         f"ID: {user['uid']} | User: {user['username']} | Role: {user['role']}")
             else:
                 print("Permission denied")
+                return False
 
         # Category management
         elif command == "add_category":
             if not check_login():
-                return
+                return False
                 
             if len(parts) == 2:
                 if commands.current_user.get('role') == 'Admin':
@@ -122,15 +306,18 @@ def process_command(cmd):
                         print(f"Category '{category_lower}' added")
                     else:
                         print("Failed to add category")
+                        return False
                 else:
                     print("Permission denied. Only admins can add categories.")
+                    return False
             else:
                 print("Usage: add_category <name>")
+                return False
 
         # Payment method management
         elif command == "add_payment_method":
             if not check_login():
-                return
+                return False
                 
             if len(parts) == 2:
                 if commands.current_user.get('role') == 'Admin':
@@ -138,71 +325,73 @@ def process_command(cmd):
                         print(f"Payment method '{parts[1]}' added")
                     else:
                         print("Failed to add payment method")
+                        return False
                 else:
                     print("Permission denied. Only admins can add payment methods.")
+                    return False
             else:
                 print("Usage: add_payment_method <name>")
+                return False
 
         # In process_command() function:
         elif command == "add_expense":
-            if not check_login():
-                return
-                
-            if len(parts) >= 6:
-                try:
-                    amount = float(parts[1])
-                    if amount <= 0:
-                        print("Amount must be greater than 0")
-                        return
-                    category = parts[2].strip().lower()
-                    payment_method = parts[3].strip().lower()
-                    date = datetime.strptime(parts[4], '%Y-%m-%d').date()
-                    description = parts[5]
-                    tags = []
-
-                    if len(parts) > 6:
-                        tags = [tag.strip() for tag in parts[6].split(",")]
-
-                    if commands.add_expense(amount, category, payment_method,
-                                            date.isoformat(), description, tags):
-                        print("Expense added successfully.")
-                    else:
-                        print("Failed to add expense. Check category/payment method.")
-                except ValueError:
-                    print(
-                        "Invalid amount/date format. Use positive numbers and YYYY-MM-DD")
-            else:
-                print(
-                    "Usage: add_expense <amount> <category> <payment_method> <YYYY-MM-DD> <description> [tags]")
+            return add_expense_command(parts)
 
                 # In process_command() for list_expenses:
         elif command == "list_expenses":
             if not commands.current_user or not commands.current_user.get('uid'):
                 print("Please login first")
-                return
+                return False
             
-            filters = {}
-            for arg in parts[1:]:
-                if arg.startswith("--"):
-                    key_value = arg[2:].split("=", 1)
-                    if len(key_value) == 2:
-                        key, value = key_value
-                        # Handle amount range special case
-                        if key == "amount":
-                            if '-' in value:
-                                min_val, max_val = value.split('-', 1)
-                                filters['min_amount'] = min_val
-                                filters['max_amount'] = max_val
-                            else:
-                                print("Invalid amount format. Use min-max")
-                                return
-                        else:
-                            filters[key.replace("-", "_")] = value
-            commands.list_expenses(filters)
+            filters, page_size = listing_options(parts[1:])
+            if page_size is None:
+                return show(commands.list_expenses(filters))
+            if not page_size:
+                return False
+            return show_paged(lambda cursor: commands.list_expenses(filters, page_size, cursor))
+
+        # Input format: search [--group=<name>] [--limit=<N>] <words...>
+        elif command == "search":
+            if not check_login():
+                return False
+
+            usage = "Usage: search [--group=<group_name>] [--limit=<N>] <words> (word* matches a prefix)"
+            group_name = None
+            limit = 50
+            words = []
+            for part in parts[1:]:
+                if part.startswith("--group="):
+                    group_name = part.split("=", 1)[1]
+                elif part.startswith("--limit="):
+                    if not part.split("=", 1)[1].isdigit():
+                        print(usage)
+                        return False
+                    limit = int(part.split("=", 1)[1])
+                else:
+                    words.append(part)
+            if not words:
+                print(usage)
+                return False
+
+            if group_name:
+                return show(commands.search_group_expenses(group_name, ' '.join(words), limit))
+            return show(commands.search_expenses(' '.join(words), limit))
+
+        # Continue the last paged listing
+        elif command in ("next", "prev"):
+            page = last_listing['page']
+            cursor = page and (page.next_cursor if command == "next" else page.prev_cursor)
+            if not cursor:
+                print(f"No {'more' if command == 'next' else 'previous'} results")
+                return False
+            page = last_listing['fetch'](cursor)
+            if page:
+                last_listing['page'] = page
+            return show(page)
 
         # Replace current update_expense handler with:
         elif command == "update_expense":
-            if not check_login(): return
+            if not check_login(): return False
             
             if len(parts) == 4:
                 try:
@@ -217,15 +406,18 @@ def process_command(cmd):
                         print(f"Expense {expense_id} updated")
                     else:
                         print("Update failed. Check if you own this expense.")
+                        return False
                 except ValueError:
                     print("Error: Expense ID must be a number")
+                    return False
             else:
                 print("Usage: update_expense <ID> <field> <new_value>")
                 print("Fields: amount, date, description, category, payment_method, tags")
+                return False
 
                 # Replace current delete_expense handler with:
         elif command == "delete_expense":
-            if not check_login(): return
+            if not check_login(): return False
             
             if len(parts) == 2:
                 try:
@@ -233,42 +425,49 @@ def process_command(cmd):
                         print("Expense deleted")
                     else:
                         print("Delete failed. Check if you own this expense.")
+                        return False
                 except ValueError:
                     print("Error: Expense ID must be a number")
+                    return False
             else:
                 print("Usage: delete_expense <ID>")
+                return False
 
         # Input format: add_tag <tag_name>
         elif command == "add_tag":
             if not check_login():
-                return
+                return False
                 
             if len(parts) == 2:
                 if commands.add_tag(parts[1]):
                     print(f"Tag '{parts[1]}' added.")
                 else:
                     print("Failed to add tag. It may already exist.")
+                    return False
             else:
                 print("Usage: add_tag <tag_name>")
+                return False
 
         # Command: Delete Tag
         # Usage: delete_tag <tag_name>
         elif command == "delete_tag":
             if not check_login():
-                return
+                return False
                 
             if len(parts) == 2:
                 if commands.delete_tag(parts[1]):
                     print(f"Tag '{parts[1]}' deleted.")
                 else:
                     print(f"Failed to delete tag '{parts[1]}'.")
+                    return False
             else:
                 print("Usage: delete_tag <tag_name>")
+                return False
 
         # Input format: add_group <group_name> <description>
         elif command == "add_group":
             if not check_login():
-                return
+                return False
                 
             if len(parts) >= 3:
                 group_name = parts[1]
@@ -277,12 +476,14 @@ def process_command(cmd):
                     print(f"Group '{group_name}' created.")
                 else:
                     print("Failed to add group.")
+                    return False
             else:
                 print("Usage: add_group <group_name> <description>")
+                return False
 
         elif command == "delete_group":
             if not check_login():
-                return
+                return False
             print(parts)
                 
             if len(parts) == 2:
@@ -292,110 +493,115 @@ def process_command(cmd):
                     print(f"Group '{group_name}' deleted, and all the data with it.")
                 else:
                     print("Failed to add group.")
+                    return False
             else:
                 print("Usage: delete_group <group_name>")
+                return False
 
         # add group expense
         elif command == "add_group_expense":
-            if not check_login():
-                return
-                
-            if len(parts) < 7:
-                print("Usage: add_group_expense <amount> <group_name> <category> <payment_method> <YYYY-MM-DD> <description> <comma-separated-tags> | <comma-separated-usernames>")
-                return
-            
-            # Extract required parameters
-            amount = parts[1]
-            group_name = parts[2]
-            category = parts[3]
-            payment_method = parts[4]
-            date = parts[5]
-            description = parts[6]
-
-            # Validate amount (ensure it's a positive number)
-            try:
-                amount = float(amount)
-                if amount <= 0:
-                    raise ValueError
-            except ValueError:
-                print("Error: Amount must be a positive number.")
-                return
-
-            # Validate date format
-            try:
-                datetime.strptime(date, '%Y-%m-%d')  # Ensures valid format
-            except ValueError:
-                print("Invalid date format. Please use YYYY-MM-DD.")
-                return
-
-            # Handle optional tags and users
-            tags = []
-            split_usernames = []
-
-            if len(parts) > 7:  # Check if tags/users are provided
-                extra_input = " ".join(parts[7:]) 
-
-                if "|" in extra_input:  # Both tags and users are provided
-                    tag_part, user_part = extra_input.split("|", 1)
-                    tags = [tag.strip() for tag in tag_part.split(",") if tag.strip()]
-                    split_usernames = [user.strip() for user in user_part.split(",") if user.strip()]
-                else:
-                    # If no "|" but has commas, assume it's just tags
-                    tags = [tag.strip() for tag in extra_input.split(",") if tag.strip()]
-
-            # Ensure at least one user is provided
-            if not split_usernames:
-                print("Error: You must provide at least one user to split the expense.")
-                return
-
-            # Call function with parsed arguments
-            if commands.add_group_expense(amount, group_name, category, payment_method, date, description, tags, split_usernames):
-                print("Group expense added successfully.")
-            else:
-                print("Failed to add group expense.")
+            return add_group_expense_command(parts)
 
         # Command: Add User to Group
         # Usage: add_user_to_group <username> <group_name>
         elif command == "add_user_to_group":
             if not check_login():
-                return
+                return False
                 
             if len(parts) == 3:
                 if commands.add_user_to_group(parts[1], parts[2]):
                     print(f"User '{parts[1]}' added to group '{parts[2]}'.")
                 else:
                     print("Failed to add user to group.")
+                    return False
             else:
                 print("Usage: add_user_to_group <username> <group_name>")
+                return False
 
         # In the 'process_command' function, add these elif blocks:
 
                 # In process_command() function:
         elif command == "import_expenses":
             if not check_login():
-                return
+                return False
                 
-            if len(parts) == 2:
-                if commands.import_expenses(parts[1]):
-                    print("Import completed")
+            if len(parts) in (2, 3):
+                commit_every = None
+                if len(parts) == 3:
+                    if not parts[2].startswith("--commit-every=") or not parts[2].split("=", 1)[1].isdigit():
+                        print("Usage: import_expenses <file_path> [--commit-every=<rows>]")
+                        return False
+                    commit_every = int(parts[2].split("=", 1)[1])
+                if not commands.import_expenses(parts[1], commit_every=commit_every):
+                    return False
+                print("Import completed")
             else:
-                print("Usage: import_expenses <file_path>")
+                print("Usage: import_expenses <file_path> [--commit-every=<rows>]")
+                return False
+
+        # Input format: import_files [--group=<name>] [--workers=<N>] <file_or_glob>...
+        elif command == "import_files":
+            if not check_login():
+                return False
+
+            usage = "Usage: import_files [--group=<group_name>] [--workers=<N>] <file_or_glob>..."
+            group_name = None
+            workers = None
+            paths = []
+            for part in parts[1:]:
+                if part.startswith("--group="):
+                    group_name = part.split("=", 1)[1] or None
+                elif part.startswith("--workers="):
+                    if not part.split("=", 1)[1].isdigit() or int(part.split("=", 1)[1]) < 1:
+                        print(usage)
+                        return False
+                    workers = int(part.split("=", 1)[1])
+                else:
+                    # Expand patterns ourselves, shlex does not
+                    matches = sorted(glob.glob(part)) if glob.has_magic(part) else [part]
+                    if not matches:
+                        print(f"No files match '{part}'")
+                    paths.extend(matches)
+            if not paths:
+                print(usage)
+                return False
+
+            def progress(report, done, total):
+                line = f"[{done}/{total}] {report.file_path}: {report.status}"
+                if report.status == 'staged':
+                    line += f", {report.staged}/{report.rows} rows valid in {report.stage_seconds:.2f}s"
+                elif report.status == 'imported':
+                    line += f", {report.imported} rows ({report.rejected} rejected)"
+                elif report.status == 'failed':
+                    line += f" ({report.message})"
+                print(line)
+
+            jobs = [(path, group_name) for path in paths]
+            if not commands.import_files(jobs, workers=workers, progress=progress):
+                return False
+            print("Import completed")
 
         elif command == "export_csv":
             if not check_login():
-                return
+                return False
                 
-            if len(parts) >= 4 and parts[-2] == "sort-on":
-                file_path = ' '.join(parts[1:-2]).rstrip(',')
-                sort_field = parts[-1]
-                if commands.export_csv(file_path, sort_field):
-                    print(f"Exported to {file_path}")
+            sort_at = parts.index("sort-on") if "sort-on" in parts else -1
+            if sort_at >= 2 and len(parts) > sort_at + 1:
+                file_path = ' '.join(parts[1:sort_at]).rstrip(',')
+                sort_field = parts[sort_at + 1]
+                filters = filter_options(parts[sort_at + 2:])
+                if filters is None:
+                    return False
+                if not commands.export_csv(file_path, sort_field, filters):
+                    return False
+                print(f"Exported to {file_path}")
             else:
-                print("Usage: export_csv <file_path>, sort-on <field_name>")
+                print("Usage: export_csv <file_path>, sort-on <field_name> [filters]")
+                return False
 
         elif command == "list_categories":
             if not check_login():
-                return
+                return False
                 
             categories = commands.list_categories()
             print("Categories:")
@@ -404,7 +610,7 @@ def process_command(cmd):
 
         elif command == "list_payment_methods":
             if not check_login():
-                return
+                return False
                 
             methods = commands.list_payment_methods()
             print("Payment Methods:")
@@ -413,19 +619,20 @@ def process_command(cmd):
 
                 # In process_command() function:
         elif command == "report":
-            if not check_login(): return
+            if not check_login(): return False
             
             if len(parts) < 2:
                 print("Available reports:")
                 print("- top_expenses <N> date-range <start> to <end>")
                 print("- category_spending <category>")
-                print("- above_average_expenses")
+                print("- above_average_expenses [--z-score=<N>]")
                 print("- monthly_category_spending")
+                print("- monthly_totals")
                 print("- highest_spender_per_month (Admin only)")
                 print("- frequent_category")
                 print("- payment_method_usage")
                 print("- tag_expenses")
-                return
+                return False
             
             subcmd = parts[1].lower()
             
@@ -434,129 +641,160 @@ def process_command(cmd):
                     if len(parts) < 5 or parts[3] != "date-range":
                         print("Error: Invalid format. Use:")
                         print("report top_expenses <N> date-range <YYYY-MM-DD> to <YYYY-MM-DD>")
-                        return
+                        return False
                     if len(parts) >= 5 and parts[2].isdigit() and parts[3] == "date-range":
                         n = int(parts[2])
                         # Join the remaining parts to handle dates that might contain spaces
-                        date_range = ' '.join(parts[4:]).split(" to ")
+                        date_range = ' '.join(arg for arg in parts[4:] if not arg.startswith("--")).split(" to ")
+                        filters = filter_options([arg for arg in parts[4:] if arg.startswith("--")])
+                        if filters is None:
+                            return False
                         if len(date_range) == 2:
                             start_date = date_range[0].strip()
                             end_date = date_range[1].strip()
-                            commands.report_top_expenses(
-                                n, start_date, end_date)
-                        else:
-                            print(
-                                "Invalid date range format. Use 'date-range <start_date> to <end_date>'")
-                    else:
+                            return show(commands.report_top_expenses(
+                                n, start_date, end_date, filters))
                         print(
-                            "Usage: report top_expenses <N> date-range <start_date> to <end_date>")
+                            "Invalid date range format. Use 'date-range <start_date> to <end_date>'")
+                        return False
+                    print(
+                        "Usage: report top_expenses <N> date-range <start_date> to <end_date>")
+                    return False
 
                 elif subcmd == "category_spending":
                     if len(parts) == 3:
-                        commands.report_category_spending(parts[2])
+                        return show(commands.report_category_spending(parts[2]))
                     else:
                         print("Usage: report category_spending <category>")
+                        return False
 
                 elif subcmd == "above_average_expenses":
-                    commands.report_above_average_expenses()
+                    if len(parts) == 2:
+                        return show(commands.report_above_average_expenses())
+                    elif len(parts) == 3 and parts[2].startswith("--z-score="):
+                        try:
+                            min_z_score = float(parts[2].split("=", 1)[1])
+                        except ValueError:
+                            print("Error: z-score must be a number")
+                            return False
+                        return show(commands.report_above_average_expenses(min_z_score))
+                    else:
+                        print("Usage: report above_average_expenses [--z-score=<N>]")
+                        return False
 
                 elif subcmd == "monthly_category_spending":
-                    commands.report_monthly_category_spending()
+                    return show(commands.report_monthly_category_spending())
+
+                elif subcmd == "monthly_totals":
+                    return show(commands.report_monthly_totals())
 
                 elif subcmd == "highest_spender_per_month":
                     # Check admin role using commands module's current_user
                     if not commands.current_user or commands.current_user.get('role') != 'Admin':
                         print("This report is only available for admins")
+                        return False
                     else:
-                        commands.report_highest_spender_per_month()
+                        return show(commands.report_highest_spender_per_month())
 
                 elif subcmd == "frequent_category":
-                    commands.report_frequent_category()
+                    return show(commands.report_frequent_category())
 
                 elif subcmd == "payment_method_usage":
-                    commands.report_payment_method_usage()
+                    return show(commands.report_payment_method_usage())
                 
                 elif subcmd == "tag_expenses":
-                    commands.report_tag_expenses()
+                    return show(commands.report_tag_expenses())
 
                 else:
                     print("Invalid report type")
+                    return False
 
             except ValueError:
                 print(
                     "Invalid arguments. N must be a number and date format should be YYYY-MM-DD")
+                return False
             except Exception as e:
                 print(f"Report error: {str(e)}")
+                return False
         
         elif command == "list_groups":
-            if commands.list_groups():
-                pass
-            else:
-                print("Failed to list groups")
+            return show(commands.list_groups())
 
         elif command == "report_group_expenses":
             if len(parts) < 2:
-                print("Usage: report_group_expenses <group_name> [--category=<category>] [--date=<date>] [--min-amount=<amount>] [--max-amount=<amount>] [--tag=<tag>]")
+                print("Usage: report_group_expenses <group_name> [--category=<a,b>] [--payment-method=<a,b>] [--user=<a,b>] [--from=<date>] [--to=<date>] [--min-amount=<amount>] [--max-amount=<amount>] [--tags=<tag1,tag2> [--tag-mode=any]] [--text=<words>] [--page-size=<N> | --all]")
+                return False
             else:
                 group_name = parts[1]
-                filters = {}
-                
-                # Parse the filters passed via command line
-                for arg in parts[2:]:
-                    if arg.startswith("--"):
-                        key_value = arg[2:].split("=", 1)
-                        if len(key_value) == 2:
-                            key, value = key_value
-                            filters[key.replace("-", "_")] = value
-
+                filters, page_size = listing_options(parts[2:])
+                if page_size is False:
+                    return False
                 # Call the report_group_expenses function with filters
-                if commands.report_group_expenses(group_name, filters):
+                if page_size is None:
+                    result = show(commands.report_group_expenses(group_name, filters))
+                else:
+                    result = show_paged(lambda cursor: commands.report_group_expenses(
+                        group_name, filters, page_size, cursor))
+                if result:
                     print(f"Group expenses report for '{group_name}' successfully retrieved.")
                 else:
                     print(f"Failed to retrieve report for group '{group_name}'.")
+                    return False
 
         elif command == "report_group_tag_usage":
             if len(parts) == 2:
                 group_name = parts[1]
-                if commands.report_group_tag_usage(group_name):
-                    print(f"Success, a table for all the tags usage of {group_name} group")
+                if not show(commands.report_group_tag_usage(group_name)):
+                    return False
+                print(f"Success, a table for all the tags usage of {group_name} group")
             else:
                 print("Usage: report_group_tag_usage <group_name>")
+                return False
 
         elif command == "report_group_category_spending":
             if len(parts) == 3:
                 group_name = parts[1]
                 category = parts[2]
-                if commands.report_group_category_spending(group_name, category):
-                    print(f"Success, a table for all the category and the expenses of {group_name} group")
+                if not show(commands.report_group_category_spending(group_name, category)):
+                    return False
+                print(f"Success, a table for all the category and the expenses of {group_name} group")
             else:
                 print("Usage: report_group_category_spending <group_name> <category>")
+                return False
 
         elif command == "report_group_user_expenses":
             if len(parts) < 2:
                 print("Usage: report_group_user_expenses <group_name>")
+                return False
             else:
                 group_name = parts[1]
                 
                 # Call the report_group_user_expenses function
-                if commands.report_group_user_expenses(group_name):
+                if show(commands.report_group_user_expenses(group_name)):
                     print(f"User expenses report for group '{group_name}' successfully retrieved.")
                 else:
                     print(f"Failed to retrieve report for group '{group_name}'.")
+                    return False
 
         elif command == "export_group_csv":
-            if len(parts) >= 4 and parts[-2] == "sort-on":
-                file_path = ' '.join(parts[1:-2]).rstrip(',')
-                sort_field = parts[-1]
+            sort_at = parts.index("sort-on") if "sort-on" in parts else -1
+            if sort_at >= 3 and len(parts) > sort_at + 1:
                 group_name = parts[1]
+                file_path = ' '.join(parts[2:sort_at]).rstrip(',')
+                sort_field = parts[sort_at + 1]
+                filters = filter_options(parts[sort_at + 2:])
+                if filters is None:
+                    return False
 
                 # Export group data to CSV using the provided command
-                if commands.export_group_csv(group_name, file_path, sort_field):
+                if commands.export_group_csv(group_name, file_path, sort_field, filters):
                     print(f"Group data exported to {file_path}")
                 else:
                     print(f"Error: Could not export group data for {group_name}.")
+                    return False
             else:
-                print("Usage: export_group_csv <group_name> <file_path>, sort-on <field_name>")
+                print("Usage: export_group_csv <group_name> <file_path>, sort-on <field_name> [filters]")
+                return False
 
         elif command == "import_group_csv":
             if len(parts) >= 3:  # Only need group_name and file_path
@@ -568,18 +806,95 @@ def process_command(cmd):
                     print(f"Group data imported from {file_path}")
                 else:
                     print(f"Error: Could not import group data for {group_name}.")
+                    return False
             else:
                 print("Usage: import_group_csv <group_name> <file_path>")
+                return False
+
 
+        elif command == "pool_stats":
+            stats = pool_stats()
+            print("Connection Pool:")
+            for key, value in stats.items():
+                if isinstance(value, float):
+                    value = f"{value:.4f}"
+                print(f"  {key:<22} {value}")
+
+        elif command == "profile":
+            if len(parts) == 2 and parts[1].lower() in ("on", "off"):
+                if parts[1].lower() == "on":
+                    profiler.enable()
+                else:
+                    profiler.disable()
+            elif len(parts) != 1:
+                print("Usage: profile [on|off]")
+                return False
+            print(f"Profiling is {'on' if profiler.active else 'off'}")
+
+        elif command == "stats":
+            if len(parts) == 2 and parts[1].lower() == "reset":
+                profiler.reset()
+                print("Profiling statistics cleared")
+                return True
+            rows = profiler.summary()
+            if not rows:
+                print("No profiled commands yet. Use 'profile on' first.")
+                return True
+            print(f"{'Command':<30} {'Runs':>5} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} "
+                  f"{'SQL p50':>9} {'Stmts p50':>10} {'Rows p50':>9}")
+            for name, runs, p50, p90, p99, slowest, sql_p50, statements, fetched in rows:
+                print(f"{name:<30} {runs:>5} {p50:>9.2f} {p90:>9.2f} {p99:>9.2f} {slowest:>9.2f} "
+                      f"{sql_p50:>9.2f} {statements:>10} {fetched:>9}")
+
+        elif command == "slow_queries":
+            if len(parts) >= 2 and parts[1].lower() == "on":
+                try:
+                    threshold_ms = float(parts[2]) if len(parts) > 2 else None
+                except ValueError:
+                    print("Usage: slow_queries on [<threshold_ms>]")
+                    return False
+                slow_log.enable(threshold_ms)
+                print(f"Logging statements slower than {slow_log.threshold * 1000:g} ms to {slow_log.path}")
+                return True
+            if len(parts) >= 2 and parts[1].lower() == "off":
+                slow_log.disable()
+                print("Slow-query log is off")
+                return True
+
+            limit = 10
+            for arg in parts[1:]:
+                if arg.startswith("--top=") and arg[6:].isdigit():
+                    limit = int(arg[6:])
+                else:
+                    print("Usage: slow_queries [on [<threshold_ms>] | off | --top=<N>]")
+                    return False
+            rows, slow_count = slow_log.summary(limit)
+            print(f"Slow-query log {slow_log.path}: {slow_count} slow statements, "
+                  f"logging is {'on' if slow_log.enabled else 'off'}")
+            if not rows:
+                print("No full scans logged")
+                return True
+            print(f"{'Count':>6} {'Total ms':>10} {'Max ms':>9}  Full scans / statement")
+            for sql, count, total, slowest, scans in rows:
+                print(f"{count:>6} {total:>10.1f} {slowest:>9.1f}  {', '.join(scans)}")
+                print(f"{'':>29}{sql[:100] + ('...' if len(sql) > 100 else '')}")
+
+        elif command == "rebuild_rollups":
+            if not check_login():
+                return False
+            return commands.rebuild_rollups()
 
         elif command == "exit":
             print("Exiting...")
             raise SystemExit
         else:
             print("Invalid command")
+            return False
 
     except Exception as e:
         print(f"Error: {str(e)}")
+        return False
+    return True
 
 
 def show_help():
@@ -613,13 +928,28 @@ def show_help():
                                     category, payment_method, tags)
     delete_expense <id>           - Remove expense
     list_expenses [filters]       - View expenses with optional filters:
-                                      --category=<name>
+                                      --category=<name,...>
+                                      --payment-method=<name,...>
                                       --date=<YYYY-MM-DD>
+                                      --date=<start>..<end>
+                                      --from=<YYYY-MM-DD> --to=<YYYY-MM-DD>
                                       --min-amount=<value>
                                       --max-amount=<value>
-                                      --payment-method=<name>
-                                      --tag=<tag>
                                       --amount=<min>-<max>
+                                      --tag=<tag>
+                                      --tags=<tag1,tag2,...> (all of them)
+                                      --tag-mode=any (any of the tags)
+                                      --text=<words> (description contains)
+                                      --user=<username,...>
+                                      --page-size=<N> (rows per page)
+                                      --all (no paging)
+                                    The same filters work for report_group_expenses,
+                                    export_csv, export_group_csv and top_expenses
+    next / prev                   - Next (older) or previous page of the
+                                    last list_expenses/report_group_expenses
+    search [--group=<name>] [--limit=<N>] <words>
+                                  - Find expenses by description, best match
+                                    first (word* matches a prefix)
 
     [Group Management]
     add_group <name> <description> - Create new group
@@ -631,34 +961,45 @@ def show_help():
     
     Other Group Queries:
         list_groups
-        report_group_expenses <group_name>
-            --category=<category name>
-            --min-amount=<amount>
-            --max-amount=<amount>
-            --date=<date>
-            --tag=<tag>
+        report_group_expenses <group_name> [filters]
+            --category=<name,...>  --payment-method=<name,...>
+            --user=<payer,...>
+            --from=<date> --to=<date> or --date=<date>
+            --min-amount=<amount> --max-amount=<amount>
+            --tags=<tag1,tag2,...> [--tag-mode=any]
+            --text=<words>
+            --page-size=<N> (newest first) or --all (largest first)
         report_group_tag_usage
           -For total use of each tags
         report_group_category_spending
           -For total spending in each category
         report_group_user_expenses  
-        export_group_csv <group_name> <file_path>, sort-on <field_name>
+        export_group_csv <group_name> <file_path>, sort-on <field_name> [filters]
         import_group_csv <group_name> <file_path>
 
     [Import/Export]
-    import_expenses <file.csv>    - Bulk import from CSV
-    export_csv <file.csv> sort-on <field>
+    import_expenses <file.csv> [--commit-every=<rows>]
+                                  - Bulk import from CSV in one transaction
+                                    (or commit every <rows> rows)
+    import_files [--group=<name>] [--workers=<N>] <file_or_glob>...
+                                  - Import several CSV files, parsed in parallel
+                                    and committed together (into <name> if given)
+    export_csv <file.csv> sort-on <field> [filters]
                                   - Export sorted data (fields: date, amount, category, 
-                                    payment_method, tags)
+                                    payment_method, tags, user), optionally
+                                    filtered like list_expenses
 
     [Reports]
-    report top_expenses <N> date-range <start> to <end>
+    report top_expenses <N> date-range <start> to <end> [filters]
                                   - Top N expenses in date range
     report category_spending <category>
                                   - Total spending for specific category
-    report above_average_expenses - Expenses exceeding category average
+    report above_average_expenses [--z-score=<N>]
+                                  - Expenses exceeding category average
+                                    (or at least N std devs above it)
     report monthly_category_spending
                                   - Monthly spending per category
+    report monthly_totals         - Total spending per month
     report highest_spender_per_month
                                   - Top spender each month (Admin only)
     report frequent_category      - Most used expense category
@@ -666,13 +1007,24 @@ def show_help():
     report tag_expenses           - Expense count per tag
 
     [System]
+    pool_stats                   - Show database connection pool metrics
+    profile [on|off]             - Time every command: wall and SQL time,
+                                   statements, rows, connections
+    stats [reset]                - Percentiles of the profiled commands
+    slow_queries [on [<ms>]|off] - Log statements slower than <ms> with
+                                   their query plan; without arguments,
+                                   list the full-scan offenders
+    rebuild_rollups              - Recompute the report summary tables (Admin only)
     help                         - Show this help message
     exit                         - Exit the program
 
     [Filter Examples]
     list_expenses --category=food --min-amount=100
     list_expenses --date=2024-03-15 --tag=urgent
+    list_expenses --tags=travel,work --tag-mode=any
     list_expenses --amount=50-200 --payment-method=credit_card
+    list_expenses --category=food,travel --from=2024-01-01 --to=2024-03-31
+    export_csv march.csv sort-on amount --date=2024-03-01..2024-03-31
 
     [Notes]
     - Dates must be in YYYY-MM-DD format
@@ -1,18 +1,61 @@
+import base64
+import json
+import os
+import shutil
 import sqlite3
-from app.db import get_db_connection
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+from app import migrations
+from app.dates import day_number, parse_date
+from app.db import db_connection, profile_override
+from app.filters import FilterError, compile_filters, fts_query
+from app.lookups import dimensions
+from app.money import Money
+from app.results import Column, ImportReport, Page, Result
+from app.tag_index import tag_index
+from config.config import EXPORT_CONFIG, IMPORT_CONFIG
 import csv
-from datetime import datetime
 
 current_user = {'uid': None, 'username': None, 'role': None}
 
+# Columns shared by the expense listings and reports
+EXPENSE_COLUMNS = [
+    Column('eid', 'ID', 5, 'int'),
+    Column('amount', 'Amount', 10, 'money'),
+    Column('category_name', 'Category', 15),
+    Column('method', 'Payment', 12),
+    Column('date', 'Date', 15, 'date'),
+    Column('description', 'Description', 30),
+]
+TAGS_COLUMN = Column('tags', 'Tags', 20)
+
+GROUP_COLUMNS = [
+    Column('group_name', 'Group Name', 20),
+    Column('date_created', 'Date Created', 20, 'date'),
+    Column('description', 'Description', 50),
+]
+
+GROUP_EXPENSE_COLUMNS = [
+    Column('geid', 'ID', 5, 'int'),
+    Column('amount', 'Amount', 10, 'money'),
+    Column('category_name', 'Category', 15),
+    Column('method', 'Payment', 12),
+    Column('date', 'Date', 15, 'date'),
+    Column('description', 'Description', 30),
+    Column('tags', 'Tags', 20),
+    Column('usernames', 'Users', 30),
+]
+
 #region Authentication
 def login(username, password):
     try:
-        conn = get_db_connection()
-        user = conn.execute("""
-            SELECT * FROM users 
-            WHERE username = ? AND password = ?
-        """, (username, password)).fetchone()
+        with db_connection() as conn:
+            user = conn.execute("""
+                SELECT * FROM users 
+                WHERE username = ? AND password = ?
+            """, (username, password)).fetchone()
         
         if user:
             current_user.update({
@@ -25,8 +68,6 @@ def login(username, password):
     except Exception as e:
         print(f"Login error: {str(e)}")
         return False
-    finally:
-        conn.close()
 
 # Replace current logout() with:
 def logout():
@@ -40,28 +81,24 @@ def add_user(username, password, role):
         if current_user.get('role') != 'Admin':
             return False
         
-        conn = get_db_connection()
-        conn.execute("""
-            INSERT INTO users (username, password, role)
-            VALUES (?, ?, ?)
-        """, (username, password, role))
-        conn.commit()
+        with db_connection() as conn:
+            conn.execute("""
+                INSERT INTO users (username, password, role)
+                VALUES (?, ?, ?)
+            """, (username, password, role))
+            conn.commit()
+        dimensions.invalidate('users')
         return True
     except sqlite3.IntegrityError:
         print("Username already exists or the Role does not exist")
         return False
-    finally:
-        conn.close()
 
 def list_users():
-    try:
-        if current_user.get('role') != 'Admin':
-            return []
-        
-        conn = get_db_connection()
+    if current_user.get('role') != 'Admin':
+        return []
+    
+    with db_connection() as conn:
         return conn.execute("SELECT uid, username, role FROM users").fetchall()
-    finally:
-        conn.close()
 #endregion
 
 #region Category/Payment Methods
@@ -70,30 +107,28 @@ def add_category(name):
         if current_user.get('role') != 'Admin':
             return False
         
-        conn = get_db_connection()
-        conn.execute("INSERT INTO categories (category_name) VALUES (?)", (name,))
-        conn.commit()
+        with db_connection() as conn:
+            conn.execute("INSERT INTO categories (category_name) VALUES (?)", (name,))
+            conn.commit()
+        dimensions.invalidate('categories')
         return True
     except sqlite3.IntegrityError:
         print("Category already exists")
         return False
-    finally:
-        conn.close()
 
 def add_payment_method(method):
     try:
         if current_user.get('role') != 'Admin':
             return False
         
-        conn = get_db_connection()
-        conn.execute("INSERT INTO payment_methods (method) VALUES (?)", (method,))
-        conn.commit()
+        with db_connection() as conn:
+            conn.execute("INSERT INTO payment_methods (method) VALUES (?)", (method,))
+            conn.commit()
+        dimensions.invalidate('payment_methods')
         return True
     except sqlite3.IntegrityError:
         print("Payment method already exists")
         return False
-    finally:
-        conn.close()
 #endregion
 
 #region Expense Management
@@ -103,143 +138,113 @@ def add_expense(amount, category, payment_method, date, description, tags):
             print("Error: User not logged in.")
             return False
             
+        amount = Money.parse(amount)
         if amount <= 0:
             print("Error: Amount must be greater than 0")
             return False
+        date = parse_date(date)
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        # Get category ID
-        cid_result = conn.execute("""
-            SELECT cid FROM categories 
-            WHERE LOWER(category_name) = ?
-        """, (category,)).fetchone()
-
-        if not cid_result:
-            print(f"Error: Category '{category}' not found.")
-            return False
-       
-        cid = cid_result[0]
+            # Get category ID
+            cid = dimensions.category_id(conn, category)
+            if cid is None:
+                print(f"Error: Category '{category}' not found.")
+                return False
         
-        # Get payment method ID
-        pid_result = conn.execute("""
-            SELECT pid FROM payment_methods 
-            WHERE LOWER(method) = ?
-        """, (payment_method,)).fetchone()
+            # Get payment method ID
+            pid = dimensions.payment_method_id(conn, payment_method)
+            if pid is None:
+                print(f"Error: Payment method '{payment_method}' not found.")
+                return False
 
-        if not pid_result:
-            print(f"Error: Payment method '{payment_method}' not found.")
-            return False
-          
-        pid = pid_result[0]
+            # Insert expense
+            cursor.execute("""
+                INSERT INTO expenses 
+                (uid, amount, cid, pid, date, description)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (current_user['uid'], amount, cid, pid, date, description))
 
-        # Insert expense
-        cursor.execute("""
-            INSERT INTO expenses 
-            (uid, amount, cid, pid, date, description)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (current_user['uid'], amount, cid, pid, date, description))
-
-        eid = cursor.lastrowid
-
-        # Handle multiple tags
-        for tag in tags:
-            tag_result = conn.execute("""
-                SELECT tid FROM tags WHERE tag_name = ?
-            """, (tag,)).fetchone()
-            
-            if not tag_result:
-                conn.execute("INSERT INTO tags (tag_name) VALUES (?)", (tag,))
-                tid = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
-            else:
-                tid = tag_result[0]
+            eid = cursor.lastrowid
 
-            # Insert into expenses_tags table
-            conn.execute("""
+            # Handle multiple tags
+            tids = dimensions.tag_ids(conn, tags)
+            conn.executemany("""
                 INSERT INTO expenses_tags (eid, tid)
                 VALUES (?, ?)
-            """, (eid, tid))
+            """, [(eid, tid) for tid in tids])
+            tag_index.add(current_user['uid'], eid, tids)
 
-        conn.commit()
-        return True
+            conn.commit()
+            return True
     except Exception as e:
         print(f"Error adding expense: {str(e)}")
         return False
-    finally:
-        conn.close()
 
 def update_expense(expense_id, field, new_value):
     try:
-        conn = get_db_connection()
-        valid_fields = ['amount', 'date', 'description', 'category', 'payment_method', 'tags']
+        with db_connection() as conn:
+            valid_fields = ['amount', 'date', 'description', 'category', 'payment_method', 'tags']
         
-        if field not in valid_fields:
-            print(f"Invalid field. Valid fields: {', '.join(valid_fields)}")
-            return False
-
-        # Verify ownership
-        expense = conn.execute("SELECT uid FROM expenses WHERE eid = ?", 
-                              (expense_id,)).fetchone()
-        if not expense or expense['uid'] != current_user.get('uid'):
-            print("Expense not found or permission denied")
-            return False
+            if field not in valid_fields:
+                print(f"Invalid field. Valid fields: {', '.join(valid_fields)}")
+                return False
 
-        if field == 'category':
-            category = conn.execute("SELECT cid FROM categories WHERE category_name = ?",
-                                  (new_value.lower(),)).fetchone()
-            if not category:
-                print("Invalid category")
+            # Verify ownership
+            expense = conn.execute("SELECT uid FROM expenses WHERE eid = ?", 
+                                  (expense_id,)).fetchone()
+            if not expense or expense['uid'] != current_user.get('uid'):
+                print("Expense not found or permission denied")
                 return False
-            conn.execute("UPDATE expenses SET cid = ? WHERE eid = ?",
-                       (category['cid'], expense_id))
+
+            if field == 'category':
+                cid = dimensions.category_id(conn, new_value)
+                if cid is None:
+                    print("Invalid category")
+                    return False
+                conn.execute("UPDATE expenses SET cid = ? WHERE eid = ?",
+                           (cid, expense_id))
         
-        elif field == 'payment_method':
-            method = conn.execute("SELECT pid FROM payment_methods WHERE method = ?",
-                                (new_value.lower(),)).fetchone()
-            if not method:
-                print("Invalid payment method")
-                return False
-            conn.execute("UPDATE expenses SET pid = ? WHERE eid = ?",
-                       (method['pid'], expense_id))
+            elif field == 'payment_method':
+                pid = dimensions.payment_method_id(conn, new_value)
+                if pid is None:
+                    print("Invalid payment method")
+                    return False
+                conn.execute("UPDATE expenses SET pid = ? WHERE eid = ?",
+                           (pid, expense_id))
         
-        elif field == 'tags':
-            # Clear existing tags
-            conn.execute("DELETE FROM expenses_tags WHERE eid = ?", (expense_id,))
-            # Add new tags
-            for tag in new_value.split(','):
-                tag = tag.strip().lower()
-                tid = conn.execute("SELECT tid FROM tags WHERE tag_name = ?",
-                                 (tag,)).fetchone()
-                if not tid:
-                    conn.execute("INSERT INTO tags (tag_name) VALUES (?)", (tag,))
-                    tid = conn.lastrowid
-                else:
-                    tid = tid[0]
-                conn.execute("INSERT INTO expenses_tags (eid, tid) VALUES (?, ?)",
-                            (expense_id, tid))
+            elif field == 'tags':
+                # The CLI passes a list, the Streamlit app a comma-separated string
+                if isinstance(new_value, str):
+                    new_value = new_value.split(',')
+                # Clear existing tags
+                conn.execute("DELETE FROM expenses_tags WHERE eid = ?", (expense_id,))
+                # Add new tags
+                tids = dimensions.tag_ids(conn, new_value)
+                conn.executemany("INSERT INTO expenses_tags (eid, tid) VALUES (?, ?)",
+                                 [(expense_id, tid) for tid in tids])
+                tag_index.remove(expense['uid'], expense_id)
+                tag_index.add(expense['uid'], expense_id, tids)
         
-        else:
-            # For amount/date/description
-            if field == 'amount':
-                new_value = float(new_value)
-            elif field == 'date':
-                datetime.strptime(new_value, '%Y-%m-%d')  # Validate format
+            else:
+                # For amount/date/description
+                if field == 'amount':
+                    new_value = Money.parse(new_value)
+                elif field == 'date':
+                    new_value = parse_date(new_value)
             
-            conn.execute(f"UPDATE expenses SET {field} = ? WHERE eid = ?",
-                       (new_value, expense_id))
+                conn.execute(f"UPDATE expenses SET {field} = ? WHERE eid = ?",
+                           (new_value, expense_id))
         
-        conn.commit()
-        return True
+            conn.commit()
+            return True
     except ValueError as e:
         print(f"Invalid value: {str(e)}")
         return False
-    finally:
-        conn.close()
 
 def delete_expense(expense_id):
-    try:
-        conn = get_db_connection()
+    with db_connection() as conn:
         # Verify ownership
         expense = conn.execute("SELECT uid FROM expenses WHERE eid = ?", 
                              (expense_id,)).fetchone()
@@ -251,76 +256,135 @@ def delete_expense(expense_id):
         conn.execute("DELETE FROM expenses_tags WHERE eid = ?", (expense_id,))
         # Delete expense
         conn.execute("DELETE FROM expenses WHERE eid = ?", (expense_id,))
+        tag_index.remove(expense['uid'], expense_id)
         conn.commit()
         return True
-    finally:
-        conn.close()
 
-def list_expenses(filters=None):
+def _encode_cursor(direction, day, row_id):
+    # Opaque continuation token for keyset pagination on (day, id)
+    token = json.dumps([direction, day, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(token.encode()).decode().rstrip('=')
+
+def _decode_cursor(cursor):
+    try:
+        token = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, day, row_id = json.loads(token)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid page cursor")
+    if direction not in ('next', 'prev') or not isinstance(day, int) or not isinstance(row_id, int):
+        raise ValueError("Invalid page cursor")
+    return direction, day, row_id
+
+def _fetch_page(conn, select, conditions, params, key, page_size, cursor=None):
+    # One page of `select` (everything before WHERE) in (day, id) DESC
+    # order. key names the day number and id columns; the date and the id
+    # must be selected as the 5th and 1st column. Seeks past the cursor
+    # instead of using OFFSET, so every page costs the same however deep
+    # it is. Returns (rows, next_cursor, prev_cursor).
+    day_column, id_column = key
+    direction = 'next'
+    conditions, params = list(conditions), list(params)
+    if cursor:
+        direction, day, row_id = _decode_cursor(cursor)
+        conditions.append(f"({day_column}, {id_column}) {'<' if direction == 'next' else '>'} (?, ?)")
+        params += [day, row_id]
+
+    order = 'DESC' if direction == 'next' else 'ASC'
+    query = (f"{select} WHERE {' AND '.join(conditions)} "
+             f"ORDER BY {day_column} {order}, {id_column} {order} LIMIT ?")
+    db_cursor = conn.execute(query, params + [page_size + 1])
+    db_cursor.row_factory = None
+    rows = db_cursor.fetchall()
+
+    # The extra row tells whether there is another page in this direction
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == 'prev':
+        rows.reverse()
+    has_older = more if direction == 'next' else True
+    has_newer = bool(cursor) if direction == 'next' else more
+
+    next_cursor = _encode_cursor('next', day_number(rows[-1][4]), rows[-1][0]) if rows and has_older else None
+    prev_cursor = _encode_cursor('prev', day_number(rows[0][4]), rows[0][0]) if rows and has_newer else None
+    return rows, next_cursor, prev_cursor
+
+def search_expenses(text, limit=50):
+    # The current user's expenses whose description matches `text`, best
+    # match first, with the matching words in [brackets]. Ordering by bm25()
+    # rather than the rank column scores only the rows left after the uid
+    # filter, not every user's matches.
     try:
-        conn = get_db_connection()
-        base_query = """
-            SELECT e.eid, e.amount, c.category_name, p.method, e.date, e.description,
-                   GROUP_CONCAT(t.tag_name, ', ') AS tags
+        query_text = fts_query(text)
+        if query_text is None:
+            print("Search text must contain at least one word")
+            return False
+
+        with db_connection() as conn:
+            query = """
+                SELECT e.eid, e.amount / 100.0 AS amount, c.category_name, p.method, e.date,
+                       highlight(expenses_fts, 0, '[', ']') AS description,
+                       (SELECT GROUP_CONCAT(t.tag_name, ', ')
+                        FROM expenses_tags et
+                        JOIN tags t ON et.tid = t.tid
+                        WHERE et.eid = e.eid) AS tags
+                FROM expenses_fts
+                JOIN expenses e ON e.eid = expenses_fts.rowid
+                JOIN categories c ON e.cid = c.cid
+                JOIN payment_methods p ON e.pid = p.pid
+                WHERE expenses_fts MATCH ? AND e.uid = ?
+                ORDER BY bm25(expenses_fts)
+                LIMIT ?
+            """
+            return Result.from_cursor(
+                f"Expenses matching '{text}'",
+                EXPENSE_COLUMNS + [TAGS_COLUMN],
+                conn.execute(query, (query_text, current_user['uid'], limit)),
+                f"No expenses match '{text}'")
+    except Exception as e:
+        print(f"Error searching expenses: {str(e)}")
+        return False
+
+def list_expenses(filters=None, page_size=None, cursor=None):
+    # All matching expenses, newest first. With page_size, returns a Page of
+    # at most page_size rows starting after `cursor` (a Page's next_cursor
+    # or prev_cursor). Tag filters ('tag' or 'tags') keep expenses having
+    # all the tags, or any of them with tag_mode='any'.
+    with db_connection() as conn:
+        # Tags are aggregated per listed expense, so a page only touches the
+        # tags of its own rows
+        select = """
+            SELECT e.eid, e.amount / 100.0 AS amount, c.category_name, p.method, e.date, e.description,
+                   (SELECT GROUP_CONCAT(t.tag_name, ', ')
+                    FROM expenses_tags et
+                    JOIN tags t ON et.tid = t.tid
+                    WHERE et.eid = e.eid) AS tags
             FROM expenses e
             JOIN categories c ON e.cid = c.cid
             JOIN payment_methods p ON e.pid = p.pid
-            LEFT JOIN expenses_tags et ON e.eid = et.eid
-            LEFT JOIN tags t ON et.tid = t.tid
-            WHERE e.uid = ?
         """
-        params = [current_user['uid']]
-        conditions = []
-
-        if filters:
-            for key, value in filters.items():
-                if key == 'category':
-                    conditions.append("c.category_name = ?")
-                    params.append(value.lower())
-                elif key == 'payment_method':
-                    conditions.append("p.method = ?")
-                    params.append(value.lower())
-                elif key == 'min_amount':
-                    conditions.append("e.amount >= ?")
-                    params.append(float(value))
-                elif key == 'max_amount':
-                    conditions.append("e.amount <= ?")
-                    params.append(float(value))
-                elif key == 'date':
-                    conditions.append("e.date = ?")
-                    params.append(value)
-                elif key == 'tag':
-                    conditions.append("t.tag_name = ?")
-                    params.append(value.lower())
-
-        if conditions:
-            base_query += " AND " + " AND ".join(conditions)
-        
-        base_query += " GROUP BY e.eid ORDER BY e.date DESC"
-        
-        expenses = conn.execute(base_query, params).fetchall()
-        
-        if not expenses:
-            print("No expenses found")
-            return
-        
-        print("\n{:<5} {:<10} {:<15} {:<12} {:<15} {:<30} {:<20}".format(
-            "ID", "Amount", "Category", "Payment", "Date", "Description", "Tags"))
-        print("-"*110)
-        for exp in expenses:
-            print("{:<5} ₹{:<9.2f} {:<15} {:<12} {:<15} {:<30} {:<20}".format(
-                exp['eid'],
-                exp['amount'],
-                exp['category_name'],
-                exp['method'],
-                exp['date'],
-                exp['description'] or "-",
-                exp['tags'] or "-"
-            ))
-        print()
-        
-    finally:
-        conn.close()
+        try:
+            conditions, params = compile_filters(conn, 'expenses', filters, current_user['uid'])
+        except FilterError as e:
+            print(str(e))
+            return False
+        conditions = ["e.uid = ?"] + conditions
+        params = [current_user['uid']] + params
+
+        if page_size is None:
+            query = f"{select} WHERE {' AND '.join(conditions)} ORDER BY e.day DESC, e.eid DESC"
+            return Result.from_cursor(None, EXPENSE_COLUMNS + [TAGS_COLUMN],
+                                      conn.execute(query, params),
+                                      "No expenses found")
+
+        try:
+            rows, next_cursor, prev_cursor = _fetch_page(
+                conn, select, conditions, params, ('e.day', 'e.eid'), page_size, cursor)
+        except ValueError as e:
+            print(str(e))
+            return False
+        return Page(None, EXPENSE_COLUMNS + [TAGS_COLUMN], rows, "No expenses found",
+                    next_cursor, prev_cursor)
+
 
 def add_tag(tag_name):
     try:
@@ -329,35 +393,30 @@ def add_tag(tag_name):
             print("Error: User not logged in.")
             return False
             
-        conn = get_db_connection()
-        conn.execute("INSERT INTO tags (tag_name) VALUES (?)", (tag_name.strip().lower(),))
-        conn.commit()
+        with db_connection() as conn:
+            conn.execute("INSERT INTO tags (tag_name) VALUES (?)", (tag_name.strip().lower(),))
+            conn.commit()
+        dimensions.invalidate('tags')
         return True
     except sqlite3.IntegrityError:
         print(f"Tag '{tag_name}' already exists.")
         return False
-    finally:
-        conn.close()
 
 def list_tags():
-    try:
-        conn = get_db_connection()
+    with db_connection() as conn:
         tags = conn.execute("SELECT * FROM tags").fetchall()
         return tags
-    finally:
-        conn.close()
 
 def delete_tag(tag_name):
     try:
-        conn = get_db_connection()
-        conn.execute("DELETE FROM tags WHERE tag_name = ?", (tag_name.strip().lower(),))
-        conn.commit()
+        with db_connection() as conn:
+            conn.execute("DELETE FROM tags WHERE tag_name = ?", (tag_name.strip().lower(),))
+            conn.commit()
+        dimensions.invalidate('tags')
         return True
     except Exception as e:
         print(f"Error deleting tag: {str(e)}")
         return False
-    finally:
-        conn.close()
 #endregion
 
 
@@ -368,27 +427,25 @@ def create_group(group_name, description):
             print("Error: User not logged in.")
             return False
             
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        # Create the group
-        cursor.execute("INSERT INTO groups (group_name, description, date_created) VALUES (?, ?, date('now'))", 
-                     (group_name, description))
+            # Create the group
+            cursor.execute("INSERT INTO groups (group_name, description, date_created) VALUES (?, ?, date('now'))", 
+                         (group_name, description))
         
-        # Get the new group ID
-        gid = cursor.lastrowid
+            # Get the new group ID
+            gid = cursor.lastrowid
         
-        # Add the creator to the group
-        cursor.execute("INSERT INTO user_group (uid, gid) VALUES (?, ?)", 
-                     (current_user['uid'], gid))
+            # Add the creator to the group
+            cursor.execute("INSERT INTO user_group (uid, gid) VALUES (?, ?)", 
+                         (current_user['uid'], gid))
         
-        conn.commit()
-        return True
+            conn.commit()
+            return True
     except sqlite3.IntegrityError:
         print(f"Group '{group_name}' already exists.")
         return False
-    finally:
-        conn.close()
 
 def add_user_to_group(username, group_name):
     try:
@@ -397,225 +454,209 @@ def add_user_to_group(username, group_name):
             print("Access denied: No user logged in.")
             return False
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
 
-        # Get user ID and group ID
-        uid = cursor.execute("SELECT uid FROM users WHERE username = ?", (username,)).fetchone()
-        gid = cursor.execute("SELECT gid FROM groups WHERE group_name = ?", (group_name,)).fetchone()
+            # Get user ID and group ID
+            uid = cursor.execute("SELECT uid FROM users WHERE username = ?", (username,)).fetchone()
+            gid = cursor.execute("SELECT gid FROM groups WHERE group_name = ?", (group_name,)).fetchone()
 
-        if not uid or not gid:
-            print("User or Group not found.")
-            return False
+            if not uid or not gid:
+                print("User or Group not found.")
+                return False
 
-        uid, gid = uid[0], gid[0]
+            uid, gid = uid[0], gid[0]
 
-        # Check if the group is empty
-        user_count = cursor.execute("SELECT COUNT(*) FROM user_group WHERE gid = ?", (gid,)).fetchone()[0]
+            # Check if the group is empty
+            user_count = cursor.execute("SELECT COUNT(*) FROM user_group WHERE gid = ?", (gid,)).fetchone()[0]
 
-        if user_count > 0:
-            # If the group is not empty, check if current_user is in the group
-            user_in_group = cursor.execute("SELECT 1 FROM user_group WHERE uid = ? AND gid = ?", 
-                                           (current_user['uid'], gid)).fetchone()
+            if user_count > 0:
+                # If the group is not empty, check if current_user is in the group
+                user_in_group = cursor.execute("SELECT 1 FROM user_group WHERE uid = ? AND gid = ?", 
+                                               (current_user['uid'], gid)).fetchone()
             
-            if not user_in_group:
-                print("Access denied: Only group members can add new users.")
-                return False
+                if not user_in_group:
+                    print("Access denied: Only group members can add new users.")
+                    return False
 
-        # Add the user to the group
-        cursor.execute("INSERT INTO user_group (uid, gid) VALUES (?, ?)", (uid, gid))
-        conn.commit()
-        return True
+            # Add the user to the group
+            cursor.execute("INSERT INTO user_group (uid, gid) VALUES (?, ?)", (uid, gid))
+            conn.commit()
+            return True
 
     except sqlite3.IntegrityError:
         print(f"User '{username}' is already in group '{group_name}'.")
         return False
 
-    finally:
-        conn.close()
 
 def delete_group(group_name):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
 
-        # Check if the group exists
-        gid = cursor.execute("SELECT gid FROM groups WHERE group_name = ?", (group_name,)).fetchone()
-        if not gid:
-            print(f"Error: Group '{group_name}' does not exist.")
-            return False
-        gid = gid[0]
+            # Check if the group exists
+            gid = cursor.execute("SELECT gid FROM groups WHERE group_name = ?", (group_name,)).fetchone()
+            if not gid:
+                print(f"Error: Group '{group_name}' does not exist.")
+                return False
+            gid = gid[0]
         
-        # Check if the user has permission to delete the group
-        if not check_group_permissions(group_name):
-            return False
+            # Check if the user has permission to delete the group
+            if not check_group_permissions(group_name):
+                return False
 
-        # Fetch all expense IDs associated with the group
-        expense_ids = cursor.execute("SELECT geid FROM group_expenses WHERE gid = ?", (gid,)).fetchall()
-        expense_ids = [row[0] for row in expense_ids]
+            # Fetch all expense IDs associated with the group
+            expense_ids = cursor.execute("SELECT geid FROM group_expenses WHERE gid = ?", (gid,)).fetchall()
+            expense_ids = [row[0] for row in expense_ids]
 
-        if expense_ids:
-            # Handle the case where there's only one expense ID
-            if len(expense_ids) == 1:
-                cursor.execute("DELETE FROM split_users WHERE geid = ?", (expense_ids[0],))
-                cursor.execute("DELETE FROM group_expense_tags WHERE geid = ?", (expense_ids[0],))
-            else:
-                # Convert list to a tuple for SQL queries
-                expense_ids_tuple = tuple(expense_ids)
+            if expense_ids:
+                # Handle the case where there's only one expense ID
+                if len(expense_ids) == 1:
+                    cursor.execute("DELETE FROM split_users WHERE geid = ?", (expense_ids[0],))
+                    cursor.execute("DELETE FROM group_expense_tags WHERE geid = ?", (expense_ids[0],))
+                else:
+                    # Convert list to a tuple for SQL queries
+                    expense_ids_tuple = tuple(expense_ids)
 
-                # Delete related records in dependent tables
-                cursor.execute("DELETE FROM split_users WHERE geid IN ({})".format(",".join("?" * len(expense_ids))), expense_ids_tuple)
-                cursor.execute("DELETE FROM group_expense_tags WHERE geid IN ({})".format(",".join("?" * len(expense_ids))), expense_ids_tuple)
+                    # Delete related records in dependent tables
+                    cursor.execute("DELETE FROM split_users WHERE geid IN ({})".format(",".join("?" * len(expense_ids))), expense_ids_tuple)
+                    cursor.execute("DELETE FROM group_expense_tags WHERE geid IN ({})".format(",".join("?" * len(expense_ids))), expense_ids_tuple)
                 
-            cursor.execute("DELETE FROM group_expenses WHERE gid = ?", (gid,))
+                cursor.execute("DELETE FROM group_expenses WHERE gid = ?", (gid,))
 
-        # Delete user-group associations
-        cursor.execute("DELETE FROM user_group WHERE gid = ?", (gid,))
+            # Delete user-group associations
+            cursor.execute("DELETE FROM user_group WHERE gid = ?", (gid,))
         
-        # Finally, delete the group
-        cursor.execute("DELETE FROM groups WHERE gid = ?", (gid,))
+            # Finally, delete the group
+            cursor.execute("DELETE FROM groups WHERE gid = ?", (gid,))
         
-        conn.commit()
-        print(f"Group '{group_name}' and all related expenses deleted successfully.")
-        return True
+            conn.commit()
+            print(f"Group '{group_name}' and all related expenses deleted successfully.")
+            return True
 
     except Exception as e:
         print(f"Error deleting group: {str(e)}")
         return False
 
-    finally:
-        conn.close()
 
 def add_group_expense(amount, group_name, category, payment_method, date, description, tags, split_usernames):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Check if the group exists
-        gid = cursor.execute("SELECT gid FROM groups WHERE group_name = ?", (group_name,)).fetchone()
-        if not gid:
-            print(f"Error: Group '{group_name}' does not exist.")
-            return False
-        gid = gid[0]
+        amount = Money.parse(amount)
+        date = parse_date(date)
+        with db_connection() as conn:
+            cursor = conn.cursor()
+
+            # Check if the group exists
+            gid = cursor.execute("SELECT gid FROM groups WHERE group_name = ?", (group_name,)).fetchone()
+            if not gid:
+                print(f"Error: Group '{group_name}' does not exist.")
+                return False
+            gid = gid[0]
 
-        # Check if the current user is in the group
-        is_user_in_group = cursor.execute(
-            "SELECT 1 FROM user_group WHERE uid = ? AND gid = ?", (current_user['uid'], gid)
-        ).fetchone()
+            # Check if the current user is in the group
+            is_user_in_group = cursor.execute(
+                "SELECT 1 FROM user_group WHERE uid = ? AND gid = ?", (current_user['uid'], gid)
+            ).fetchone()
         
-        if not is_user_in_group and current_user.get('role') != 'Admin':
-            print(f"Error: You must be a member of the group '{group_name}' to add expenses.")
-            return False
-
-        # Get category ID and payment method ID
-        cid = cursor.execute("SELECT cid FROM categories WHERE LOWER(category_name) = ?", (category.lower(),)).fetchone()
-        pid = cursor.execute("SELECT pid FROM payment_methods WHERE LOWER(method) = ?", (payment_method.lower(),)).fetchone()
+            if not is_user_in_group and current_user.get('role') != 'Admin':
+                print(f"Error: You must be a member of the group '{group_name}' to add expenses.")
+                return False
 
-        if not cid or not pid:
-            print("Invalid category or payment method.")
-            return False
+            # Get category ID and payment method ID
+            cid = dimensions.category_id(conn, category)
+            pid = dimensions.payment_method_id(conn, payment_method)
 
-        cid, pid = cid[0], pid[0]
+            if cid is None or pid is None:
+                print("Invalid category or payment method.")
+                return False
 
-        # Make a copy of split_usernames to avoid modifying the original list
-        split_users = list(split_usernames)
+            # Make a copy of split_usernames to avoid modifying the original list
+            split_users = list(split_usernames)
         
-        # Add current user if not already in the list
-        if current_user.get('username') not in split_users:
-            split_users.append(current_user.get('username'))
-
-        unique_usernames = list(set(split_users))  # Remove duplicates
-
-        # Fetch UIDs for all users and verify they're part of the group
-        user_ids = []
-        non_group_members = []
+            # Add current user if not already in the list
+            if current_user.get('username') not in split_users:
+                split_users.append(current_user.get('username'))
+
+            # Remove duplicates, keeping the order so the split is repeatable
+            unique_usernames = list(dict.fromkeys(split_users))
+
+            # Fetch UIDs for all users and verify they're part of the group
+            user_ids = []
+            non_group_members = []
+            known_users = dimensions.user_ids(conn, unique_usernames)
+            members = {row[0] for row in cursor.execute(
+                "SELECT uid FROM user_group WHERE gid = ?", (gid,))}
         
-        for username in unique_usernames:
-            # First check if user exists
-            user_result = cursor.execute("SELECT uid FROM users WHERE username = ?", (username,)).fetchone()
-            if not user_result:
-                print(f"Warning: User '{username}' does not exist, skipping.")
-                continue
-                
-            uid = user_result[0]
-            
-            # Then check if user is part of the group
-            is_in_group = cursor.execute(
-                "SELECT 1 FROM user_group WHERE uid = ? AND gid = ?", (uid, gid)
-            ).fetchone()
+            for username in unique_usernames:
+                # First check if user exists
+                uid = known_users.get(username)
+                if uid is None:
+                    print(f"Warning: User '{username}' does not exist, skipping.")
+                    continue
             
-            if is_in_group:
-                user_ids.append(uid)
-            else:
-                non_group_members.append(username)
+                # Then check if user is part of the group
+                if uid in members:
+                    user_ids.append(uid)
+                else:
+                    non_group_members.append(username)
         
-        # Handle case where some users aren't part of the group
-        if non_group_members:
-            print(f"Error: These users are not members of group '{group_name}': {', '.join(non_group_members)}")
-            print("Only group members can be part of an expense split.")
-            return False
+            # Handle case where some users aren't part of the group
+            if non_group_members:
+                print(f"Error: These users are not members of group '{group_name}': {', '.join(non_group_members)}")
+                print("Only group members can be part of an expense split.")
+                return False
 
-        if len(user_ids) < 2:
-            print("Error: The expense must be split between at least two group members.")
-            return False
+            if len(user_ids) < 2:
+                print("Error: The expense must be split between at least two group members.")
+                return False
 
-        # Add expense to group_expenses table
-        cursor.execute(
-            "INSERT INTO group_expenses (gid, uid, amount, cid, pid, date, description) VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (gid, current_user['uid'], amount, cid, pid, date, description)
-        )
-        geid = cursor.lastrowid
-
-        # Add tags to the expense
-        for tag in tags:
-            tag_result = cursor.execute("SELECT tid FROM tags WHERE tag_name = ?", (tag.strip().lower(),)).fetchone()
-            if not tag_result:
-                cursor.execute("INSERT INTO tags (tag_name) VALUES (?)", (tag.strip().lower(),))
-                tid = cursor.lastrowid
-            else:
-                tid = tag_result[0]
-            cursor.execute("INSERT INTO group_expense_tags (geid, tid) VALUES (?, ?)", (geid, tid))
+            # Add expense to group_expenses table
+            cursor.execute(
+                "INSERT INTO group_expenses (gid, uid, amount, cid, pid, date, description) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (gid, current_user['uid'], amount, cid, pid, date, description)
+            )
+            geid = cursor.lastrowid
 
-        # Calculate split amount
-        split_amount = amount / len(user_ids)
+            # Add tags to the expense
+            tids = dimensions.tag_ids(conn, tags)
+            cursor.executemany("INSERT INTO group_expense_tags (geid, tid) VALUES (?, ?)",
+                               [(geid, tid) for tid in tids])
 
-        # Insert split details into split_users table
-        for uid in user_ids:
-            cursor.execute(
+            # Split exactly: the shares differ by at most one paisa
+            shares = amount.split(len(user_ids))
+
+            # Insert split details into split_users table
+            cursor.executemany(
                 "INSERT INTO split_users (geid, uid, split_amount) VALUES (?, ?, ?)",
-                (geid, uid, split_amount)
+                list(zip([geid] * len(user_ids), user_ids, shares))
             )
 
-        conn.commit()
-        print(f"Group expense added to '{group_name}' and split among {len(user_ids)} users.")
-        return True
+            conn.commit()
+            print(f"Group expense added to '{group_name}' and split among {len(user_ids)} users.")
+            return True
 
     except Exception as e:
         print(f"Error adding group expense: {str(e)}")
         return False
 
-    finally:
-        conn.close()
         
 #region User Management Updates
 def update_user(username, field, new_value):
-    try:
-        if current_user.get('role') != 'Admin':
-            print("Only Admin can update users.")
-            return False
+    if current_user.get('role') != 'Admin':
+        print("Only Admin can update users.")
+        return False
 
-        valid_fields = ['password', 'role']
-        if field not in valid_fields:
-            print("Invalid field.")
-            return False
+    valid_fields = ['password', 'role']
+    if field not in valid_fields:
+        print("Invalid field.")
+        return False
 
-        conn = get_db_connection()
+    with db_connection() as conn:
         conn.execute(f"UPDATE users SET {field} = ? WHERE username = ?", (new_value, username))
         conn.commit()
-        print(f"User '{username}' updated.")
-        return True
-    finally:
-        conn.close()
+    dimensions.invalidate('users')
+    print(f"User '{username}' updated.")
+    return True
 
 def delete_user(username):
     try:
@@ -623,77 +664,171 @@ def delete_user(username):
             print("Only Admin can delete users.")
             return False
 
-        conn = get_db_connection()
-        conn.execute("DELETE FROM users WHERE username = ?", (username,))
-        conn.commit()
+        with db_connection() as conn:
+            conn.execute("DELETE FROM users WHERE username = ?", (username,))
+            conn.commit()
+        dimensions.invalidate('users')
         print(f"User '{username}' deleted.")
         return True
     except Exception as e:
         print(f"Error deleting user: {str(e)}")
         return False
-    finally:
-        conn.close()
 #endregion
 
 # region Import/Export
-def import_expenses(file_path):
+def _parse_expense_row(row):
+    # Validates one CSV row without touching the database. Returns
+    # [amount, category, payment_method, date, description, tags] or
+    # raises ValueError with the reason.
+    required_fields = ['amount', 'category', 'payment_method', 'date']
+    if not all(row.get(field) for field in required_fields):
+        raise ValueError("Missing required fields")
+
+    amount = Money.parse(row['amount'])
+    if amount <= 0:
+        raise ValueError("Amount must be greater than 0")
+    date = parse_date(row['date'])
+
+    category = row['category'].strip().lower()
+    payment_method = row['payment_method'].strip().lower()
+    description = row.get('description') or ''
+    tags = list(dict.fromkeys(tag.strip().lower() for tag in (row.get('tag') or row.get('tags') or '').split(',') if tag.strip()))
+    return [amount, category, payment_method, date, description, tags]
+
+def _resolve_expense_row(conn, fields, ids):
+    # Turns parsed fields into the expense values and its tag names.
+    # ids memoises lookups for this import, including names that do not exist.
+    amount, category, payment_method, date, description, tags = fields
+
+    if ('categories', category) not in ids:
+        ids[('categories', category)] = dimensions.category_id(conn, category)
+    cid = ids[('categories', category)]
+    if cid is None:
+        raise ValueError(f"Invalid category '{category}'")
+
+    if ('payment_methods', payment_method) not in ids:
+        ids[('payment_methods', payment_method)] = dimensions.payment_method_id(conn, payment_method)
+    pid = ids[('payment_methods', payment_method)]
+    if pid is None:
+        raise ValueError(f"Invalid payment method '{payment_method}'")
+
+    return (amount, cid, pid, date, description), tags
+
+def _insert_expense_chunk(conn, uid, parsed):
+    # parsed: [(row_num, values, tags)]. Returns the number of rows inserted
+    # and a list of (row_num, error) for rows that were rejected.
+    insert_expense = """
+        INSERT INTO expenses (uid, amount, cid, pid, date, description)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """
+    # The whole chunk as one statement: expenses has triggers (rollups,
+    # search index), and executemany would pay for a statement journal and
+    # the trigger setup on every row
+    insert_chunk = """
+        INSERT INTO expenses (uid, amount, cid, pid, date, description)
+        SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]'), json_extract(value, '$[2]'),
+               json_extract(value, '$[3]'), json_extract(value, '$[4]'), json_extract(value, '$[5]')
+        FROM json_each(?)
+        ORDER BY key
+    """
+    insert_tag = "INSERT INTO expenses_tags (eid, tid) VALUES (?, ?)"
+    tag_map = dimensions.tag_map(conn, [tag for _, _, tags in parsed for tag in tags])
+
+    conn.execute("SAVEPOINT import_chunk")
+    try:
+        conn.execute(insert_chunk, (json.dumps([(uid,) + values for _, values, _ in parsed]),))
+        # We hold the write lock, so AUTOINCREMENT handed out consecutive ids
+        # ending at last_insert_rowid()
+        first_eid = conn.execute("SELECT last_insert_rowid()").fetchone()[0] - len(parsed) + 1
+        conn.executemany(insert_tag, [
+            (first_eid + i, tag_map[tag])
+            for i, (_, _, tags) in enumerate(parsed) for tag in tags
+        ])
+        conn.execute("RELEASE import_chunk")
+        for i, (_, _, tags) in enumerate(parsed):
+            if tags:
+                tag_index.add(uid, first_eid + i, [tag_map[tag] for tag in tags])
+        return len(parsed), []
+    except sqlite3.Error:
+        conn.execute("ROLLBACK TO import_chunk")
+        conn.execute("RELEASE import_chunk")
+
+    # Something in the chunk was rejected: insert row by row to find it
+    inserted, errors = 0, []
+    for row_num, values, tags in parsed:
+        conn.execute("SAVEPOINT import_row")
+        try:
+            eid = conn.execute(insert_expense, (uid,) + values).lastrowid
+            conn.executemany(insert_tag, [(eid, tag_map[tag]) for tag in tags])
+            conn.execute("RELEASE import_row")
+            tag_index.add(uid, eid, [tag_map[tag] for tag in tags])
+            inserted += 1
+        except sqlite3.Error as e:
+            conn.execute("ROLLBACK TO import_row")
+            conn.execute("RELEASE import_row")
+            errors.append((row_num, str(e)))
+    return inserted, errors
+
+def import_expenses(file_path, chunk_size=None, commit_every=None):
     try:
         if not current_user.get('uid'):
             print("You must be logged in to import expenses")
             return False
 
-        conn = get_db_connection()
+        chunk_size = chunk_size or IMPORT_CONFIG['chunk_size']
+        if commit_every is None:
+            commit_every = IMPORT_CONFIG['commit_every']
+        uid = current_user['uid']
+        started = time.perf_counter()
         imported_count = 0
-
-        with open(file_path, 'r') as f:
-            reader = csv.DictReader(f)
-            for row_num, row in enumerate(reader, 1):
+        row_count = 0
+        error_count = 0
+        since_commit = 0
+        ids = {}
+
+        with open(file_path, 'r', newline='') as f, db_connection() as conn:
+            reader = enumerate(csv.DictReader(f), 1)
+            with profile_override(conn, IMPORT_CONFIG['profile']):
+                conn.execute("BEGIN IMMEDIATE")
                 try:
-                    # Validate required fields
-                    required_fields = ['amount', 'category', 'payment_method', 'date']
-                    if not all(field in row for field in required_fields):
-                        print(f"Row {row_num}: Missing required fields")
-                        continue
-
-                    # Convert data types
-                    amount = float(row['amount'])
-                    date = datetime.strptime(row['date'], '%Y-%m-%d').date()
-                    category = row['category'].strip().lower()
-                    payment_method = row['payment_method'].strip().lower()
-                    description = row.get('description', '')
-                    tags = [tag.strip() for tag in row.get('tag', '').split(',') if tag.strip()]
-
-                    # Check category exists
-                    category_id = conn.execute("""
-                        SELECT cid FROM categories 
-                        WHERE category_name = ?
-                    """, (category,)).fetchone()
-                    if not category_id:
-                        print(f"Row {row_num}: Invalid category '{category}'")
-                        continue
-
-                    # Check payment method exists
-                    payment_id = conn.execute("""
-                        SELECT pid FROM payment_methods 
-                        WHERE method = ?
-                    """, (payment_method,)).fetchone()
-                    if not payment_id:
-                        print(f"Row {row_num}: Invalid payment method '{payment_method}'")
-                        continue
-
-                    # Add expense
-                    if add_expense(amount, category, payment_method, 
-                                  date.isoformat(), description, tags):
-                        imported_count += 1
-                    else:
-                        print(f"Row {row_num}: Failed to add expense")
-
-                except ValueError as e:
-                    print(f"Row {row_num}: Invalid data - {str(e)}")
-                except Exception as e:
-                    print(f"Row {row_num}: Error - {str(e)}")
-
-        print(f"Successfully imported {imported_count}/{row_num} expenses")
+                    while True:
+                        chunk = list(islice(reader, chunk_size))
+                        if not chunk:
+                            break
+                        row_count += len(chunk)
+
+                        parsed = []
+                        for row_num, row in chunk:
+                            try:
+                                values, tags = _resolve_expense_row(conn, _parse_expense_row(row), ids)
+                                parsed.append((row_num, values, tags))
+                            except ValueError as e:
+                                print(f"Row {row_num}: Invalid data - {str(e)}")
+                                error_count += 1
+
+                        if parsed:
+                            inserted, errors = _insert_expense_chunk(conn, uid, parsed)
+                            for row_num, error in errors:
+                                print(f"Row {row_num}: Error - {error}")
+                            imported_count += inserted
+                            error_count += len(errors)
+                            since_commit += inserted
+
+                        if commit_every and since_commit >= commit_every:
+                            conn.commit()
+                            conn.execute("BEGIN IMMEDIATE")
+                            since_commit = 0
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    # Tags created inside the transaction are gone again
+                    dimensions.invalidate('tags')
+                    raise
+
+        elapsed = time.perf_counter() - started
+        rate = imported_count / elapsed if elapsed > 0 else 0
+        print(f"Successfully imported {imported_count}/{row_count} expenses "
+              f"({error_count} rejected) in {elapsed:.2f}s, {rate:,.0f} rows/s")
         return True
 
     except FileNotFoundError:
@@ -703,8 +838,31 @@ def import_expenses(file_path):
         print(f"Import error: {str(e)}")
         return False
 
-def export_csv(file_path, sort_field):
-    valid_fields = ['date', 'amount', 'category', 'payment_method', 'tags', 'user']
+# ORDER BY expressions for export_csv. The sort field is looked up here and
+# never interpolated itself; e.eid keeps the order stable between runs.
+EXPORT_SORT_COLUMNS = {
+    'date': 'e.day',
+    'amount': 'e.amount',
+    'category': 'c.category_name',
+    'payment_method': 'p.method',
+    'tags': 'tags',
+    'user': 'u.username',
+}
+
+def _export_rows(rows, amount_index, splits_index=None):
+    # The queries select amounts in paise; the CSV files get them as exact
+    # rupee strings ("12.50"), never through a float
+    for row in rows:
+        row = list(row)
+        row[amount_index] = str(Money(row[amount_index]))
+        if splits_index is not None and row[splits_index]:
+            row[splits_index] = ', '.join(str(Money(int(paise))) for paise in row[splits_index].split(','))
+        yield row
+
+def export_csv(file_path, sort_field, filters=None):
+    # Exports the current user's expenses (every user's for admins) that
+    # match `filters`, the same filters list_expenses takes.
+    valid_fields = list(EXPORT_SORT_COLUMNS)
     sort_field = sort_field.lower()
     
     if sort_field not in valid_fields:
@@ -712,83 +870,66 @@ def export_csv(file_path, sort_field):
         return False
 
     try:
-        conn = get_db_connection()
-        
-        # Different queries for admin and regular users
-        if current_user.get('role') == 'Admin':
-            query = """
-                SELECT e.eid, e.amount, c.category_name, p.method, e.date, e.description,
-                       GROUP_CONCAT(t.tag_name, ', ') AS tags, u.username as user
-                FROM expenses e
-                JOIN categories c ON e.cid = c.cid
-                JOIN payment_methods p ON e.pid = p.pid
-                JOIN users u ON e.uid = u.uid
-                LEFT JOIN expenses_tags et ON e.eid = et.eid
-                LEFT JOIN tags t ON et.tid = t.tid
-                GROUP BY e.eid
-            """
-            expenses = conn.execute(query).fetchall()
+        started = time.perf_counter()
+        is_admin = current_user.get('role') == 'Admin'
+
+        with db_connection() as conn:
+            try:
+                conditions, params = compile_filters(
+                    conn, 'expenses', filters, None if is_admin else current_user['uid'])
+            except FilterError as e:
+                print(str(e))
+                return False
+        if not is_admin:
+            conditions = ["e.uid = ?"] + conditions
+            params = [current_user['uid']] + params
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        # Tags are aggregated per row by a correlated subquery, so there is
+        # no GROUP BY over the whole join and SQLite can stream the rows
+        # (straight from an index when one matches the sort order).
+        query = f"""
+            SELECT e.eid, {'u.username, ' if is_admin else ''}e.amount, c.category_name,
+                   p.method, e.date, e.description,
+                   (SELECT GROUP_CONCAT(t.tag_name, ', ')
+                    FROM expenses_tags et
+                    JOIN tags t ON et.tid = t.tid
+                    WHERE et.eid = e.eid) AS tags
+            FROM expenses e
+            JOIN categories c ON e.cid = c.cid
+            JOIN payment_methods p ON e.pid = p.pid
+            JOIN users u ON e.uid = u.uid
+            {where}
+            ORDER BY {EXPORT_SORT_COLUMNS[sort_field]}, e.eid
+        """
+
+        # Different headers for admin and regular users
+        if is_admin:
+            header = ['ID', 'User', 'Amount', 'Category', 'Payment Method',
+                      'Date', 'Description', 'Tags']
         else:
-            query = """
-                SELECT e.eid, e.amount, c.category_name, p.method, e.date, e.description,
-                       GROUP_CONCAT(t.tag_name, ', ') AS tags
-                FROM expenses e
-                JOIN categories c ON e.cid = c.cid
-                JOIN payment_methods p ON e.pid = p.pid
-                LEFT JOIN expenses_tags et ON e.eid = et.eid
-                LEFT JOIN tags t ON et.tid = t.tid
-                WHERE e.uid = ?
-                GROUP BY e.eid
-            """
-            expenses = conn.execute(query, (current_user['uid'],)).fetchall()
-
-        # Sort expenses
-        sorted_expenses = sorted(
-            expenses,
-            key=lambda x: (
-                x['date'] if sort_field == 'date' else
-                float(x['amount']) if sort_field == 'amount' else
-                x['category_name'] if sort_field == 'category' else
-                x['method'] if sort_field == 'payment_method' else
-                x['tags'] if sort_field == 'tags' else
-                x.get('user', '') if sort_field == 'user' else
-                ""
-            )
-        )
+            header = ['ID', 'Amount', 'Category', 'Payment Method',
+                      'Date', 'Description', 'Tags']
 
-        with open(file_path, 'w', newline='') as f:
+        row_count = 0
+        with db_connection() as conn, open(file_path, 'w', newline='') as f:
             writer = csv.writer(f)
-            # Different headers for admin and regular users
-            if current_user.get('role') == 'Admin':
-                writer.writerow(['ID', 'User', 'Amount', 'Category', 'Payment Method', 
-                               'Date', 'Description', 'Tags'])
-                
-                for exp in sorted_expenses:
-                    writer.writerow([
-                        exp['eid'],
-                        exp['user'],
-                        exp['amount'],
-                        exp['category_name'],
-                        exp['method'],
-                        exp['date'],
-                        exp['description'],
-                        exp['tags'] or ''
-                    ])
-            else:
-                writer.writerow(['ID', 'Amount', 'Category', 'Payment Method', 
-                               'Date', 'Description', 'Tags'])
-                
-                for exp in sorted_expenses:
-                    writer.writerow([
-                        exp['eid'],
-                        exp['amount'],
-                        exp['category_name'],
-                        exp['method'],
-                        exp['date'],
-                        exp['description'],
-                        exp['tags'] or ''
-                    ])
-
+            writer.writerow(header)
+
+            cursor = conn.execute(query, params)
+            # Rows come out in the CSV column order, so skip sqlite3.Row
+            cursor.row_factory = None
+            chunk_size = EXPORT_CONFIG['chunk_size']
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                writer.writerows(_export_rows(rows, 2 if is_admin else 1))
+                row_count += len(rows)
+
+        elapsed = time.perf_counter() - started
+        rate = row_count / elapsed if elapsed > 0 else 0
+        print(f"Exported {row_count} expenses in {elapsed:.2f}s, {rate:,.0f} rows/s")
         return True
     except Exception as e:
         print(f"Export error: {str(e)}")
@@ -796,172 +937,149 @@ def export_csv(file_path, sort_field):
 # endregion
 
 def list_categories():
-    try:
-        conn = get_db_connection()
+    with db_connection() as conn:
         categories = conn.execute("SELECT category_name FROM categories").fetchall()
         return categories
-    finally:
-        conn.close()
 
 def list_payment_methods():
-    try:
-        conn = get_db_connection()
+    with db_connection() as conn:
         methods = conn.execute("SELECT method FROM payment_methods").fetchall()
         return methods
-    finally:
-        conn.close()
 
 # Add this helper function at the top
 def validate_date(date_str):
     try:
-        datetime.strptime(date_str, '%Y-%m-%d')
+        parse_date(date_str)
         return True
     except ValueError:
         return False
 
 # region Reports
-def report_top_expenses(n, start_date, end_date):
-    if not validate_date(start_date) or not validate_date(end_date):
-        print("Invalid date format. Use YYYY-MM-DD")
-        return False
-    if start_date > end_date:
-        print("Error: Start date must be before end date")
-        return False
+def report_top_expenses(n, start_date, end_date, filters=None):
+    # The n largest expenses between the two dates, narrowed by any further
+    # `filters` (see app.filters)
     try:
-        conn = get_db_connection()
-        query = """
-            SELECT e.eid, e.amount, c.category_name, p.method, e.date, e.description,
-                   GROUP_CONCAT(t.tag_name, ', ') AS tags
-            FROM expenses e
-            JOIN categories c ON e.cid = c.cid
-            JOIN payment_methods p ON e.pid = p.pid
-            LEFT JOIN expenses_tags et ON e.eid = et.eid
-            LEFT JOIN tags t ON et.tid = t.tid
-            WHERE e.uid = ? 
-            AND e.date BETWEEN ? AND ?
-            GROUP BY e.eid
-            ORDER BY e.amount DESC
-            LIMIT ?
-        """
-        expenses = conn.execute(query, (current_user['uid'], start_date, end_date, n)).fetchall()
-        
-        if not expenses:
-            print("No expenses found in this date range")
-            return
-        
-        print(f"\nTop {n} Expenses ({start_date} to {end_date}):")
-        print("{:<5} {:<10} {:<15} {:<12} {:<15} {:<30} {:<20}".format(
-            "ID", "Amount", "Category", "Payment", "Date", "Description", "Tags"))
-        print("-"*110)
-        for exp in expenses:
-            print("{:<5} ₹{:<9.2f} {:<15} {:<12} {:<15} {:<30} {:<20}".format(
-                exp['eid'],
-                exp['amount'],
-                exp['category_name'],
-                exp['method'],
-                exp['date'],
-                exp['description'] or "-",
-                exp['tags'] or "-"
-            ))
-        return True
+        with db_connection() as conn:
+            try:
+                conditions, params = compile_filters(
+                    conn, 'expenses', dict(filters or {}, start_date=start_date, end_date=end_date),
+                    current_user['uid'])
+            except FilterError as e:
+                print(str(e))
+                return False
+            query = f"""
+                SELECT e.eid, e.amount / 100.0 AS amount, c.category_name, p.method, e.date, e.description,
+                       (SELECT GROUP_CONCAT(t.tag_name, ', ')
+                        FROM expenses_tags et
+                        JOIN tags t ON et.tid = t.tid
+                        WHERE et.eid = e.eid) AS tags
+                FROM expenses e
+                JOIN categories c ON e.cid = c.cid
+                JOIN payment_methods p ON e.pid = p.pid
+                WHERE {' AND '.join(["e.uid = ?"] + conditions)}
+                ORDER BY e.amount DESC
+                LIMIT ?
+            """
+            return Result.from_cursor(
+                f"Top {n} Expenses ({start_date} to {end_date})",
+                EXPENSE_COLUMNS + [TAGS_COLUMN],
+                conn.execute(query, [current_user['uid']] + params + [n]),
+                "No expenses found in this date range")
     except Exception as e:
         print(f"Error generating report: {str(e)}")
         return False
 
 def report_category_spending(category):
     try:
-        conn = get_db_connection()
-        query = """
-            SELECT SUM(e.amount) AS total, c.category_name
-            FROM expenses e
-            JOIN categories c ON e.cid = c.cid
-            WHERE e.uid = ? AND LOWER(c.category_name) = ?
-        """
-        result = conn.execute(query, (current_user['uid'], category.lower())).fetchone()
-        
-        if not result or not result['total']:
-            print(f"No spending found in category '{category}'")
-            return False
-            
-        print(f"\nTotal spending in {category}: ₹{result['total']:.2f}")
-        return True
+        with db_connection() as conn:
+            # From the monthly rollup rather than the user's expenses
+            query = """
+                SELECT c.category_name, SUM(m.total) / 100.0 AS total
+                FROM monthly_category_totals m
+                JOIN categories c ON m.cid = c.cid
+                WHERE m.uid = ? AND LOWER(c.category_name) = ?
+                GROUP BY c.category_name
+            """
+            return Result.from_cursor(
+                f"Total spending in {category}",
+                [Column('category_name', 'Category', 15), Column('total', 'Total', 15, 'money')],
+                conn.execute(query, (current_user['uid'], category.lower())),
+                f"No spending found in category '{category}'")
     except Exception as e:
         print(f"Error generating report: {str(e)}")
         return False
 
-def report_above_average_expenses():
+def report_above_average_expenses(min_z_score=None):
+    # Expenses of the current user above the average of their category (over
+    # all users), read from category_stats. With min_z_score, only expenses
+    # at least that many standard deviations above the average.
     try:
-        conn = get_db_connection()
-        query = """
-            SELECT e.*, c.category_name, p.method, 
-                   (SELECT AVG(amount) 
-                    FROM expenses e2 
-                    WHERE e2.cid = e.cid) AS category_avg
-            FROM expenses e
-            JOIN categories c ON e.cid = c.cid
-            JOIN payment_methods p ON e.pid = p.pid
-            WHERE e.uid = ? 
-            AND e.amount > category_avg
-            ORDER BY c.category_name, e.amount DESC
-        """
-        expenses = conn.execute(query, (current_user['uid'],)).fetchall()
-        
-        if not expenses:
-            print("No expenses above category averages")
-            return
-        
-        print("\nExpenses Above Category Averages:")
-        print("{:<5} {:<10} {:<15} {:<12} {:<15} {:<30} {:<20}".format(
-            "ID", "Amount", "Category", "Payment", "Date", "Description", "Category Avg"))
-        print("-"*110)
-        for exp in expenses:
-            print("{:<5} ₹{:<9.2f} {:<15} {:<12} {:<15} {:<30} ₹{:<9.2f}".format(
-                exp['eid'],
-                exp['amount'],
-                exp['category_name'],
-                exp['method'],
-                exp['date'],
-                exp['description'] or "-",
-                exp['category_avg']
-            ))
-        return True
+        if min_z_score is not None and min_z_score < 0:
+            print("Z-score threshold must not be negative")
+            return False
+
+        with db_connection() as conn:
+            # One range scan of (uid, cid, amount) per category. The
+            # statistics are in paise; the average and variance are turned
+            # into rupees for display.
+            query = """
+                WITH stats AS (
+                    SELECT cid, CAST(total AS REAL) / count AS category_avg,
+                           MAX(total_sq / count - (CAST(total AS REAL) / count) * (CAST(total AS REAL) / count), 0)
+                               AS variance
+                    FROM category_stats
+                )
+                SELECT e.eid, e.amount / 100.0 AS amount, c.category_name, p.method, e.date, e.description,
+                       s.category_avg / 100.0, s.variance / 10000.0
+                FROM stats s
+                JOIN expenses e ON e.uid = ? AND e.cid = s.cid AND e.amount > s.category_avg
+                JOIN categories c ON e.cid = c.cid
+                JOIN payment_methods p ON e.pid = p.pid
+                WHERE ? IS NULL
+                   OR (e.amount - s.category_avg) * (e.amount - s.category_avg) >= ? * ? * s.variance
+                ORDER BY c.category_name, e.amount DESC
+            """
+            cursor = conn.execute(query, (current_user['uid'], min_z_score, min_z_score, min_z_score))
+            cursor.row_factory = None
+            rows = cursor.fetchall()
+
+        columns = EXPENSE_COLUMNS + [Column('category_avg', 'Category Avg', 20, 'money')]
+        if min_z_score is None:
+            return Result("Expenses Above Category Averages", columns,
+                          [row[:-1] for row in rows], "No expenses above category averages")
+
+        # Python rather than SQL: sqrt() is an optional SQLite build feature
+        columns.append(Column('z_score', 'Z-Score', 10))
+        return Result(
+            f"Expenses At Least {min_z_score:g} Std Devs Above Category Averages",
+            columns,
+            [row[:-1] + (round((row[1] - row[6]) / row[7] ** 0.5, 2) if row[7] > 0 else None,)
+             for row in rows],
+            "No expenses above the z-score threshold")
     except Exception as e:
         print(f"Error generating report: {str(e)}")
         return False
 
 def report_monthly_category_spending():
     try:
-        conn = get_db_connection()
-        query = """
-            SELECT 
-                strftime('%Y-%m', e.date) AS month,
-                c.category_name,
-                SUM(e.amount) AS total,
-                COUNT(e.eid) AS count
-            FROM expenses e
-            JOIN categories c ON e.cid = c.cid
-            WHERE e.uid = ?
-            GROUP BY month, c.category_name
-            ORDER BY month DESC, total DESC
-        """
-        results = conn.execute(query, (current_user['uid'],)).fetchall()
-        
-        if not results:
-            print("No spending data available")
-            return
-
-        print("\nMonthly Category Spending:")
-        print("{:<10} {:<15} {:<15} {:<10}".format(
-            "Month", "Category", "Total Amount", "Expenses Count"))
-        print("-" * 50)
-        for row in results:
-            print("{:<10} {:<15} ₹{:<13.2f} {:<10}".format(
-                row['month'],
-                row['category_name'],
-                row['total'],
-                row['count']
-            ))
-        return True
+        with db_connection() as conn:
+            query = """
+                SELECT m.month, c.category_name, m.total / 100.0, m.count
+                FROM monthly_category_totals m
+                JOIN categories c ON m.cid = c.cid
+                WHERE m.uid = ?
+                ORDER BY m.month DESC, m.total DESC
+            """
+            return Result.from_cursor(
+                "Monthly Category Spending",
+                [
+                    Column('month', 'Month', 10, 'month'),
+                    Column('category_name', 'Category', 15),
+                    Column('total', 'Total Amount', 15, 'money'),
+                    Column('count', 'Expenses Count', 10, 'int'),
+                ],
+                conn.execute(query, (current_user['uid'],)),
+                "No spending data available")
     except Exception as e:
         print(f"Error generating report: {str(e)}")
         return False
@@ -972,142 +1090,227 @@ def report_highest_spender_per_month():
             print("Permission denied: Admin access required")
             return False
             
-        conn = get_db_connection()
-        query = """
-            WITH monthly_spending AS (
-                SELECT
-                    strftime('%Y-%m', e.date) AS month,
-                    u.username,
-                    SUM(e.amount) AS total,
-                    RANK() OVER (PARTITION BY strftime('%Y-%m', e.date) 
-                                 ORDER BY SUM(e.amount) DESC) AS rank
-                FROM expenses e
-                JOIN users u ON e.uid = u.uid
-                GROUP BY month, u.username
-            )
-            SELECT month, username, total
-            FROM monthly_spending
-            WHERE rank = 1
-            ORDER BY month DESC
-        """
-        results = conn.execute(query).fetchall()
-        
-        if not results:
-            print("No spending data available")
-            return
-
-        print("\nHighest Spender Per Month:")
-        print("{:<10} {:<15} {:<15}".format(
-            "Month", "Username", "Total Spending"))
-        print("-" * 40)
-        for row in results:
-            print("{:<10} {:<15} ₹{:<13.2f}".format(
-                row['month'],
-                row['username'],
-                row['total']
-            ))
-        return True
+        with db_connection() as conn:
+            query = """
+                WITH monthly_spending AS (
+                    SELECT month, uid, total,
+                           RANK() OVER (PARTITION BY month ORDER BY total DESC) AS rank
+                    FROM monthly_user_totals
+                )
+                SELECT m.month, u.username, m.total / 100.0
+                FROM monthly_spending m
+                JOIN users u ON m.uid = u.uid
+                WHERE m.rank = 1
+                ORDER BY m.month DESC
+            """
+            return Result.from_cursor(
+                "Highest Spender Per Month",
+                [
+                    Column('month', 'Month', 10, 'month'),
+                    Column('username', 'Username', 15),
+                    Column('total', 'Total Spending', 15, 'money'),
+                ],
+                conn.execute(query),
+                "No spending data available")
     except Exception as e:
         print(f"Error generating report: {str(e)}")
         return False
 
-def report_frequent_category():
+def report_monthly_totals():
+    # Total spending of the current user per month, oldest first
     try:
-        conn = get_db_connection()
-        # Get all categories with max count
-        query = """
-            WITH category_counts AS (
-                SELECT c.category_name, COUNT(*) AS count,
-                       MAX(COUNT(*)) OVER () AS max_count
-                FROM expenses e
-                JOIN categories c ON e.cid = c.cid
-                WHERE e.uid = ?
-                GROUP BY c.category_name
-            )
-            SELECT category_name, count
-            FROM category_counts
-            WHERE count = max_count
-        """
-        results = conn.execute(query, (current_user['uid'],)).fetchall()
-        
-        if not results:
-            print("No expense data available")
-            return
+        with db_connection() as conn:
+            return Result.from_cursor(
+                "Monthly Spending",
+                [
+                    Column('month', 'Month', 10, 'month'),
+                    Column('total', 'Total Amount', 15, 'money'),
+                    Column('count', 'Expenses Count', 10, 'int'),
+                ],
+                conn.execute("""
+                    SELECT month, SUM(total) / 100.0 AS total, SUM(count) AS count
+                    FROM monthly_category_totals
+                    WHERE uid = ?
+                    GROUP BY month
+                    ORDER BY month
+                """, (current_user['uid'],)),
+                "No spending data available")
+    except Exception as e:
+        print(f"Error generating report: {str(e)}")
+        return False
+
+def dashboard_summary(today=None, recent=5):
+    # Metrics and chart series of the dashboard for the current user. All
+    # of it is read from the rollups and the newest end of the (uid, day)
+    # index, so it costs the same however many expenses the user has.
+    # Returns a dict with the number of expenses, the most used category
+    # and payment method as (name, count) or None, this and last month's
+    # totals (the months of `today`, 'YYYY-MM-DD', default the current
+    # date), category and monthly totals as (name, amount) lists and the
+    # `recent` latest expenses as a Result.
+    try:
+        uid = current_user['uid']
+        with db_connection() as conn:
+            this_month, last_month = conn.execute("""
+                SELECT strftime('%Y-%m', COALESCE(?, date('now', 'localtime'))),
+                       strftime('%Y-%m', COALESCE(?, date('now', 'localtime')), 'start of month', '-1 month')
+            """, (today, today)).fetchone()
+            monthly = conn.execute("""
+                SELECT month, SUM(total), SUM(count)
+                FROM monthly_category_totals
+                WHERE uid = ?
+                GROUP BY month
+                ORDER BY month
+            """, (uid,)).fetchall()
+            categories = conn.execute("""
+                SELECT c.category_name, SUM(m.total) AS total, SUM(m.count) AS count
+                FROM monthly_category_totals m
+                JOIN categories c ON m.cid = c.cid
+                WHERE m.uid = ?
+                GROUP BY m.cid
+                ORDER BY total DESC
+            """, (uid,)).fetchall()
+            top_payment_method = conn.execute("""
+                SELECT p.method, t.count
+                FROM payment_method_totals t
+                JOIN payment_methods p ON t.pid = p.pid
+                WHERE t.uid = ?
+                ORDER BY t.count DESC
+                LIMIT 1
+            """, (uid,)).fetchone()
+            latest = Result.from_cursor(
+                "Recent Expenses",
+                EXPENSE_COLUMNS + [TAGS_COLUMN],
+                conn.execute("""
+                    SELECT e.eid, e.amount / 100.0 AS amount, c.category_name, p.method, e.date, e.description,
+                           (SELECT GROUP_CONCAT(t.tag_name, ', ')
+                            FROM expenses_tags et
+                            JOIN tags t ON et.tid = t.tid
+                            WHERE et.eid = e.eid) AS tags
+                    FROM expenses e
+                    JOIN categories c ON e.cid = c.cid
+                    JOIN payment_methods p ON e.pid = p.pid
+                    WHERE e.uid = ?
+                    ORDER BY e.day DESC, e.eid DESC
+                    LIMIT ?
+                """, (uid, recent)),
+                "No recent expenses found")
+
+        totals = {month: total for month, total, _ in monthly}
+        top_category = max(categories, key=lambda row: row[2], default=None)
+        return {
+            'count': sum(count for _, _, count in monthly),
+            'top_category': top_category and (top_category[0], top_category[2]),
+            'top_payment_method': tuple(top_payment_method) if top_payment_method else None,
+            'this_month': totals.get(this_month, 0) / 100,
+            'last_month': totals.get(last_month, 0) / 100,
+            'category_totals': [(name, total / 100) for name, total, _ in categories],
+            'monthly_totals': [(month, total / 100) for month, total, _ in monthly],
+            'recent': latest,
+        }
+    except Exception as e:
+        print(f"Error loading dashboard: {str(e)}")
+        return False
+
+def rebuild_rollups():
+    # Recomputes the monthly rollups, the category statistics, the payment
+    # method totals and the description search indexes from the base tables
+    try:
+        if current_user.get('role') != 'Admin':
+            print("Permission denied: Admin access required")
+            return False
 
-        print("\nMost Frequent Categories:")
-        for row in results:
-            print(f"{row['category_name']}: {row['count']} expenses")
+        with db_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                migrations.rebuild_rollups(conn)
+                migrations.rebuild_category_stats(conn)
+                migrations.rebuild_payment_totals(conn)
+                migrations.rebuild_fts(conn)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            count = conn.execute("SELECT COUNT(*) FROM monthly_category_totals").fetchone()[0]
+        print(f"Rebuilt monthly rollups ({count} user/month/category rows), category statistics, "
+              "payment method totals and search indexes")
         return True
+    except Exception as e:
+        print(f"Error rebuilding rollups: {str(e)}")
+        return False
+
+def report_frequent_category():
+    try:
+        with db_connection() as conn:
+            # Get all categories with max count, counted in the monthly rollup
+            query = """
+                WITH category_counts AS (
+                    SELECT c.category_name, SUM(m.count) AS count,
+                           MAX(SUM(m.count)) OVER () AS max_count
+                    FROM monthly_category_totals m
+                    JOIN categories c ON m.cid = c.cid
+                    WHERE m.uid = ?
+                    GROUP BY c.category_name
+                )
+                SELECT category_name, count
+                FROM category_counts
+                WHERE count = max_count
+            """
+            return Result.from_cursor(
+                "Most Frequent Categories",
+                [Column('category_name', 'Category', 15), Column('count', 'Expenses', 10, 'int')],
+                conn.execute(query, (current_user['uid'],)),
+                "No expense data available")
     except Exception as e:
         print(f"Error generating report: {str(e)}")
         return False
 
 def report_payment_method_usage():
     try:
-        conn = get_db_connection()
-        query = """
-            SELECT 
-                p.method,
-                SUM(e.amount) AS total_spent,
-                COUNT(e.eid) AS expense_count
-            FROM expenses e
-            JOIN payment_methods p ON e.pid = p.pid
-            WHERE e.uid = ?
-            GROUP BY p.method
-            ORDER BY total_spent DESC
-        """
-        results = conn.execute(query, (current_user['uid'],)).fetchall()
-        
-        if not results:
-            print("No payment method usage data available")
-            return
-
-        print("\nPayment Method Usage Breakdown:")
-        print("{:<15} {:<15} {:<15}".format(
-            "Method", "Total Spent", "Expense Count"))
-        print("-" * 45)
-        for row in results:
-            print("{:<15} ₹{:<13.2f} {:<15}".format(
-                row['method'],
-                row['total_spent'],
-                row['expense_count']
-            ))
-        return True
+        with db_connection() as conn:
+            # One row per method in the payment method totals
+            query = """
+                SELECT 
+                    p.method,
+                    t.total / 100.0 AS total_spent,
+                    t.count AS expense_count
+                FROM payment_method_totals t
+                JOIN payment_methods p ON t.pid = p.pid
+                WHERE t.uid = ?
+                ORDER BY total_spent DESC
+            """
+            return Result.from_cursor(
+                "Payment Method Usage Breakdown",
+                [
+                    Column('method', 'Method', 15),
+                    Column('total_spent', 'Total Spent', 15, 'money'),
+                    Column('expense_count', 'Expense Count', 15, 'int'),
+                ],
+                conn.execute(query, (current_user['uid'],)),
+                "No payment method usage data available")
     except Exception as e:
         print(f"Error generating report: {str(e)}")
         return False
 
 def report_tag_expenses():
     try:
-        conn = get_db_connection()
-        query = """
-            SELECT 
-                t.tag_name,
-                COUNT(et.eid) AS expense_count
-            FROM tags t
-            LEFT JOIN expenses_tags et ON t.tid = et.tid
-            WHERE EXISTS (
-                SELECT 1 FROM expenses e
-                WHERE e.eid = et.eid AND e.uid = ?
-            )
-            GROUP BY t.tag_name
-            ORDER BY expense_count DESC
-        """
-        results = conn.execute(query, (current_user['uid'],)).fetchall()
-        
-        if not results:
-            print("No tag usage data available")
-            return
-
-        print("\nTag Expense (Users) Counts:")
-        print("{:<20} {:<15}".format("Tag", "Expense Count"))
-        print("-" * 35)
-        for row in results:
-            print("{:<20} {:<15}".format(
-                row['tag_name'],
-                row['expense_count'] or 0
-            ))
-        return True
+        with db_connection() as conn:
+            query = """
+                SELECT 
+                    t.tag_name,
+                    COUNT(et.eid) AS expense_count
+                FROM expenses e
+                JOIN expenses_tags et ON et.eid = e.eid
+                JOIN tags t ON t.tid = et.tid
+                WHERE e.uid = ?
+                GROUP BY t.tag_name
+                ORDER BY expense_count DESC
+            """
+            return Result.from_cursor(
+                "Tag Expense (Users) Counts",
+                [Column('tag_name', 'Tag', 20), Column('expense_count', 'Expense Count', 15, 'int')],
+                conn.execute(query, (current_user['uid'],)),
+                "No tag usage data available")
     except Exception as e:
         print(f"Error generating report: {str(e)}")
         return False
@@ -1116,232 +1319,206 @@ def report_tag_expenses():
 #region group queries
 def list_groups():
     try:
-        conn = get_db_connection()
-
-        # If the user is not an admin, only show the groups they belong to
-        if current_user['role'] != 'Admin':
-            print(f"Only admins can view all the groups. \n Showing {current_user['username']}'s groups")
-
-            # Simplified query to fetch the groups that the current user is part of
-            query = """
-                SELECT group_name, date_created, description
-                FROM groups
-                JOIN user_group ON groups.gid = user_group.gid
-                WHERE user_group.uid = ?
-            """
-            groups = conn.execute(query, (current_user['uid'],)).fetchall()
-
-        else:
-            # Admins can view all groups
-            print("Admin is viewing all groups.")
-            query = "SELECT group_name, date_created, description FROM groups"
-            groups = conn.execute(query).fetchall()
+        with db_connection() as conn:
+            # If the user is not an admin, only show the groups they belong to
+            if current_user['role'] != 'Admin':
+                title = f"Groups of {current_user['username']} (only admins can view all the groups)"
+
+                # Simplified query to fetch the groups that the current user is part of
+                query = """
+                    SELECT group_name, date_created, description
+                    FROM groups
+                    JOIN user_group ON groups.gid = user_group.gid
+                    WHERE user_group.uid = ?
+                """
+                cursor = conn.execute(query, (current_user['uid'],))
 
-        if not groups:
-            print("No groups found.")
-            return False
-        
-        print("\nGroups:")
-        print("{:<20} {:<20} {:<50}".format("Group Name", "Date Created", "Description"))
-        print("-" * 80)
-        for group in groups:
-            print("{:<20} {:<20} {:<50}".format(group['group_name'], group['date_created'], group['description'] or "-"))
+            else:
+                # Admins can view all groups
+                title = "Groups"
+                query = "SELECT group_name, date_created, description FROM groups"
+                cursor = conn.execute(query)
 
-        return True
+            return Result.from_cursor(title, GROUP_COLUMNS, cursor, "No groups found.")
 
     except Exception as e:
         print(f"Error retrieving groups: {str(e)}")
         return False
 
 
-def report_group_expenses(group_name, filters=None):
+def report_group_expenses(group_name, filters=None, page_size=None, cursor=None):
+    # Unpaged: every matching expense, largest first. With page_size: a Page
+    # in date order, newest first, like list_expenses.
     try:
-        conn = get_db_connection()
+        with db_connection() as conn:
+            # Check if user has permission to view the group
+            if not check_group_permissions(group_name):
+                return False
 
-        # Check if user has permission to view the group
-        if not check_group_permissions(group_name):
-            return False
+            select = """
+                SELECT ge.geid, ge.amount / 100.0 AS amount, c.category_name, p.method, ge.date, ge.description,
+                       (SELECT GROUP_CONCAT(DISTINCT t.tag_name) 
+                        FROM group_expense_tags getag 
+                        JOIN tags t ON getag.tid = t.tid 
+                        WHERE getag.geid = ge.geid) AS tags,
+                       (SELECT GROUP_CONCAT(DISTINCT u.username) 
+                        FROM split_users su 
+                        JOIN users u ON su.uid = u.uid 
+                        WHERE su.geid = ge.geid) AS usernames
+                FROM group_expenses ge
+                JOIN categories c ON ge.cid = c.cid
+                JOIN payment_methods p ON ge.pid = p.pid
+            """
+            try:
+                conditions, params = compile_filters(conn, 'group_expenses', filters)
+            except FilterError as e:
+                print(str(e))
+                return False
+            conditions = ["ge.gid = (SELECT gid FROM groups WHERE group_name = ?)"] + conditions
+            params = [group_name] + params
 
-        base_query = """
-            SELECT ge.geid, ge.amount, c.category_name, p.method, ge.date, ge.description,
-                   (SELECT GROUP_CONCAT(DISTINCT t.tag_name) 
-                    FROM group_expense_tags getag 
-                    JOIN tags t ON getag.tid = t.tid 
-                    WHERE getag.geid = ge.geid) AS tags,
-                   (SELECT GROUP_CONCAT(DISTINCT u.username) 
-                    FROM split_users su 
-                    JOIN users u ON su.uid = u.uid 
-                    WHERE su.geid = ge.geid) AS usernames
-            FROM group_expenses ge
-            JOIN categories c ON ge.cid = c.cid
-            JOIN payment_methods p ON ge.pid = p.pid
-            WHERE ge.gid = (SELECT gid FROM groups WHERE group_name = ?)
-        """
-        params = [group_name]
-
-        # Apply filters
-        if filters:
-            for key, value in filters.items():
-                if key == 'category':
-                    base_query += " AND LOWER(c.category_name) = ?"
-                    params.append(value.lower())
-                elif key == 'date':
-                    base_query += " AND ge.date = ?"
-                    params.append(value)
-                elif key == 'min_amount':
-                    base_query += " AND ge.amount >= ?"
-                    params.append(float(value))
-                elif key == 'max_amount':
-                    base_query += " AND ge.amount <= ?"
-                    params.append(float(value))
-                elif key == 'tag':
-                    base_query += " AND EXISTS (SELECT 1 FROM group_expense_tags getag JOIN tags t ON getag.tid = t.tid WHERE getag.geid = ge.geid AND t.tag_name = ?)"
-                    params.append(value.lower())
-
-        base_query += " ORDER BY ge.amount DESC"
-
-        expenses = conn.execute(base_query, params).fetchall()
-
-        if not expenses:
-            print(f"No expenses found for group {group_name}")
-            return False
+            title = f"Group {group_name} Expenses"
+            empty_message = f"No expenses found for group {group_name}"
+            if page_size is None:
+                query = f"{select} WHERE {' AND '.join(conditions)} ORDER BY ge.amount DESC"
+                return Result.from_cursor(title, GROUP_EXPENSE_COLUMNS,
+                                          conn.execute(query, params), empty_message)
 
-        print(f"\nGroup {group_name} Expenses:")
-        print("{:<5} {:<10} {:<15} {:<12} {:<15} {:<30} {:<20} {:<30}".format(
-            "ID", "Amount", "Category", "Payment", "Date", "Description", "Tags", "Users"))
-        print("-" * 120)
-
-        for exp in expenses:
-            print("{:<5} ₹{:<9.2f} {:<15} {:<12} {:<15} {:<30} {:<20} {:<30}".format(
-                exp['geid'],
-                exp['amount'],
-                exp['category_name'],
-                exp['method'],
-                exp['date'],
-                exp['description'] or "-",
-                exp['tags'] or "-",
-                exp['usernames'] or "-"
-            ))
-        return True
+            rows, next_cursor, prev_cursor = _fetch_page(
+                conn, select, conditions, params, ('ge.day', 'ge.geid'), page_size, cursor)
+            return Page(title, GROUP_EXPENSE_COLUMNS, rows, empty_message, next_cursor, prev_cursor)
 
     except Exception as e:
         print(f"Error generating group expenses report: {str(e)}")
         return False
 
 
+def search_group_expenses(group_name, text, limit=50):
+    # Expenses of a group whose description matches `text`, best match first
+    try:
+        query_text = fts_query(text)
+        if query_text is None:
+            print("Search text must contain at least one word")
+            return False
+
+        with db_connection() as conn:
+            if not check_group_permissions(group_name):
+                return False
+
+            query = """
+                SELECT ge.geid, ge.amount / 100.0 AS amount, c.category_name, p.method, ge.date,
+                       highlight(group_expenses_fts, 0, '[', ']') AS description,
+                       (SELECT GROUP_CONCAT(DISTINCT t.tag_name)
+                        FROM group_expense_tags getag
+                        JOIN tags t ON getag.tid = t.tid
+                        WHERE getag.geid = ge.geid) AS tags,
+                       (SELECT GROUP_CONCAT(DISTINCT u.username)
+                        FROM split_users su
+                        JOIN users u ON su.uid = u.uid
+                        WHERE su.geid = ge.geid) AS usernames
+                FROM group_expenses_fts
+                JOIN group_expenses ge ON ge.geid = group_expenses_fts.rowid
+                JOIN categories c ON ge.cid = c.cid
+                JOIN payment_methods p ON ge.pid = p.pid
+                WHERE group_expenses_fts MATCH ?
+                AND ge.gid = (SELECT gid FROM groups WHERE group_name = ?)
+                ORDER BY bm25(group_expenses_fts)
+                LIMIT ?
+            """
+            return Result.from_cursor(
+                f"Group {group_name} expenses matching '{text}'",
+                GROUP_EXPENSE_COLUMNS,
+                conn.execute(query, (query_text, group_name, limit)),
+                f"No expenses in group {group_name} match '{text}'")
+    except Exception as e:
+        print(f"Error searching group expenses: {str(e)}")
+        return False
+
 def report_group_category_spending(group_name, category):
     try:
         # Check if the current user is an admin or a member of the group
-        conn = get_db_connection()
-        if (check_group_permissions(group_name)):
-            pass
-        else:
-            return False
+        with db_connection() as conn:
+            if (check_group_permissions(group_name)):
+                pass
+            else:
+                return False
 
-        # Proceed with generating the group category report
-        query = """
-            SELECT SUM(ge.amount) AS total, c.category_name
-            FROM group_expenses ge
-            JOIN categories c ON ge.cid = c.cid
-            WHERE ge.gid = (SELECT gid FROM groups WHERE group_name = ?) 
-            AND LOWER(c.category_name) = ?
-        """
-        
-        result = conn.execute(query, (group_name, category.lower())).fetchone()
-        
-        if not result or not result['total']:
-            print(f"No spending found in category '{category}' for group {group_name}")
-            return False
-            
-        print(f"\nTotal spending in {category} for group {group_name}: ₹{result['total']:.2f}")
-        return True
+            # Proceed with generating the group category report
+            query = """
+                SELECT c.category_name, SUM(ge.amount) / 100.0 AS total
+                FROM group_expenses ge
+                JOIN categories c ON ge.cid = c.cid
+                WHERE ge.gid = (SELECT gid FROM groups WHERE group_name = ?) 
+                AND LOWER(c.category_name) = ?
+                GROUP BY c.category_name
+            """
+            return Result.from_cursor(
+                f"Total spending in {category} for group {group_name}",
+                [Column('category_name', 'Category', 15), Column('total', 'Total', 15, 'money')],
+                conn.execute(query, (group_name, category.lower())),
+                f"No spending found in category '{category}' for group {group_name}")
 
     except Exception as e:
         print(f"Error generating group category report: {str(e)}")
         return False
     
+    
 def report_group_tag_usage(group_name):
     try:
-        conn = get_db_connection()
-        
-        if not check_group_permissions(group_name):
-            return False
-
-        # Get group ID
-        gid_result = conn.execute("SELECT gid FROM groups WHERE group_name = ?", (group_name,)).fetchone()
-        if not gid_result:
-            print(f"Error: Group '{group_name}' not found.")
-            return False
-        
-        gid = gid_result[0]
-
-        # Modified query to properly handle tags with 0 counts
-        query = """
-            SELECT t.tag_name, 
-                   COUNT(CASE WHEN ge.gid = ? THEN getag.geid ELSE NULL END) AS expense_count
-            FROM tags t
-            LEFT JOIN group_expense_tags getag ON t.tid = getag.tid
-            LEFT JOIN group_expenses ge ON getag.geid = ge.geid AND ge.gid = ?
-            GROUP BY t.tag_name
-            ORDER BY expense_count DESC, t.tag_name
-        """
-        
-        results = conn.execute(query, (gid, gid)).fetchall()
-        
-        if not results:
-            print(f"No tags found in the system")
-            return False
+        with db_connection() as conn:
+            if not check_group_permissions(group_name):
+                return False
 
-        # Filter to only show tags with counts > 0
-        results_with_counts = [row for row in results if row['expense_count'] > 0]
+            # Get group ID
+            gid_result = conn.execute("SELECT gid FROM groups WHERE group_name = ?", (group_name,)).fetchone()
+            if not gid_result:
+                print(f"Error: Group '{group_name}' not found.")
+                return False
         
-        if not results_with_counts:
-            print(f"No tag usage data found for group {group_name}")
-            return False
+            gid = gid_result[0]
 
-        print(f"\nTag Usage for Group {group_name}:")
-        print("{:<20} {:<15}".format("Tag", "Expense Count"))
-        print("-" * 35)
-        for row in results_with_counts:
-            print("{:<20} {:<15}".format(row['tag_name'], row['expense_count']))
-        return True
+            # Only tags that are used by the group's expenses
+            query = """
+                SELECT t.tag_name, COUNT(*) AS expense_count
+                FROM group_expenses ge
+                JOIN group_expense_tags getag ON getag.geid = ge.geid
+                JOIN tags t ON t.tid = getag.tid
+                WHERE ge.gid = ?
+                GROUP BY t.tag_name
+                ORDER BY expense_count DESC, t.tag_name
+            """
+            return Result.from_cursor(
+                f"Tag Usage for Group {group_name}",
+                [Column('tag_name', 'Tag', 20), Column('expense_count', 'Expense Count', 15, 'int')],
+                conn.execute(query, (gid,)),
+                f"No tag usage data found for group {group_name}")
 
     except Exception as e:
         print(f"Error generating group tag report: {str(e)}")
         return False
-    finally:
-        conn.close()    
 
 def report_group_user_expenses(group_name):
     try:
-        conn = get_db_connection()
-        if (check_group_permissions(group_name)):
-            pass
-        else:
-            return False
-        query = """
-            SELECT u.username, SUM(su.split_amount) AS total_spent
-            FROM users u
-            JOIN split_users su ON u.uid = su.uid
-            JOIN group_expenses ge ON su.geid = ge.geid
-            JOIN groups g ON ge.gid = g.gid
-            WHERE g.group_name = ?
-            GROUP BY u.uid
-            ORDER BY total_spent ASC
-        """
-        results = conn.execute(query, (group_name,)).fetchall()
-
-        if not results:
-            print(f"No users found in group {group_name} or no spending recorded.")
-            return
-
-        print(f"\nUsers and Their Spending in Group {group_name}:")
-        print("{:<20} {:<15}".format("Username", "Total Spent"))
-        print("-" * 40)
-        for row in results:
-            print("{:<20} ₹{:<13.2f}".format(row['username'], row['total_spent'] or 0))
-
-        return True
+        with db_connection() as conn:
+            if (check_group_permissions(group_name)):
+                pass
+            else:
+                return False
+            query = """
+                SELECT u.username, SUM(su.split_amount) / 100.0 AS total_spent
+                FROM users u
+                JOIN split_users su ON u.uid = su.uid
+                JOIN group_expenses ge ON su.geid = ge.geid
+                JOIN groups g ON ge.gid = g.gid
+                WHERE g.group_name = ?
+                GROUP BY u.uid
+                ORDER BY total_spent ASC
+            """
+            return Result.from_cursor(
+                f"Users and Their Spending in Group {group_name}",
+                [Column('username', 'Username', 20), Column('total_spent', 'Total Spent', 15, 'money')],
+                conn.execute(query, (group_name,)),
+                f"No users found in group {group_name} or no spending recorded.")
     except Exception as e:
         print(f"Error retrieving group user spending data: {str(e)}")
         return False
@@ -1349,369 +1526,525 @@ def report_group_user_expenses(group_name):
 
 def check_group_permissions(group_name):
     try:
-        conn = get_db_connection()
-        
-        # Check if the current user is an admin
-        if current_user['role'] == 'Admin':
-            # Admins can access any group, so no further check needed
-            return True
-        else:
-            # Check if the current user is part of the group
-            query = """
-                SELECT 1 
-                FROM user_group ug
-                JOIN groups g ON ug.gid = g.gid
-                WHERE g.group_name = ? AND ug.uid = ?
-            """
-            user_part_of_group = conn.execute(query, (group_name, current_user['uid'])).fetchone()
+        with db_connection() as conn:
+            # Check if the current user is an admin
+            if current_user['role'] == 'Admin':
+                # Admins can access any group, so no further check needed
+                return True
+            else:
+                # Check if the current user is part of the group
+                query = """
+                    SELECT 1 
+                    FROM user_group ug
+                    JOIN groups g ON ug.gid = g.gid
+                    WHERE g.group_name = ? AND ug.uid = ?
+                """
+                user_part_of_group = conn.execute(query, (group_name, current_user['uid'])).fetchone()
             
-            if not user_part_of_group:
-                print(f"Error: {current_user['username']} is not a member of group '{group_name}'.")
-                return False
+                if not user_part_of_group:
+                    print(f"Error: {current_user['username']} is not a member of group '{group_name}'.")
+                    return False
             
-        return True
+            return True
     
     except Exception as e:
         print(f"Error checking permissions for group '{group_name}': {str(e)}")
         return False
 
-def export_group_csv(group_name, file_path, sort_field=None):
+# ORDER BY expressions for export_group_csv, same keys as export_csv
+GROUP_EXPORT_SORT_COLUMNS = {
+    'date': 'ge.day',
+    'amount': 'ge.amount',
+    'category': 'c.category_name',
+    'payment_method': 'p.method',
+    'tags': 'tl.tags',
+    'user': 'u.username',
+}
+
+def export_group_csv(group_name, file_path, sort_field=None, filters=None):
+    # Exports the group's expenses matching `filters` (see app.filters)
+    if sort_field:
+        sort_field = sort_field.lower()
+        if sort_field not in GROUP_EXPORT_SORT_COLUMNS:
+            print(f"Invalid sort field. Valid options: {', '.join(GROUP_EXPORT_SORT_COLUMNS)}")
+            return False
+
     try:
-        conn = get_db_connection()
+        with db_connection() as conn:
+            # Check if the current user has permission to access this group
+            if not check_group_permissions(group_name):
+                return False
 
-        # Check if the current user has permission to access this group
-        if not check_group_permissions(group_name):
-            return False
+            group = conn.execute("SELECT gid FROM groups WHERE group_name = ?", (group_name,)).fetchone()
 
-        # Fetch group details
-        query_group = """
-            SELECT g.gid, g.group_name, g.date_created, g.description
-            FROM groups g
-            WHERE g.group_name = ?
-        """
-        group = conn.execute(query_group, (group_name,)).fetchone()
+            if not group:
+                print(f"Group {group_name} does not exist.")
+                return False
 
-        if not group:
-            print(f"Group {group_name} does not exist.")
-            return False
-        
-        # Fetch group expenses
-        query_expenses = """
-            SELECT ge.geid, ge.uid, ge.amount, c.category_name, p.method, ge.date, ge.description,
-                   u.username as creator_username
-            FROM group_expenses ge
-            JOIN categories c ON ge.cid = c.cid
-            JOIN payment_methods p ON ge.pid = p.pid
-            JOIN users u ON ge.uid = u.uid
-            WHERE ge.gid = ?
-        """
-        if sort_field:
-            query_expenses += f" ORDER BY {sort_field}"
-            
-        expenses = conn.execute(query_expenses, (group['gid'],)).fetchall()
-
-        # Prepare data for export
-        with open(file_path, 'w', newline='') as csvfile:
-            fieldnames = ['group_name', 'date_created', 'description', 
-                         'expense_id', 'creator_username', 'amount', 'category_name', 
-                         'payment_method', 'expense_date', 'expense_description', 
-                         'tags', 'split_usernames', 'split_amounts']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-
-            for expense in expenses:
-                # Get tags for this expense
-                tags_query = """
-                    SELECT t.tag_name
-                    FROM group_expense_tags get
-                    JOIN tags t ON get.tid = t.tid
-                    WHERE get.geid = ?
-                """
-                tags_result = conn.execute(tags_query, (expense['geid'],)).fetchall()
-                tags_str = ', '.join([tag['tag_name'] for tag in tags_result])
-                
-                # Get split users for this expense
-                split_query = """
-                    SELECT u.username, su.split_amount
-                    FROM split_users su
+            try:
+                conditions, params = compile_filters(conn, 'group_expenses', filters)
+            except FilterError as e:
+                print(str(e))
+                return False
+            where = ' AND '.join(["ge.gid = ?"] + conditions)
+
+            # Tags and splits are aggregated once for the whole group and
+            # joined back by geid, instead of two queries per expense.
+            order_by = GROUP_EXPORT_SORT_COLUMNS[sort_field] if sort_field else 'ge.geid'
+            query = f"""
+                WITH tag_lists AS (
+                    SELECT getag.geid, GROUP_CONCAT(t.tag_name, ', ') AS tags
+                    FROM group_expenses ge
+                    JOIN group_expense_tags getag ON getag.geid = ge.geid
+                    JOIN tags t ON getag.tid = t.tid
+                    WHERE ge.gid = ?
+                    GROUP BY getag.geid
+                ),
+                split_lists AS (
+                    SELECT su.geid,
+                           GROUP_CONCAT(u.username, ', ') AS usernames,
+                           GROUP_CONCAT(su.split_amount) AS amounts
+                    FROM group_expenses ge
+                    JOIN split_users su ON su.geid = ge.geid
                     JOIN users u ON su.uid = u.uid
-                    WHERE su.geid = ?
-                """
-                splits = conn.execute(split_query, (expense['geid'],)).fetchall()
-                
-                split_usernames = ', '.join([split['username'] for split in splits])
-                split_amounts = ', '.join([str(split['split_amount']) for split in splits])
-                
-                writer.writerow({
-                    'group_name': group['group_name'],
-                    'date_created': group['date_created'],
-                    'description': group['description'],
-                    'expense_id': expense['geid'],
-                    'creator_username': expense['creator_username'],
-                    'amount': expense['amount'],
-                    'category_name': expense['category_name'],
-                    'payment_method': expense['method'],
-                    'expense_date': expense['date'],
-                    'expense_description': expense['description'],
-                    'tags': tags_str,
-                    'split_usernames': split_usernames,
-                    'split_amounts': split_amounts
-                })
-
-        print(f"Group data successfully exported to {file_path}")
-        return True
+                    WHERE ge.gid = ?
+                    GROUP BY su.geid
+                )
+                SELECT g.group_name, g.date_created, g.description,
+                       ge.geid, u.username, ge.amount, c.category_name, p.method,
+                       ge.date, ge.description,
+                       COALESCE(tl.tags, ''), COALESCE(sl.usernames, ''), COALESCE(sl.amounts, '')
+                FROM group_expenses ge
+                JOIN groups g ON ge.gid = g.gid
+                JOIN categories c ON ge.cid = c.cid
+                JOIN payment_methods p ON ge.pid = p.pid
+                JOIN users u ON ge.uid = u.uid
+                LEFT JOIN tag_lists tl ON tl.geid = ge.geid
+                LEFT JOIN split_lists sl ON sl.geid = ge.geid
+                WHERE {where}
+                ORDER BY {order_by}, ge.geid
+            """
+            cursor = conn.execute(query, [group['gid'], group['gid'], group['gid']] + params)
+            # Rows come out in the CSV column order, so skip sqlite3.Row
+            cursor.row_factory = None
+
+            with open(file_path, 'w', newline='') as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerow(['group_name', 'date_created', 'description',
+                                 'expense_id', 'creator_username', 'amount', 'category_name',
+                                 'payment_method', 'expense_date', 'expense_description',
+                                 'tags', 'split_usernames', 'split_amounts'])
+                chunk_size = EXPORT_CONFIG['chunk_size']
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    writer.writerows(_export_rows(rows, 5, splits_index=12))
+
+            print(f"Group data successfully exported to {file_path}")
+            return True
 
     except Exception as e:
         print(f"Error exporting group data: {str(e)}")
         return False
-    finally:
-        if conn:
-            conn.close()
+
+def _open_import_group(conn, group_name, file_path):
+    # Returns the gid to import into, creating the group if needed, or None
+    # when the current user may not import into it.
+    group_result = conn.execute("SELECT gid FROM groups WHERE group_name = ?", (group_name,)).fetchone()
+
+    if group_result:
+        # If group exists, check permissions
+        if not check_group_permissions(group_name):
+            return None
+        return group_result['gid']
+
+    # Create new group
+    print(f"Creating new group '{group_name}'")
+    try:
+        group_id = conn.execute("""
+            INSERT INTO groups (group_name, description, date_created) 
+            VALUES (?, ?, date('now'))
+        """, (group_name, f"Imported group from {file_path}")).lastrowid
+
+        # Add current user to the group
+        conn.execute("""
+            INSERT INTO user_group (uid, gid) VALUES (?, ?)
+        """, (current_user['uid'], group_id))
+    except sqlite3.IntegrityError:
+        print(f"Error creating group '{group_name}'")
+        raise
+    return group_id
+
+def _parse_group_expense_row(row, username):
+    # Validates one group CSV row without touching the database. Returns the
+    # parsed row and a list of warnings, or raises ValueError with the reason.
+    # username is the importing user, who is always part of the split.
+    required_fields = ['amount', 'category_name', 'payment_method', 'expense_date']
+    if not all(field in row and row[field] for field in required_fields):
+        raise ValueError("Missing required fields. Skipping.")
+
+    try:
+        amount = Money.parse(row['amount'])
+    except ValueError:
+        raise ValueError(f"Invalid amount '{row['amount']}'. Skipping.")
+    if amount <= 0:
+        raise ValueError("Amount must be positive. Skipping.")
+
+    try:
+        expense_date = parse_date(row['expense_date'])
+    except ValueError:
+        raise ValueError("Invalid date format. Use YYYY-MM-DD. Skipping.")
+
+    warnings = []
+    split_usernames = []
+    split_amounts = []
+
+    if 'split_usernames' in row and row['split_usernames']:
+        split_usernames = [u.strip() for u in row['split_usernames'].split(',') if u.strip()]
+    
+        if 'split_amounts' in row and row['split_amounts']:
+            split_amounts = [a.strip() for a in row['split_amounts'].split(',') if a.strip()]
+
+    # Add current user if not in split list
+    if username not in split_usernames:
+        split_usernames.append(username)
+
+    # If no split amounts specified, split evenly
+    if not split_amounts or len(split_amounts) != len(split_usernames):
+        split_amounts = amount.split(len(split_usernames))
+    else:
+        try:
+            split_amounts = [Money.parse(amt) for amt in split_amounts]
+            if min(split_amounts) < 0:
+                raise ValueError("Negative split amount")
+            # Amounts are exact, so the splits must add up to the paisa
+            if sum(split_amounts) != amount:
+                warnings.append("Split amounts do not sum to total amount. Adjusting.")
+                # Scale them to the total in proportion
+                split_amounts = amount.allocate(split_amounts)
+        except ValueError:
+            warnings.append("Invalid split amounts. Splitting evenly.")
+            split_amounts = amount.split(len(split_usernames))
+
+    return {
+        'creator_username': row.get('creator_username') or None,
+        'amount': amount,
+        'category_name': row['category_name'],
+        'payment_method': row['payment_method'],
+        'expense_date': expense_date,
+        'description': row.get('expense_description', ''),
+        'tags': [tag.strip() for tag in (row.get('tags') or '').split(',') if tag.strip()],
+        'split_usernames': split_usernames,
+        'split_amounts': split_amounts,
+    }, warnings
+
+def _insert_group_expense(conn, group_id, expense, row_num):
+    # Inserts one parsed group expense with its tags and splits. Raises
+    # ValueError when the row has to be skipped; nothing is left behind then.
+    conn.execute("SAVEPOINT group_expense_row")
+    try:
+        # Get creator ID (default to current user if not specified)
+        creator_id = current_user['uid']
+        if expense['creator_username']:
+            creator_id = dimensions.user_id(conn, expense['creator_username']) or creator_id
+
+        # Get category ID
+        category_id = dimensions.category_id(conn, expense['category_name'])
+        if not category_id:
+            # Create category if it doesn't exist
+            conn.execute("INSERT INTO categories (category_name) VALUES (?)", (expense['category_name'].lower(),))
+            category_id = dimensions.category_id(conn, expense['category_name'])
+
+        # Get payment method ID
+        payment_id = dimensions.payment_method_id(conn, expense['payment_method'])
+        if not payment_id:
+            # Create payment method if it doesn't exist and user is admin
+            if current_user.get('role') != 'Admin':
+                raise ValueError(f"Payment method '{expense['payment_method']}' not found. Skipping.")
+            conn.execute("INSERT INTO payment_methods (method) VALUES (?)", (expense['payment_method'].lower(),))
+            payment_id = dimensions.payment_method_id(conn, expense['payment_method'])
+
+        # Insert expense
+        expense_id = conn.execute("""
+            INSERT INTO group_expenses (gid, uid, amount, cid, pid, date, description)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (
+            group_id, 
+            creator_id, 
+            expense['amount'], 
+            category_id, 
+            payment_id, 
+            expense['expense_date'], 
+            expense['description']
+        )).lastrowid
+
+        # Missing tags are created by the cache
+        tag_ids = dimensions.tag_ids(conn, expense['tags'])
+        conn.executemany("""
+            INSERT INTO group_expense_tags (geid, tid)
+            VALUES (?, ?)
+        """, [(expense_id, tag_id) for tag_id in tag_ids])
+
+        # Add users and their split amounts
+        split_usernames = expense['split_usernames']
+        split_amounts = expense['split_amounts']
+        user_ids = dimensions.user_ids(conn, split_usernames)
+        splits = []
+        for j, username in enumerate(split_usernames):
+            if username in user_ids:
+                splits.append((expense_id, user_ids[username],
+                               split_amounts[min(j, len(split_amounts)-1)]))
+            else:
+                print(f"Row {row_num}: User '{username}' not found. Skipping this split.")
+        conn.executemany("""
+            INSERT INTO split_users (geid, uid, split_amount)
+            VALUES (?, ?, ?)
+        """, splits)
+    except BaseException:
+        conn.execute("ROLLBACK TO group_expense_row")
+        conn.execute("RELEASE group_expense_row")
+        # Categories, payment methods or tags created for this row are gone
+        dimensions.invalidate()
+        raise
+    conn.execute("RELEASE group_expense_row")
 
 def import_group_csv(group_name, file_path):
-    conn = None
     try:
         # Check if user is logged in
         if not current_user.get('uid'):
             print("Error: User not logged in.")
             return False
             
-        conn = get_db_connection()
-        conn.execute("BEGIN TRANSACTION")
+        with db_connection() as conn:
+            conn.execute("BEGIN TRANSACTION")
 
-        # Check if the group exists 
-        group_query = "SELECT gid FROM groups WHERE group_name = ?"
-        group_result = conn.execute(group_query, (group_name,)).fetchone()
-        
-        if group_result:
-            # If group exists, check permissions
-            if not check_group_permissions(group_name):
+            group_id = _open_import_group(conn, group_name, file_path)
+            if group_id is None:
                 return False
-            group_id = group_result['gid']
-        else:
-            # Create new group
-            print(f"Creating new group '{group_name}'")
-            try:
-                conn.execute("""
-                    INSERT INTO groups (group_name, description, date_created) 
-                    VALUES (?, ?, date('now'))
-                """, (group_name, f"Imported group from {file_path}"))
-                
-                group_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
-                
-                # Add current user to the group
-                conn.execute("""
-                    INSERT INTO user_group (uid, gid) VALUES (?, ?)
-                """, (current_user['uid'], group_id))
-                
-            except sqlite3.IntegrityError:
-                print(f"Error creating group '{group_name}'")
-                raise
 
-        # Open and read the CSV file
-        with open(file_path, 'r') as csvfile:
-            reader = csv.DictReader(csvfile)
-            rows = list(reader)
+            # Open and read the CSV file
+            with open(file_path, 'r') as csvfile:
+                reader = csv.DictReader(csvfile)
+                rows = list(reader)
             
-            if not rows:
-                print("CSV file is empty")
-                return False
+                if not rows:
+                    print("CSV file is empty")
+                    return False
             
-            # Process each expense row
-            imported_count = 0
-            for i, row in enumerate(rows, 1):
-                try:
-                    # Check required fields
-                    required_fields = ['amount', 'category_name', 'payment_method', 'expense_date']
-                    if not all(field in row and row[field] for field in required_fields):
-                        print(f"Row {i}: Missing required fields. Skipping.")
-                        continue
-                    
-                    # Get creator ID (default to current user if not specified)
-                    creator_id = current_user['uid']
-                    if 'creator_username' in row and row['creator_username']:
-                        creator_query = "SELECT uid FROM users WHERE username = ?"
-                        creator_result = conn.execute(creator_query, (row['creator_username'],)).fetchone()
-                        if creator_result:
-                            creator_id = creator_result['uid']
-                    
-                    # Get category ID
-                    category_query = "SELECT cid FROM categories WHERE LOWER(category_name) = ?"
-                    category_result = conn.execute(category_query, (row['category_name'].lower(),)).fetchone()
-                    if not category_result:
-                        # Create category if it doesn't exist
-                        conn.execute("INSERT INTO categories (category_name) VALUES (?)", (row['category_name'].lower(),))
-                        category_result = conn.execute(category_query, (row['category_name'].lower(),)).fetchone()
-                    category_id = category_result['cid']
-                    
-                    # Get payment method ID
-                    payment_query = "SELECT pid FROM payment_methods WHERE LOWER(method) = ?"
-                    payment_result = conn.execute(payment_query, (row['payment_method'].lower(),)).fetchone()
-                    if not payment_result:
-                        # Create payment method if it doesn't exist and user is admin
-                        if current_user.get('role') == 'Admin':
-                            conn.execute("INSERT INTO payment_methods (method) VALUES (?)", (row['payment_method'].lower(),))
-                            payment_result = conn.execute(payment_query, (row['payment_method'].lower(),)).fetchone()
-                        else:
-                            print(f"Row {i}: Payment method '{row['payment_method']}' not found. Skipping.")
-                            continue
-                    payment_id = payment_result['pid']
-                    
-                    # Parse amount
+                # Process each expense row
+                imported_count = 0
+                for i, row in enumerate(rows, 1):
                     try:
-                        amount = float(row['amount'])
-                        if amount <= 0:
-                            print(f"Row {i}: Amount must be positive. Skipping.")
-                            continue
-                    except ValueError:
-                        print(f"Row {i}: Invalid amount '{row['amount']}'. Skipping.")
-                        continue
-                    
-                    # Validate date
-                    try:
-                        expense_date = row['expense_date']
-                        datetime.strptime(expense_date, '%Y-%m-%d')
-                    except ValueError:
-                        print(f"Row {i}: Invalid date format. Use YYYY-MM-DD. Skipping.")
-                        continue
-                    
-                    description = row.get('expense_description', '')
-                    
-                    # Insert expense
-                    expense_insert = """
-                        INSERT INTO group_expenses (gid, uid, amount, cid, pid, date, description)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """
-                    expense_result = conn.execute(expense_insert, (
-                        group_id, 
-                        creator_id, 
-                        amount, 
-                        category_id, 
-                        payment_id, 
-                        expense_date, 
-                        description
-                    ))
-                    expense_id = expense_result.lastrowid
-                    
-                    # Process tags if present
-                    if 'tags' in row and row['tags']:
-                        tags = [tag.strip() for tag in row['tags'].split(',') if tag.strip()]
-                        for tag in tags:
-                            tag_query = "SELECT tid FROM tags WHERE tag_name = ?"
-                            tag_result = conn.execute(tag_query, (tag.lower(),)).fetchone()
-                            
-                            if not tag_result:
-                                # Create tag if it doesn't exist
-                                conn.execute("INSERT INTO tags (tag_name) VALUES (?)", (tag.lower(),))
-                                tag_result = conn.execute(tag_query, (tag.lower(),)).fetchone()
-                                
-                            tag_id = tag_result['tid']
-                            tag_insert = """
-                                INSERT INTO group_expense_tags (geid, tid)
-                                VALUES (?, ?)
-                            """
-                            conn.execute(tag_insert, (expense_id, tag_id))
-                    
-                    # Process split users
-                    split_usernames = []
-                    split_amounts = []
-                    
-                    if 'split_usernames' in row and row['split_usernames']:
-                        split_usernames = [u.strip() for u in row['split_usernames'].split(',') if u.strip()]
-                        
-                        if 'split_amounts' in row and row['split_amounts']:
-                            split_amounts = [a.strip() for a in row['split_amounts'].split(',') if a.strip()]
-                    
-                    # Add current user if not in split list
-                    if current_user['username'] not in split_usernames:
-                        split_usernames.append(current_user['username'])
-                    
-                    # If no split amounts specified, split evenly
-                    if not split_amounts or len(split_amounts) != len(split_usernames):
-                        split_amount = amount / len(split_usernames)
-                        split_amounts = [split_amount] * len(split_usernames)
-                    else:
-                        try:
-                            split_amounts = [float(amt) for amt in split_amounts]
-                            # Validate that split amounts sum to total
-                            if abs(sum(split_amounts) - amount) > 0.01:  # Allow for small rounding errors
-                                print(f"Row {i}: Split amounts do not sum to total amount. Adjusting.")
-                                adjustment = amount - sum(split_amounts)
-                                split_amounts[0] += adjustment
-                        except ValueError:
-                            print(f"Row {i}: Invalid split amounts. Splitting evenly.")
-                            split_amount = amount / len(split_usernames)
-                            split_amounts = [split_amount] * len(split_usernames)
-                    
-                    # Add users and their split amounts
-                    for j, username in enumerate(split_usernames):
-                        user_query = "SELECT uid FROM users WHERE username = ?"
-                        user_result = conn.execute(user_query, (username,)).fetchone()
-                        
-                        if user_result:
-                            user_id = user_result['uid']
-                            conn.execute("""
-                                INSERT INTO split_users (geid, uid, split_amount)
-                                VALUES (?, ?, ?)
-                            """, (expense_id, user_id, split_amounts[min(j, len(split_amounts)-1)]))
-                        else:
-                            print(f"Row {i}: User '{username}' not found. Skipping this split.")
-                    
-                    imported_count += 1
-                    
-                except Exception as row_error:
-                    print(f"Row {i}: Error processing row: {str(row_error)}")
+                        expense, warnings = _parse_group_expense_row(row, current_user['username'])
+                        for warning in warnings:
+                            print(f"Row {i}: {warning}")
+                        _insert_group_expense(conn, group_id, expense, i)
+                        imported_count += 1
+                    except ValueError as row_error:
+                        print(f"Row {i}: {str(row_error)}")
+                    except Exception as row_error:
+                        print(f"Row {i}: Error processing row: {str(row_error)}")
             
-            print(f"Successfully imported {imported_count} group expenses")
+                print(f"Successfully imported {imported_count} group expenses")
         
-        conn.execute("COMMIT")
-        return True
+            conn.commit()
+            return True
 
     except Exception as e:
-        if conn:
-            conn.execute("ROLLBACK")
+        # The pool rolls back the open transaction when the connection is returned
         print(f"Error importing group data: {str(e)}")
         return False
+
+def _stage_import_file(file_path, group_name, username, staging_path):
+    # Runs in a worker process. Parses and validates one CSV into its own
+    # staging database; the main database is never touched here.
+    report = ImportReport(file_path, group_name, staging_path=staging_path)
+    started = time.perf_counter()
+    try:
+        staging = sqlite3.connect(staging_path)
+        try:
+            # Throwaway file: no journal, no fsync
+            staging.execute("PRAGMA journal_mode = OFF")
+            staging.execute("PRAGMA synchronous = OFF")
+            staging.execute("CREATE TABLE staged_rows (row_num INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+
+            batch = []
+            with open(file_path, 'r', newline='') as f:
+                for row_num, row in enumerate(csv.DictReader(f), 1):
+                    report.rows += 1
+                    try:
+                        if group_name is None:
+                            data = _parse_expense_row(row)
+                        else:
+                            data, warnings = _parse_group_expense_row(row, username)
+                            report.warnings.extend((row_num, warning) for warning in warnings)
+                    except ValueError as e:
+                        report.errors.append((row_num, str(e)))
+                        continue
+                    batch.append((row_num, json.dumps(data)))
+                    if len(batch) >= IMPORT_CONFIG['chunk_size']:
+                        staging.executemany("INSERT INTO staged_rows VALUES (?, ?)", batch)
+                        report.staged += len(batch)
+                        batch = []
+            staging.executemany("INSERT INTO staged_rows VALUES (?, ?)", batch)
+            report.staged += len(batch)
+            staging.commit()
+        finally:
+            staging.close()
+        report.status = 'staged'
+    except Exception as e:
+        report.status = 'failed'
+        report.message = str(e)
+    report.stage_seconds = time.perf_counter() - started
+    return report
+
+def _merge_staged_file(conn, report, ids):
+    # Copies one staged file into the main database inside the caller's
+    # transaction, using the same helpers as the single-file imports.
+    staging = sqlite3.connect(report.staging_path)
+    try:
+        cursor = staging.execute("SELECT row_num, data FROM staged_rows ORDER BY row_num")
+
+        if report.group_name is None:
+            while True:
+                rows = cursor.fetchmany(IMPORT_CONFIG['chunk_size'])
+                if not rows:
+                    break
+                parsed = []
+                for row_num, data in rows:
+                    try:
+                        values, tags = _resolve_expense_row(conn, json.loads(data), ids)
+                        parsed.append((row_num, values, tags))
+                    except ValueError as e:
+                        report.errors.append((row_num, str(e)))
+                if parsed:
+                    inserted, errors = _insert_expense_chunk(conn, current_user['uid'], parsed)
+                    report.imported += inserted
+                    report.errors.extend(errors)
+        else:
+            group_id = _open_import_group(conn, report.group_name, report.file_path)
+            if group_id is None:
+                report.status = 'failed'
+                report.message = f"Cannot import into group '{report.group_name}'"
+                return
+            for row_num, data in cursor:
+                try:
+                    _insert_group_expense(conn, group_id, json.loads(data), row_num)
+                    report.imported += 1
+                except ValueError as e:
+                    report.errors.append((row_num, str(e)))
+                except sqlite3.Error as e:
+                    report.errors.append((row_num, f"Error processing row: {str(e)}"))
+    finally:
+        staging.close()
+
+    report.errors.sort()
+    report.status = 'imported'
+
+def import_files(jobs, workers=None, progress=None):
+    # jobs: [(file_path, group_name)], group_name None for individual
+    # expenses. Files are parsed in parallel by worker processes, each into
+    # a staging database, then merged by this process in one transaction.
+    # progress(report, done, total) is called whenever a file is staged or
+    # merged. Returns the list of ImportReports, or False if nothing was
+    # imported because of an error.
+    if not current_user.get('uid'):
+        print("You must be logged in to import expenses")
+        return False
+    if not jobs:
+        print("No files to import")
+        return False
+
+    started = time.perf_counter()
+    workers = min(workers or IMPORT_CONFIG['workers'] or os.cpu_count() or 1, len(jobs))
+    staging_dir = tempfile.mkdtemp(prefix='expense-import-')
+    reports = [None] * len(jobs)
+
+    try:
+        # Parse and validate on every core
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(_stage_import_file, file_path, group_name, current_user['username'],
+                            os.path.join(staging_dir, f"{index}.db")): index
+                for index, (file_path, group_name) in enumerate(jobs)
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                report = future.result()
+                reports[futures[future]] = report
+                if progress:
+                    progress(report, done, len(jobs))
+
+        # Single writer: merge everything in one transaction
+        with db_connection() as conn, profile_override(conn, IMPORT_CONFIG['profile']):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                ids = {}
+                for done, report in enumerate(reports, 1):
+                    if report.status == 'staged':
+                        _merge_staged_file(conn, report, ids)
+                    if progress:
+                        progress(report, done, len(jobs))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                dimensions.invalidate()
+                raise
+    except Exception as e:
+        print(f"Import error: {str(e)}")
+        return False
     finally:
-        if conn:
-            conn.close()
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    for report in reports:
+        if report.status == 'failed':
+            print(f"{report.file_path}: {report.message}")
+        for row_num, warning in report.warnings:
+            print(f"{report.file_path}: Row {row_num}: {warning}")
+        for row_num, error in report.errors:
+            print(f"{report.file_path}: Row {row_num}: {error}")
+
+    elapsed = time.perf_counter() - started
+    imported = sum(report.imported for report in reports)
+    rows = sum(report.rows for report in reports)
+    rate = imported / elapsed if elapsed > 0 else 0
+    print(f"Imported {imported}/{rows} rows from {len(jobs)} files with {workers} workers "
+          f"in {elapsed:.2f}s, {rate:,.0f} rows/s")
+    return reports
 
 def update_group(group_name, field, new_value):
     try:
-        conn = get_db_connection()
-
-        # Check if the group exists
-        group = conn.execute("SELECT gid FROM groups WHERE group_name = ?", (group_name,)).fetchone()
-        if not group:
-            print(f"Error: Group '{group_name}' does not exist.")
-            return False
-        
-        # Check if the user has permission to update this group
-        if not check_group_permissions(group_name):
-            return False
+        with db_connection() as conn:
+            # Check if the group exists
+            group = conn.execute("SELECT gid FROM groups WHERE group_name = ?", (group_name,)).fetchone()
+            if not group:
+                print(f"Error: Group '{group_name}' does not exist.")
+                return False
         
-        # Validate the field to update
-        valid_fields = ['group_name', 'description']
-        if field not in valid_fields:
-            print(f"Error: Invalid field '{field}'. Valid fields are: {', '.join(valid_fields)}")
-            return False
+            # Check if the user has permission to update this group
+            if not check_group_permissions(group_name):
+                return False
         
-        # If updating the group name, check if the new name already exists
-        if field == 'group_name' and group_name != new_value:
-            existing = conn.execute("SELECT 1 FROM groups WHERE group_name = ?", (new_value,)).fetchone()
-            if existing:
-                print(f"Error: A group with name '{new_value}' already exists.")
+            # Validate the field to update
+            valid_fields = ['group_name', 'description']
+            if field not in valid_fields:
+                print(f"Error: Invalid field '{field}'. Valid fields are: {', '.join(valid_fields)}")
                 return False
         
-        # Update the group
-        conn.execute(f"UPDATE groups SET {field} = ? WHERE group_name = ?", (new_value, group_name))
-        conn.commit()
+            # If updating the group name, check if the new name already exists
+            if field == 'group_name' and group_name != new_value:
+                existing = conn.execute("SELECT 1 FROM groups WHERE group_name = ?", (new_value,)).fetchone()
+                if existing:
+                    print(f"Error: A group with name '{new_value}' already exists.")
+                    return False
         
-        print(f"Group '{group_name}' updated successfully.")
-        return True
+            # Update the group
+            conn.execute(f"UPDATE groups SET {field} = ? WHERE group_name = ?", (new_value, group_name))
+            conn.commit()
+        
+            print(f"Group '{group_name}' updated successfully.")
+            return True
         
     except Exception as e:
         print(f"Error updating group: {str(e)}")
         return False
-    finally:
-        conn.close()
\ No newline at end of file
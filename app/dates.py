@@ -0,0 +1,45 @@
+"""Expense dates: validation and day numbers.
+
+Dates are stored as 'YYYY-MM-DD' text. From schema version 8 the expense
+tables also carry two generated columns computed from it: `day`, the
+number of days since 1970-01-01, and `month`, the 'YYYY-MM' key used by
+the monthly reports. Range filters and date ordering use `day`, an
+integer, and monthly grouping uses `month`; both are indexed.
+
+parse_date() validates a date and day_number() converts one, with the
+same result as the generated column. Both are memoised: an import sees
+the same few hundred dates over and over.
+"""
+from datetime import date
+from functools import lru_cache
+
+# date.toordinal() of 1970-01-01, day 0
+_EPOCH = date(1970, 1, 1).toordinal()
+
+# SQL for the generated columns; julianday('1970-01-01') is 2440587.5
+DAY_SQL = "CAST(julianday(date) - 2440587.5 AS INTEGER)"
+MONTH_SQL = "substr(date, 1, 7)"
+
+
+@lru_cache(maxsize=4096)
+def _parse(text):
+    # date.fromisoformat() alone also accepts forms like '20240315'
+    if len(text) != 10 or text[4] != '-' or text[7] != '-':
+        raise ValueError
+    return date.fromisoformat(text)
+
+
+def parse_date(value):
+    """Returns the date as 'YYYY-MM-DD' or raises ValueError."""
+    text = str(value).strip()
+    try:
+        _parse(text)
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}'. Use YYYY-MM-DD")
+    return text
+
+
+def day_number(value):
+    # Days since 1970-01-01, as stored in the `day` column
+    text = parse_date(value)
+    return _parse(text).toordinal() - _EPOCH
@@ -1,142 +1,442 @@
 import sqlite3
 import os
+import queue
+import re
+import threading
+import time
+import weakref
+from contextlib import contextmanager
 from datetime import datetime
 
+from config.config import DATABASE_CONFIG
+from app.migrations import migrate
+from app.profiler import ProfiledConnection, profiler
+
+SQLITE_CONFIG = DATABASE_CONFIG['sqlite']
+DB_PATH = SQLITE_CONFIG['db_path']
+
+# Pool sizing. Commands only ever need one connection per thread (nested
+# borrows reuse it), so a handful is plenty for the CLI and Streamlit.
+POOL_MAX_SIZE = 5
+POOL_TIMEOUT = 10.0
+POOL_HEALTH_CHECK_INTERVAL = 30.0
+
+# Values allowed for each PRAGMA in a profile. They are interpolated into the
+# PRAGMA statement, so anything not listed here is rejected.
+_PRAGMA_CHOICES = {
+    'journal_mode': ('delete', 'truncate', 'persist', 'memory', 'wal', 'off'),
+    'synchronous': ('off', 'normal', 'full', 'extra'),
+    'temp_store': ('default', 'file', 'memory'),
+}
+_PRAGMA_INTEGERS = ('busy_timeout', 'cache_size', 'mmap_size')
+
+# busy_timeout goes first so that switching journal_mode waits for the lock
+_PRAGMA_ORDER = ('busy_timeout', 'journal_mode', 'synchronous', 'cache_size',
+                 'mmap_size', 'temp_store', 'foreign_keys')
+
+def get_profile(name=None):
+    name = (name or os.environ.get('EXPENSES_DB_PROFILE')
+            or SQLITE_CONFIG.get('profile', 'durable'))
+    profiles = SQLITE_CONFIG.get('profiles', {})
+    if name not in profiles:
+        raise ValueError(f"Unknown database profile '{name}'. "
+                         f"Available profiles: {', '.join(profiles)}")
+    return profiles[name]
+
+def apply_profile(conn, name=None):
+    profile = get_profile(name)
+    for pragma in _PRAGMA_ORDER:
+        if pragma not in profile:
+            continue
+        value = profile[pragma]
+        if pragma in _PRAGMA_CHOICES:
+            value = str(value).lower()
+            if value not in _PRAGMA_CHOICES[pragma]:
+                raise ValueError(f"Invalid value '{value}' for PRAGMA {pragma}")
+        elif pragma in _PRAGMA_INTEGERS:
+            value = int(value)
+        else:
+            value = 'ON' if value else 'OFF'
+        conn.execute(f"PRAGMA {pragma} = {value}")
+
+@contextmanager
+def profile_override(conn, name):
+    # Temporarily switch a connection to another profile, e.g. 'bulk-load'
+    # around a large import, and restore the configured one afterwards.
+    # SQLite refuses some of the PRAGMAs inside a transaction, so an open one
+    # (e.g. a script batch, which applied its own profile) keeps its settings.
+    if conn.in_transaction:
+        yield conn
+        return
+    apply_profile(conn, name)
+    try:
+        yield conn
+    finally:
+        apply_profile(conn)
+
+# BEGIN ..., COMMIT, END and a plain ROLLBACK, but not ROLLBACK TO
+_TRANSACTION_STATEMENT = re.compile(
+    r"\s*(BEGIN|COMMIT|END|ROLLBACK)\b(?!(?:\s+TRANSACTION)?\s+TO\b)", re.IGNORECASE)
+
+
+class BatchConnection(ProfiledConnection):
+    """Connection that can run many commands in one transaction.
+
+    Between begin_batch() and end_batch() (see app.script) a transaction
+    stays open: the BEGIN, COMMIT and END statements and commit() calls of
+    the commands are ignored, and their ROLLBACK statements and rollback()
+    only undo the current command, back to the savepoint taken by
+    begin_command(). commit_batch() commits for real and opens the next
+    transaction.
+    """
+
+    _batch = False
+
+    def execute(self, sql, parameters=()):
+        if self._batch:
+            statement = _TRANSACTION_STATEMENT.match(sql)
+            if statement:
+                # ROLLBACK TO <savepoint> does not match and runs as usual
+                if statement.group(1).upper() == 'ROLLBACK':
+                    self.rollback()
+                return self.cursor()
+        return super().execute(sql, parameters)
+
+    def commit(self):
+        if not self._batch:
+            super().commit()
+
+    def rollback(self):
+        if not self._batch:
+            return super().rollback()
+        super().execute("ROLLBACK TO batch_command")
+        _notify_rollback()
+
+    def begin_batch(self):
+        if self.in_transaction:
+            super().commit()
+        super().execute("BEGIN IMMEDIATE")
+        self._batch = True
+
+    def commit_batch(self):
+        super().commit()
+        super().execute("BEGIN IMMEDIATE")
+
+    def end_batch(self, commit=True):
+        self._batch = False
+        if commit:
+            super().commit()
+        else:
+            super().rollback()
+            _notify_rollback()
+
+    def begin_command(self):
+        super().execute("SAVEPOINT batch_command")
+
+    def end_command(self, ok=True):
+        if not ok:
+            super().execute("ROLLBACK TO batch_command")
+            _notify_rollback()
+        super().execute("RELEASE batch_command")
+
+
 def get_db_connection():
-    conn = sqlite3.connect('db/expenses.db')
+    # Opens a brand new connection. Commands should borrow from the pool via
+    # db_connection() instead; this is kept for one-off scripts.
+    # ProfiledConnection reports to app.profiler while profiling is on
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, factory=BatchConnection)
     conn.row_factory = sqlite3.Row
+    apply_profile(conn)
     return conn
 
-def initialize_db():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-    PRAGMA foreign_keys = ON;
-    """)
-    
-    # Users table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        uid INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL,
-        role TEXT CHECK(role IN ('Admin', 'User')) NOT NULL
-    )""")
-
-    # Categories table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS categories (
-        cid INTEGER PRIMARY KEY AUTOINCREMENT,
-        category_name TEXT UNIQUE NOT NULL CHECK(category_name =LOWER(category_name))
-    )""")
-
-    # Payment methods table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS payment_methods (
-        pid INTEGER PRIMARY KEY AUTOINCREMENT,
-        method TEXT NOT NULL
-    )""")
-
-    # Expenses table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS expenses (
-        eid INTEGER PRIMARY KEY AUTOINCREMENT,
-        uid INTEGER NOT NULL,
-        amount REAL NOT NULL CHECK(amount >= 0),
-        cid INTEGER NOT NULL,
-        pid INTEGER NOT NULL,
-        date TEXT NOT NULL,
-        description TEXT,
-        FOREIGN KEY(uid) REFERENCES users(uid),
-        FOREIGN KEY(cid) REFERENCES categories(cid) ON DELETE RESTRICT,
-        FOREIGN KEY(pid) REFERENCES payment_methods(pid) ON DELETE RESTRICT
-    )""")
-
-    # TAG table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS tags(
-        tid INTEGER PRIMARY KEY AUTOINCREMENT,
-        tag_name TEXT UNIQUE NOT NULL CHECK(tag_name = LOWER(tag_name))
-    )""")
-
-    # Expense_TAG relationship table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS expenses_tags
-    (
-        tid INTEGER NOT NULL,
-        eid INTEGER NOT NULL,
-        PRIMARY KEY (eid, tid),
-        FOREIGN KEY(tid) REFERENCES tags(tid) ON DELETE RESTRICT,
-        FOREIGN KEY(eid) REFERENCES expenses(eid) ON DELETE RESTRICT
-    )
-    """)
-
-    # Expenses group
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS groups(
-        gid INTEGER PRIMARY KEY AUTOINCREMENT,
-        date_created TEXT NOT NULL,
-        group_name TEXT UNIQUE NOT NULL,
-        description TEXT
-    )""")
-
-    # Expenses table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS user_group (
-        uid INTEGER NOT NULL,
-        gid INTEGER NOT NULL,
-        PRIMARY KEY (uid, gid),
-        FOREIGN KEY(uid) REFERENCES users(uid) ON DELETE RESTRICT,
-        FOREIGN KEY(gid) REFERENCES groups(gid) ON DELETE RESTRICT
-    )""")
-    
-    # Expenses table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS group_expenses (
-        geid INTEGER PRIMARY KEY AUTOINCREMENT,
-        uid INTEGER NOT NULL,
-        gid INTEGER NOT NULL,
-        amount REAL NOT NULL CHECK(amount >= 0),
-        cid INTEGER NOT NULL,
-        pid INTEGER NOT NULL,
-        date TEXT NOT NULL,
-        description TEXT,
-        FOREIGN KEY(uid) REFERENCES users(uid) ON DELETE RESTRICT,
-        FOREIGN KEY(gid) REFERENCES groups(gid) ON DELETE RESTRICT,
-        FOREIGN KEY(cid) REFERENCES categories(cid) ON DELETE RESTRICT,
-        FOREIGN KEY(pid) REFERENCES payment_methods(pid) ON DELETE RESTRICT
-    )""")
-
-        # Expenses table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS split_users (
-            geid INTEGER NOT NULL,
-            uid INTEGER NOT NULL,
-            split_amount REAL NOT NULL CHECK(split_amount >= 0),
-            PRIMARY KEY (uid, geid),
-            FOREIGN KEY(uid) REFERENCES users(uid) ON DELETE RESTRICT,
-            FOREIGN KEY(geid) REFERENCES group_expenses(geid) ON DELETE RESTRICT
-        );
-    """)
-
-    # GROUP_TAG table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS group_expense_tags(
-        tid INTEGER NOT NULL,
-        geid INTEGER NOT NULL,
-        PRIMARY KEY (geid, tid),
-        FOREIGN KEY(tid) REFERENCES tags(tid) ON DELETE RESTRICT,
-        FOREIGN KEY(geid) REFERENCES group_expenses(geid) ON DELETE RESTRICT
-    )""")
 
-    try:
-        cursor.execute("""
-        INSERT INTO users (username, password, role)
-        VALUES ('admin', 'admin123', 'Admin')
-        """)
-    except sqlite3.IntegrityError:
-        pass
-    
-    conn.commit()
-    conn.close()
\ No newline at end of file
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of ready-configured SQLite connections.
+
+    Connections are created lazily up to max_size. Idle connections are
+    health-checked before being handed out again, and any transaction left
+    open by a borrower is rolled back when the connection is returned.
+    """
+
+    def __init__(self, factory, max_size=POOL_MAX_SIZE, timeout=POOL_TIMEOUT,
+                 health_check_interval=POOL_HEALTH_CHECK_INTERVAL):
+        self._factory = factory
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._size = 0
+        self._last_used = {}
+        self._closed = False
+
+        self._stats = {
+            'created': 0,
+            'borrowed': 0,
+            'reused': 0,
+            'nested_borrows': 0,
+            'discarded': 0,
+            'health_checks': 0,
+            'failed_health_checks': 0,
+            'rollbacks_on_release': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'timeouts': 0,
+            'in_use': 0,
+            'peak_in_use': 0,
+        }
+
+    def _create(self):
+        conn = self._factory()
+        with self._lock:
+            self._stats['created'] += 1
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._size -= 1
+            self._stats['discarded'] += 1
+            self._last_used.pop(id(conn), None)
+
+    def _is_healthy(self, conn):
+        idle_for = time.monotonic() - self._last_used.get(id(conn), 0)
+        if idle_for < self.health_check_interval:
+            return True
+        with self._lock:
+            self._stats['health_checks'] += 1
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            with self._lock:
+                self._stats['failed_health_checks'] += 1
+            return False
+
+    def acquire(self):
+        if self._closed:
+            raise PoolTimeout("Connection pool is closed")
+
+        # Reuse an idle connection if one is available
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if self._is_healthy(conn):
+                with self._lock:
+                    self._stats['reused'] += 1
+                return self._checked_out(conn)
+            self._discard(conn)
+
+        # Grow the pool while we are under the limit
+        with self._lock:
+            can_grow = self._size < self.max_size
+            if can_grow:
+                self._size += 1
+        if can_grow:
+            try:
+                return self._checked_out(self._create())
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                raise
+
+        # Otherwise wait for another borrower to give one back
+        start = time.monotonic()
+        with self._lock:
+            self._stats['waits'] += 1
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise PoolTimeout(
+                f"No database connection available after {self.timeout}s "
+                f"(pool size {self.max_size})")
+        finally:
+            with self._lock:
+                self._stats['wait_time'] += time.monotonic() - start
+
+        if not self._is_healthy(conn):
+            self._discard(conn)
+            return self.acquire()
+        with self._lock:
+            self._stats['reused'] += 1
+        return self._checked_out(conn)
+
+    def _checked_out(self, conn):
+        with self._lock:
+            self._stats['borrowed'] += 1
+            self._stats['in_use'] += 1
+            self._stats['peak_in_use'] = max(self._stats['peak_in_use'],
+                                             self._stats['in_use'])
+        return conn
+
+    def release(self, conn):
+        with self._lock:
+            self._stats['in_use'] -= 1
+
+        # Never hand out a connection with someone else's open transaction
+        if conn.in_transaction:
+            try:
+                conn.rollback()
+                with self._lock:
+                    self._stats['rollbacks_on_release'] += 1
+            except sqlite3.Error:
+                self._discard(conn)
+                return
+            finally:
+                _notify_rollback()
+
+        if self._closed:
+            self._discard(conn)
+            return
+
+        self._last_used[id(conn)] = time.monotonic()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        # Nested borrows on the same thread (e.g. a command calling
+        # check_group_permissions) share the outer connection.
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            self._local.depth += 1
+            with self._lock:
+                self._stats['nested_borrows'] += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self.acquire()
+        profiler.connection_borrowed()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self.release(conn)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+        stats['idle'] = self._idle.qsize()
+        stats['max_size'] = self.max_size
+        return stats
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+# Callbacks run after the pool rolls back an abandoned transaction, so
+# in-process caches can drop anything they learned inside it.
+_rollback_listeners = []
+
+def add_rollback_listener(callback):
+    _rollback_listeners.append(callback)
+
+def _notify_rollback():
+    for callback in _rollback_listeners:
+        callback()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool, _pool_pid
+    # SQLite connections must not cross a fork. A child process (e.g. an
+    # import worker) gets a pool of its own; the inherited one is dropped
+    # without closing connections that still belong to the parent.
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ConnectionPool(get_db_connection)
+                _pool_pid = os.getpid()
+    return _pool
+
+def db_connection():
+    # Usage: with db_connection() as conn: ...
+    return get_pool().connection()
+
+def pool_stats():
+    return get_pool().stats()
+
+def close_pool():
+    global _pool, _watcher
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.close()
+        _pool = None
+    with _watcher_lock:
+        if _watcher is not None and _watcher_pid == os.getpid():
+            _watcher.close()
+        _watcher = None
+
+
+# A connection that never writes. Its PRAGMA data_version changes whenever
+# any other connection, pooled or in another process, commits a change.
+_watcher = None
+_watcher_pid = None
+_watcher_lock = threading.Lock()
+
+def data_version():
+    # In-process caches of query results compare this value to know whether
+    # the database changed since they were filled
+    global _watcher, _watcher_pid
+    with _watcher_lock:
+        if _watcher is None or _watcher_pid != os.getpid():
+            _watcher = sqlite3.connect(DB_PATH, check_same_thread=False)
+            _watcher_pid = os.getpid()
+        return _watcher.execute("PRAGMA data_version").fetchone()[0]
+
+
+class ChangeWatch:
+    """Tells a cache that keeps itself current whether others have written.
+
+    PRAGMA data_version of a connection changes when any other connection,
+    pooled or in another process, commits, but not on its own commits. A
+    cache that applies this process's writes itself calls changed(conn)
+    with the connection it reads through, and only starts over when that
+    returns True. The first call for a connection is always True.
+    """
+
+    def __init__(self):
+        self._seen = weakref.WeakKeyDictionary()  # connection -> data_version
+        self._lock = threading.Lock()
+
+    def changed(self, conn):
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        with self._lock:
+            changed = self._seen.get(conn) != version
+            self._seen[conn] = version
+        return changed
+
+
+def initialize_db():
+    # Brings the schema up to date through app.migrations. When the database
+    # is already current this only reads PRAGMA user_version.
+    with db_connection() as conn:
+        return migrate(conn)
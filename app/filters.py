@@ -0,0 +1,253 @@
+"""Filters shared by the expense listings, reports and exports.
+
+A filter is a dict such as
+
+    {'category': ['food', 'travel'], 'start_date': '2024-01-01',
+     'max_amount': 500, 'tags': 'work,trip', 'tag_mode': 'any'}
+
+compile_filters() turns it into SQL conditions on the expenses table
+(alias e) or the group_expenses table (alias ge), plus their parameters.
+Category, payment method and user names are resolved to ids through the
+dimensions cache and dates to day numbers (app.dates), so the conditions
+compare the indexed id, day and amount columns directly instead of joined
+names or expressions. Lists are
+passed as one JSON array, so the SQL text depends only on which filters
+are used (the filter "shape"), never on their values: it is built once
+per shape, and repeated queries reuse sqlite3's prepared statements.
+
+parse_filter_args() reads the same filters from CLI --flag=value
+arguments. Invalid filters raise FilterError.
+"""
+import json
+from functools import lru_cache
+
+from app.dates import day_number, parse_date
+from app.lookups import dimensions
+from app.money import Money
+from app.tag_index import tag_index
+
+# Order in which conditions are emitted; part of the shape
+FILTER_KEYS = ('category', 'payment_method', 'user', 'date', 'start_date', 'end_date',
+               'min_amount', 'max_amount', 'tags', 'text')
+
+# Filters that accept several values (a list or comma-separated names)
+_LIST_KEYS = ('category', 'payment_method', 'user', 'tags')
+
+_SCOPES = {
+    'expenses': {'alias': 'e', 'id': 'eid', 'tags': 'expenses_tags', 'fts': 'expenses_fts'},
+    'group_expenses': {'alias': 'ge', 'id': 'geid', 'tags': 'group_expense_tags', 'fts': 'group_expenses_fts'},
+}
+
+# CLI flag -> filter key
+_FLAGS = {
+    'category': 'category',
+    'payment-method': 'payment_method',
+    'user': 'user',
+    'date': 'date',
+    'from': 'start_date',
+    'to': 'end_date',
+    'min-amount': 'min_amount',
+    'max-amount': 'max_amount',
+    'tag': 'tags',
+    'tags': 'tags',
+    'tag-mode': 'tag_mode',
+    'text': 'text',
+}
+
+
+class FilterError(ValueError):
+    pass
+
+
+def _names(value):
+    names = value.split(',') if isinstance(value, str) else value
+    return [str(name).strip() for name in names if name is not None and str(name).strip()]
+
+
+def _date(value, key):
+    try:
+        return parse_date(value)
+    except ValueError:
+        raise FilterError(f"Invalid {key.replace('_', ' ')} '{value}'. Use YYYY-MM-DD")
+
+
+def _amount(value, key):
+    # Amounts are stored in paise
+    try:
+        return Money.parse(value)
+    except ValueError:
+        raise FilterError(f"Invalid {key.replace('_', ' ')} '{value}'")
+
+
+def normalize_filters(filters):
+    """Validated copy of `filters` with canonical keys and value types."""
+    result = {}
+    tag_mode = 'all'
+    for key, value in (filters or {}).items():
+        if value is None or value == '' or value == []:
+            continue
+        if key == 'tag':
+            key = 'tags'
+        if key == 'tag_mode':
+            tag_mode = str(value).lower()
+            if tag_mode not in ('all', 'any'):
+                raise FilterError("Tag mode must be 'all' or 'any'")
+            continue
+        if key not in FILTER_KEYS:
+            raise FilterError(f"Unknown filter '{key}'")
+
+        if key in _LIST_KEYS:
+            names = result.get(key, []) + _names(value)
+            if key != 'user':
+                names = [name.lower() for name in names]
+            if names:
+                result[key] = list(dict.fromkeys(names))
+        elif key in ('date', 'start_date', 'end_date'):
+            result[key] = _date(value, key)
+        elif key in ('min_amount', 'max_amount'):
+            result[key] = _amount(value, key)
+        else:
+            result[key] = str(value)
+
+    if result.get('start_date') and result.get('end_date') and result['start_date'] > result['end_date']:
+        raise FilterError("Start date must not be after end date")
+    if 'tags' in result:
+        result['tag_mode'] = tag_mode
+    return result
+
+
+@lru_cache(maxsize=None)
+def _conditions_sql(scope, shape):
+    # SQL for one filter shape: (key, variant) pairs in FILTER_KEYS order
+    s = _SCOPES[scope]
+    a = s['alias']
+    sql = []
+    for key, variant in shape:
+        if key == 'category':
+            sql.append(f"{a}.cid IN (SELECT value FROM json_each(?))")
+        elif key == 'payment_method':
+            sql.append(f"{a}.pid IN (SELECT value FROM json_each(?))")
+        elif key == 'user':
+            sql.append(f"{a}.uid IN (SELECT value FROM json_each(?))")
+        elif key == 'date':
+            sql.append(f"{a}.day = ?")
+        elif key == 'start_date':
+            sql.append(f"{a}.day >= ?")
+        elif key == 'end_date':
+            sql.append(f"{a}.day <= ?")
+        elif key == 'min_amount':
+            sql.append(f"{a}.amount >= ?")
+        elif key == 'max_amount':
+            sql.append(f"{a}.amount <= ?")
+        elif key == 'tags' and variant == 'ids':
+            # Ids already matched by the in-memory tag index
+            sql.append(f"{a}.{s['id']} IN (SELECT value FROM json_each(?))")
+        elif key == 'tags':
+            matching = (f"(SELECT COUNT(*) FROM {s['tags']} x "
+                        f"WHERE x.{s['id']} = {a}.{s['id']} AND x.tid IN (SELECT value FROM json_each(?)))")
+            sql.append(f"{matching} = ?" if variant == 'all' else f"{matching} > 0")
+        elif key == 'text':
+            sql.append(f"{a}.{s['id']} IN (SELECT rowid FROM {s['fts']} WHERE {s['fts']} MATCH ?)")
+    return tuple(sql)
+
+
+def fts_query(text):
+    # Turns free text into an FTS5 query: every word must match, and `word*`
+    # matches by prefix. Words are quoted, so FTS5 syntax typed by the user
+    # is searched for as plain text. None if there is no word to search.
+    terms = []
+    for word in str(text).split():
+        prefix = word.endswith('*')
+        word = word.rstrip('*').replace('"', '')
+        if any(ch.isalnum() for ch in word):
+            terms.append(f'"{word}"' + ('*' if prefix else ''))
+    return ' '.join(terms) or None
+
+
+def _ids(conn, kind, names):
+    ids = (dimensions.get(conn, kind, name) for name in names)
+    return [value for value in ids if value is not None]
+
+
+def compile_filters(conn, scope, filters, uid=None):
+    """Returns (conditions, params) for `filters` on `scope`.
+
+    scope is 'expenses' or 'group_expenses'. When the query is limited to
+    one user's expenses, pass that uid so tag filters can use the
+    in-memory tag index.
+    """
+    filters = normalize_filters(filters)
+    shape = []
+    params = []
+    for key in FILTER_KEYS:
+        if key not in filters:
+            continue
+        value = filters[key]
+        variant = None
+        if key == 'category':
+            params.append(json.dumps(_ids(conn, 'categories', value)))
+        elif key == 'payment_method':
+            params.append(json.dumps(_ids(conn, 'payment_methods', value)))
+        elif key == 'user':
+            params.append(json.dumps(_ids(conn, 'users', value)))
+        elif key == 'tags':
+            match_all = filters['tag_mode'] == 'all'
+            tids = [dimensions.get(conn, 'tags', name) for name in value]
+            known = [tid for tid in tids if tid is not None]
+            if scope == 'expenses' and uid is not None:
+                variant = 'ids'
+                if match_all and len(known) < len(tids):
+                    eids = []
+                else:
+                    eids = tag_index.match(conn, uid, known, match_all)
+                params.append(json.dumps(eids))
+            else:
+                variant = filters['tag_mode']
+                params.append(json.dumps(known))
+                if match_all:
+                    # An unknown tag can never be matched
+                    params.append(len(tids))
+        elif key in ('date', 'start_date', 'end_date'):
+            params.append(day_number(value))
+        elif key == 'text':
+            value = fts_query(value)
+            if value is None:
+                continue
+            params.append(value)
+        else:
+            params.append(value)
+        shape.append((key, variant))
+
+    return list(_conditions_sql(scope, tuple(shape))), params
+
+
+def parse_filter_args(args):
+    """Filters from CLI arguments like --category=food,travel --from=2024-01-01.
+
+    --amount=<min>-<max> sets both amount bounds and --date=<start>..<end>
+    a date range. Raises FilterError on anything it does not understand.
+    """
+    filters = {}
+    for arg in args:
+        if not arg.startswith('--') or '=' not in arg:
+            raise FilterError(f"Invalid filter '{arg}'. Use --name=value")
+        flag, value = arg[2:].split('=', 1)
+        flag = flag.lower()
+        if flag == 'amount':
+            if '-' not in value:
+                raise FilterError("Invalid amount format. Use min-max")
+            filters['min_amount'], filters['max_amount'] = value.split('-', 1)
+        elif flag == 'date' and '..' in value:
+            filters['start_date'], filters['end_date'] = value.split('..', 1)
+        elif flag in _FLAGS:
+            key = _FLAGS[flag]
+            if key in _LIST_KEYS and key in filters:
+                filters[key] += ',' + value
+            else:
+                filters[key] = value
+        else:
+            raise FilterError(f"Unknown filter '--{flag}'")
+    # Fail now rather than when the query runs
+    normalize_filters(filters)
+    return filters
+
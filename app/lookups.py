@@ -0,0 +1,143 @@
+"""In-process cache for name -> id lookups of the small dimension tables.
+
+Commands resolve categories, payment methods, tags and usernames through
+the shared `dimensions` instance instead of running a SELECT per call (or
+per CSV row). Each table is loaded with a single query the first time it
+is needed.
+
+This process's own changes keep the cache current: the commands that
+change these tables invalidate the affected table, tag_map() adds the tags
+it creates, and a transaction rolled back by the connection pool drops
+everything (so ids of rows that were never committed are forgotten).
+Changes from other connections, e.g. a category deleted from the Streamlit
+app while the CLI is running, are found with app.db.ChangeWatch before
+every lookup and drop everything. A miss still triggers one reload before
+giving up.
+"""
+import threading
+
+from app.db import ChangeWatch, add_rollback_listener
+
+# kind -> query returning (key, id). Keys are normalised the same way the
+# lookups in app/commands.py always compared them.
+_SOURCES = {
+    'categories': "SELECT LOWER(category_name), cid FROM categories",
+    'payment_methods': "SELECT LOWER(method), pid FROM payment_methods",
+    'tags': "SELECT tag_name, tid FROM tags",
+    'users': "SELECT username, uid FROM users",
+}
+
+_CASE_INSENSITIVE = ('categories', 'payment_methods', 'tags')
+
+_UPSERT_BATCH = 500
+
+
+def normalize(kind, name):
+    if name is None:
+        return None
+    name = str(name).strip()
+    return name.lower() if kind in _CASE_INSENSITIVE else name
+
+
+class DimensionCache:
+    def __init__(self):
+        self._maps = {}
+        self._watch = ChangeWatch()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'loads': 0, 'resets': 0}
+
+    def _check_changes(self, conn):
+        # Another connection committed: anything cached may be stale
+        if self._watch.changed(conn):
+            with self._lock:
+                if self._maps:
+                    self.stats['resets'] += 1
+                self._maps = {}
+
+    def _load(self, conn, kind):
+        mapping = {key: value for key, value in conn.execute(_SOURCES[kind])}
+        with self._lock:
+            self._maps[kind] = mapping
+            self.stats['loads'] += 1
+        return mapping
+
+    def _mapping(self, conn, kind):
+        self._check_changes(conn)
+        mapping = self._maps.get(kind)
+        if mapping is None:
+            mapping = self._load(conn, kind)
+        return mapping
+
+    def get(self, conn, kind, name):
+        key = normalize(kind, name)
+        value = self._mapping(conn, kind).get(key)
+        if value is None:
+            # Might have been added elsewhere since we loaded
+            self.stats['misses'] += 1
+            value = self._load(conn, kind).get(key)
+        else:
+            self.stats['hits'] += 1
+        return value
+
+    def category_id(self, conn, name):
+        return self.get(conn, 'categories', name)
+
+    def payment_method_id(self, conn, name):
+        return self.get(conn, 'payment_methods', name)
+
+    def user_id(self, conn, username):
+        return self.get(conn, 'users', username)
+
+    def user_ids(self, conn, usernames):
+        # Returns {username: uid} for the usernames that exist
+        mapping = self._mapping(conn, 'users')
+        if any(normalize('users', name) not in mapping for name in usernames):
+            mapping = self._load(conn, 'users')
+        return {name: mapping[normalize('users', name)]
+                for name in usernames if normalize('users', name) in mapping}
+
+    def tag_map(self, conn, names):
+        """Resolve tag names to {normalised name: id}, creating missing tags.
+
+        Tags that are not cached are created (or found) with one upsert for
+        the whole list. Keys keep the input order, without duplicates.
+        """
+        keys = list(dict.fromkeys(key for key in (normalize('tags', name) for name in names) if key))
+        if not keys:
+            return {}
+
+        mapping = self._mapping(conn, 'tags')
+        missing = [key for key in keys if key not in mapping]
+        # Stay well below SQLite's limit on bound parameters
+        for start in range(0, len(missing), _UPSERT_BATCH):
+            batch = missing[start:start + _UPSERT_BATCH]
+            # DO UPDATE (rather than DO NOTHING) makes RETURNING report
+            # the tags that already existed as well.
+            placeholders = ", ".join("(?)" for _ in batch)
+            rows = conn.execute(f"""
+                INSERT INTO tags (tag_name) VALUES {placeholders}
+                ON CONFLICT(tag_name) DO UPDATE SET tag_name = excluded.tag_name
+                RETURNING tag_name, tid
+            """, batch).fetchall()
+            with self._lock:
+                mapping.update((row[0], row[1]) for row in rows)
+        self.stats['misses'] += len(missing)
+        self.stats['hits'] += len(keys) - len(missing)
+        return {key: mapping[key] for key in keys}
+
+    def tag_ids(self, conn, names):
+        # Ids in input order without duplicates
+        return list(self.tag_map(conn, names).values())
+
+    def invalidate(self, kind=None):
+        with self._lock:
+            if kind is None:
+                self._maps.clear()
+            else:
+                self._maps.pop(kind, None)
+
+
+dimensions = DimensionCache()
+
+# A rolled-back transaction may have created tags we already cached
+add_rollback_listener(dimensions.invalidate)
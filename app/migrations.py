@@ -0,0 +1,709 @@
+"""Versioned schema migrations.
+
+The schema version lives in PRAGMA user_version. Each migration is a
+function that receives an open connection; migrate() runs every pending
+step in order, each inside its own transaction together with the bump of
+user_version, so a failed step leaves the database at the previous
+version. When the database is already current, migrate() only reads
+user_version.
+
+To change the schema, append a new (version, description, function) entry
+to MIGRATIONS. Never edit a migration that has already shipped.
+"""
+import sqlite3
+
+from app.dates import DAY_SQL, MONTH_SQL
+from app.money import Money
+
+# Junction tables are keyed by their composite primary key, so they are
+# stored WITHOUT ROWID. Shared by the base schema and the rebuild step.
+JUNCTION_TABLES = {
+    # Expense_TAG relationship table
+    'expenses_tags': """(
+        tid INTEGER NOT NULL,
+        eid INTEGER NOT NULL,
+        PRIMARY KEY (eid, tid),
+        FOREIGN KEY(tid) REFERENCES tags(tid) ON DELETE RESTRICT,
+        FOREIGN KEY(eid) REFERENCES expenses(eid) ON DELETE RESTRICT
+    ) WITHOUT ROWID""",
+
+    # Group membership
+    'user_group': """(
+        uid INTEGER NOT NULL,
+        gid INTEGER NOT NULL,
+        PRIMARY KEY (uid, gid),
+        FOREIGN KEY(uid) REFERENCES users(uid) ON DELETE RESTRICT,
+        FOREIGN KEY(gid) REFERENCES groups(gid) ON DELETE RESTRICT
+    ) WITHOUT ROWID""",
+
+    # Split of a group expense between users
+    'split_users': """(
+        geid INTEGER NOT NULL,
+        uid INTEGER NOT NULL,
+        split_amount REAL NOT NULL CHECK(split_amount >= 0),
+        PRIMARY KEY (uid, geid),
+        FOREIGN KEY(uid) REFERENCES users(uid) ON DELETE RESTRICT,
+        FOREIGN KEY(geid) REFERENCES group_expenses(geid) ON DELETE RESTRICT
+    ) WITHOUT ROWID""",
+
+    # GROUP_TAG table
+    'group_expense_tags': """(
+        tid INTEGER NOT NULL,
+        geid INTEGER NOT NULL,
+        PRIMARY KEY (geid, tid),
+        FOREIGN KEY(tid) REFERENCES tags(tid) ON DELETE RESTRICT,
+        FOREIGN KEY(geid) REFERENCES group_expenses(geid) ON DELETE RESTRICT
+    ) WITHOUT ROWID""",
+}
+
+# Secondary indexes, designed around the queries in app/commands.py.
+# The junction tables are WITHOUT ROWID, so their primary key is the table
+# itself and each reverse-key index below is covering.
+INDEXES = [
+    # list_expenses, report_top_expenses, report_monthly_category_spending:
+    # WHERE uid = ? [AND date BETWEEN ...] ORDER BY date / amount
+    ("idx_expenses_uid_date_amount", "expenses(uid, date, amount)"),
+    # Per-user breakdowns by category and payment method
+    ("idx_expenses_uid_cid_amount", "expenses(uid, cid, amount)"),
+    ("idx_expenses_uid_pid_amount", "expenses(uid, pid, amount)"),
+    # Category averages in report_above_average_expenses
+    ("idx_expenses_cid_amount", "expenses(cid, amount)"),
+    # Every group report filters on gid
+    ("idx_group_expenses_gid_date", "group_expenses(gid, date)"),
+    # Junction tables probed by their second key column
+    ("idx_expenses_tags_tid_eid", "expenses_tags(tid, eid)"),
+    ("idx_group_expense_tags_tid_geid", "group_expense_tags(tid, geid)"),
+    ("idx_split_users_geid_uid", "split_users(geid, uid)"),
+    ("idx_user_group_gid_uid", "user_group(gid, uid)"),
+]
+
+
+# Monthly rollups of expenses, kept current by the triggers below so the
+# monthly reports read a few rows per user-month instead of every expense.
+# The month is the 'YYYY-MM' prefix of the ISO date.
+ROLLUP_TABLES = {
+    # User x month x category
+    'monthly_category_totals': """(
+        uid INTEGER NOT NULL,
+        month TEXT NOT NULL,
+        cid INTEGER NOT NULL,
+        total REAL NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (uid, month, cid)
+    ) WITHOUT ROWID""",
+
+    # Month x user, for the per-month rankings
+    'monthly_user_totals': """(
+        month TEXT NOT NULL,
+        uid INTEGER NOT NULL,
+        total REAL NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (month, uid)
+    ) WITHOUT ROWID""",
+}
+
+# Statements that add (sign +) or remove (sign -) one expense row, taken
+# from NEW or OLD, to every rollup table. month is the SQL for the row's
+# month: its stored month column from version 8 on, substr() before.
+def _rollup_statements(row, sign, month=None):
+    month = month or f"substr({row}.date, 1, 7)"
+    if sign == '+':
+        return f"""
+        INSERT INTO monthly_category_totals (uid, month, cid, total, count)
+        VALUES ({row}.uid, {month}, {row}.cid, {row}.amount, 1)
+        ON CONFLICT (uid, month, cid) DO UPDATE
+            SET total = total + excluded.total, count = count + 1;
+        INSERT INTO monthly_user_totals (month, uid, total, count)
+        VALUES ({month}, {row}.uid, {row}.amount, 1)
+        ON CONFLICT (month, uid) DO UPDATE
+            SET total = total + excluded.total, count = count + 1;"""
+    return f"""
+        UPDATE monthly_category_totals
+            SET total = total - {row}.amount, count = count - 1
+            WHERE uid = {row}.uid AND month = {month} AND cid = {row}.cid;
+        DELETE FROM monthly_category_totals
+            WHERE uid = {row}.uid AND month = {month} AND cid = {row}.cid
+            AND count <= 0;
+        UPDATE monthly_user_totals
+            SET total = total - {row}.amount, count = count - 1
+            WHERE month = {month} AND uid = {row}.uid;
+        DELETE FROM monthly_user_totals
+            WHERE month = {month} AND uid = {row}.uid AND count <= 0;"""
+
+
+def _rollup_triggers(stored_month=False):
+    old_month = 'OLD.month' if stored_month else None
+    new_month = 'NEW.month' if stored_month else None
+    return {
+        'trg_expenses_rollup_insert': f"""AFTER INSERT ON expenses BEGIN
+        {_rollup_statements('NEW', '+', new_month)}
+    END""",
+        'trg_expenses_rollup_delete': f"""AFTER DELETE ON expenses BEGIN
+        {_rollup_statements('OLD', '-', old_month)}
+    END""",
+        'trg_expenses_rollup_update': f"""AFTER UPDATE OF uid, amount, cid, date ON expenses BEGIN
+        {_rollup_statements('OLD', '-', old_month)}
+        {_rollup_statements('NEW', '+', new_month)}
+    END""",
+    }
+
+
+def _has_column(conn, table, column):
+    # table_xinfo also lists generated columns
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_xinfo({table})"))
+
+
+def create_rollup_triggers(conn):
+    # Also needed after any rebuild of the expenses table, which drops them
+    triggers = _rollup_triggers(_has_column(conn, 'expenses', 'month'))
+    for name, body in triggers.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+
+def rebuild_rollups(conn):
+    # Recomputes every rollup table from expenses (backfill or repair).
+    # Runs inside the caller's transaction. With the stored month column
+    # the grouping streams from the (uid, month, cid, amount) index.
+    month = 'month' if _has_column(conn, 'expenses', 'month') else 'substr(date, 1, 7)'
+    conn.execute("DELETE FROM monthly_category_totals")
+    conn.execute(f"""
+        INSERT INTO monthly_category_totals (uid, month, cid, total, count)
+        SELECT uid, {month}, cid, SUM(amount), COUNT(*)
+        FROM expenses
+        GROUP BY uid, {month}, cid
+    """)
+    conn.execute("DELETE FROM monthly_user_totals")
+    conn.execute("""
+        INSERT INTO monthly_user_totals (month, uid, total, count)
+        SELECT month, uid, SUM(total), SUM(count)
+        FROM monthly_category_totals
+        GROUP BY month, uid
+    """)
+
+
+# Running count, sum and sum of squares of expense amounts per category
+# (over all users), kept current by triggers. Enough for the mean and the
+# variance: var = total_sq / count - (total / count)^2.
+CATEGORY_STATS_TABLE = """(
+    cid INTEGER PRIMARY KEY,
+    count INTEGER NOT NULL,
+    total REAL NOT NULL,
+    total_sq REAL NOT NULL
+)"""
+
+_ADD_CATEGORY_STATS = """
+        INSERT INTO category_stats (cid, count, total, total_sq)
+        VALUES (NEW.cid, 1, NEW.amount, NEW.amount * NEW.amount)
+        ON CONFLICT (cid) DO UPDATE
+            SET count = count + 1, total = total + excluded.total,
+                total_sq = total_sq + excluded.total_sq;"""
+
+_REMOVE_CATEGORY_STATS = """
+        UPDATE category_stats
+            SET count = count - 1, total = total - OLD.amount,
+                total_sq = total_sq - OLD.amount * OLD.amount
+            WHERE cid = OLD.cid;
+        DELETE FROM category_stats WHERE cid = OLD.cid AND count <= 0;"""
+
+CATEGORY_STATS_TRIGGERS = {
+    'trg_expenses_stats_insert': f"""AFTER INSERT ON expenses BEGIN
+        {_ADD_CATEGORY_STATS}
+    END""",
+    'trg_expenses_stats_delete': f"""AFTER DELETE ON expenses BEGIN
+        {_REMOVE_CATEGORY_STATS}
+    END""",
+    'trg_expenses_stats_update': f"""AFTER UPDATE OF amount, cid ON expenses BEGIN
+        {_REMOVE_CATEGORY_STATS}
+        {_ADD_CATEGORY_STATS}
+    END""",
+}
+
+
+def create_category_stats_triggers(conn):
+    for name, body in CATEGORY_STATS_TRIGGERS.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+
+def rebuild_category_stats(conn):
+    conn.execute("DELETE FROM category_stats")
+    conn.execute("""
+        INSERT INTO category_stats (cid, count, total, total_sq)
+        SELECT cid, COUNT(*), SUM(amount), TOTAL(amount * amount)
+        FROM expenses
+        GROUP BY cid
+    """)
+
+
+# Total and count of expenses per user and payment method, kept current by
+# triggers, so the dashboard finds the most used method without counting
+# the user's expenses.
+PAYMENT_TOTALS_TABLE = """(
+    uid INTEGER NOT NULL,
+    pid INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (uid, pid)
+) WITHOUT ROWID"""
+
+_ADD_PAYMENT_TOTALS = """
+        INSERT INTO payment_method_totals (uid, pid, total, count)
+        VALUES (NEW.uid, NEW.pid, NEW.amount, 1)
+        ON CONFLICT (uid, pid) DO UPDATE
+            SET total = total + excluded.total, count = count + 1;"""
+
+_REMOVE_PAYMENT_TOTALS = """
+        UPDATE payment_method_totals
+            SET total = total - OLD.amount, count = count - 1
+            WHERE uid = OLD.uid AND pid = OLD.pid;
+        DELETE FROM payment_method_totals
+            WHERE uid = OLD.uid AND pid = OLD.pid AND count <= 0;"""
+
+PAYMENT_TOTALS_TRIGGERS = {
+    'trg_expenses_payment_insert': f"""AFTER INSERT ON expenses BEGIN
+        {_ADD_PAYMENT_TOTALS}
+    END""",
+    'trg_expenses_payment_delete': f"""AFTER DELETE ON expenses BEGIN
+        {_REMOVE_PAYMENT_TOTALS}
+    END""",
+    'trg_expenses_payment_update': f"""AFTER UPDATE OF uid, amount, pid ON expenses BEGIN
+        {_REMOVE_PAYMENT_TOTALS}
+        {_ADD_PAYMENT_TOTALS}
+    END""",
+}
+
+
+def create_payment_totals_triggers(conn):
+    for name, body in PAYMENT_TOTALS_TRIGGERS.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+
+def rebuild_payment_totals(conn):
+    # Streams from the (uid, pid, amount) index
+    conn.execute("DELETE FROM payment_method_totals")
+    conn.execute("""
+        INSERT INTO payment_method_totals (uid, pid, total, count)
+        SELECT uid, pid, SUM(amount), COUNT(*)
+        FROM expenses
+        GROUP BY uid, pid
+    """)
+
+
+# Full-text indexes over the descriptions. They are external-content
+# FTS5 tables (the text is read back from the base table), so the index
+# only stores tokens; prefix='2 3' indexes short prefixes for `term*`.
+FTS_TABLES = {
+    'expenses_fts': ('expenses', 'eid'),
+    'group_expenses_fts': ('group_expenses', 'geid'),
+}
+
+
+def _fts_triggers(fts_table, table, key):
+    insert = f"INSERT INTO {fts_table} (rowid, description) VALUES (NEW.{key}, NEW.description);"
+    delete = (f"INSERT INTO {fts_table} ({fts_table}, rowid, description) "
+              f"VALUES ('delete', OLD.{key}, OLD.description);")
+    return {
+        f'trg_{table}_fts_insert': f"AFTER INSERT ON {table} BEGIN {insert} END",
+        f'trg_{table}_fts_delete': f"AFTER DELETE ON {table} BEGIN {delete} END",
+        f'trg_{table}_fts_update': f"AFTER UPDATE OF description ON {table} BEGIN {delete} {insert} END",
+    }
+
+
+def create_fts_triggers(conn):
+    for fts_table, (table, key) in FTS_TABLES.items():
+        for name, body in _fts_triggers(fts_table, table, key).items():
+            conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+
+def rebuild_fts(conn):
+    # Re-reads every description from the base tables
+    for fts_table in FTS_TABLES:
+        conn.execute(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')")
+
+
+# Money columns hold INTEGER paise from step 7 on (see app/money.py), so
+# the tables that have them are redefined here. Earlier steps keep the
+# REAL definitions they shipped with; step 7 converts their rows.
+PAISE_TABLES = {
+    'expenses': """(
+        eid INTEGER PRIMARY KEY AUTOINCREMENT,
+        uid INTEGER NOT NULL,
+        amount INTEGER NOT NULL CHECK(amount >= 0),
+        cid INTEGER NOT NULL,
+        pid INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        description TEXT,
+        FOREIGN KEY(uid) REFERENCES users(uid),
+        FOREIGN KEY(cid) REFERENCES categories(cid) ON DELETE RESTRICT,
+        FOREIGN KEY(pid) REFERENCES payment_methods(pid) ON DELETE RESTRICT
+    )""",
+    'group_expenses': """(
+        geid INTEGER PRIMARY KEY AUTOINCREMENT,
+        uid INTEGER NOT NULL,
+        gid INTEGER NOT NULL,
+        amount INTEGER NOT NULL CHECK(amount >= 0),
+        cid INTEGER NOT NULL,
+        pid INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        description TEXT,
+        FOREIGN KEY(uid) REFERENCES users(uid) ON DELETE RESTRICT,
+        FOREIGN KEY(gid) REFERENCES groups(gid) ON DELETE RESTRICT,
+        FOREIGN KEY(cid) REFERENCES categories(cid) ON DELETE RESTRICT,
+        FOREIGN KEY(pid) REFERENCES payment_methods(pid) ON DELETE RESTRICT
+    )""",
+    'split_users': """(
+        geid INTEGER NOT NULL,
+        uid INTEGER NOT NULL,
+        split_amount INTEGER NOT NULL CHECK(split_amount >= 0),
+        PRIMARY KEY (uid, geid),
+        FOREIGN KEY(uid) REFERENCES users(uid) ON DELETE RESTRICT,
+        FOREIGN KEY(geid) REFERENCES group_expenses(geid) ON DELETE RESTRICT
+    ) WITHOUT ROWID""",
+    'monthly_category_totals': """(
+        uid INTEGER NOT NULL,
+        month TEXT NOT NULL,
+        cid INTEGER NOT NULL,
+        total INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (uid, month, cid)
+    ) WITHOUT ROWID""",
+    'monthly_user_totals': """(
+        month TEXT NOT NULL,
+        uid INTEGER NOT NULL,
+        total INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (month, uid)
+    ) WITHOUT ROWID""",
+    # The sum of squares can outgrow a 64-bit integer, so it stays REAL
+    'category_stats': """(
+        cid INTEGER PRIMARY KEY,
+        count INTEGER NOT NULL,
+        total INTEGER NOT NULL,
+        total_sq REAL NOT NULL
+    )""",
+}
+
+# Rupees (REAL) -> paise, per converted column
+_TO_PAISE = "CAST(ROUND({column} * 100) AS INTEGER)"
+PAISE_COLUMNS = {
+    'expenses': ['amount'],
+    'group_expenses': ['amount'],
+    'split_users': ['split_amount'],
+}
+
+
+# From version 8 the expense tables carry generated day numbers and month
+# keys (see app/dates.py), which date filters, date ordering and monthly
+# grouping use instead of the date text.
+DATE_KEY_TABLES = {
+    'expenses': f"""(
+        eid INTEGER PRIMARY KEY AUTOINCREMENT,
+        uid INTEGER NOT NULL,
+        amount INTEGER NOT NULL CHECK(amount >= 0),
+        cid INTEGER NOT NULL,
+        pid INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        description TEXT,
+        day INTEGER GENERATED ALWAYS AS ({DAY_SQL}) STORED,
+        month TEXT GENERATED ALWAYS AS ({MONTH_SQL}) STORED,
+        FOREIGN KEY(uid) REFERENCES users(uid),
+        FOREIGN KEY(cid) REFERENCES categories(cid) ON DELETE RESTRICT,
+        FOREIGN KEY(pid) REFERENCES payment_methods(pid) ON DELETE RESTRICT
+    )""",
+    'group_expenses': f"""(
+        geid INTEGER PRIMARY KEY AUTOINCREMENT,
+        uid INTEGER NOT NULL,
+        gid INTEGER NOT NULL,
+        amount INTEGER NOT NULL CHECK(amount >= 0),
+        cid INTEGER NOT NULL,
+        pid INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        description TEXT,
+        day INTEGER GENERATED ALWAYS AS ({DAY_SQL}) STORED,
+        month TEXT GENERATED ALWAYS AS ({MONTH_SQL}) STORED,
+        FOREIGN KEY(uid) REFERENCES users(uid) ON DELETE RESTRICT,
+        FOREIGN KEY(gid) REFERENCES groups(gid) ON DELETE RESTRICT,
+        FOREIGN KEY(cid) REFERENCES categories(cid) ON DELETE RESTRICT,
+        FOREIGN KEY(pid) REFERENCES payment_methods(pid) ON DELETE RESTRICT
+    )""",
+}
+
+DATE_KEY_INDEXES = [
+    # Listings, date ranges and date ordering: WHERE uid = ? [AND day ...]
+    # ORDER BY day, eid. The rowid (eid) follows day in the index, so both
+    # sort keys come from it.
+    ("idx_expenses_uid_day", "expenses(uid, day)"),
+    # Monthly grouping per user and category, read from the index alone
+    ("idx_expenses_uid_month_cid_amount", "expenses(uid, month, cid, amount)"),
+    ("idx_group_expenses_gid_day", "group_expenses(gid, day)"),
+]
+
+# Replaced by the day indexes above
+DATE_INDEXES = ["idx_expenses_uid_date_amount", "idx_group_expenses_gid_date"]
+
+
+def create_indexes(conn):
+    indexes = INDEXES
+    if _has_column(conn, 'expenses', 'day'):
+        indexes = [index for index in INDEXES if index[0] not in DATE_INDEXES] + DATE_KEY_INDEXES
+    for name, target in indexes:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+
+def _is_without_rowid(conn, table):
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                       (table,)).fetchone()
+    return row is not None and 'WITHOUT ROWID' in row[0].upper()
+
+
+def rebuild_table(conn, table, body, expressions=None):
+    # Standard SQLite table rebuild: copy into a table with the new
+    # definition, drop the old one and rename. Indexes and triggers on the
+    # table are dropped with it, so callers recreate them afterwards.
+    # expressions maps a column to the SQL that computes its new value.
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    column_list = ", ".join(columns)
+    select_list = ", ".join((expressions or {}).get(column, column) for column in columns)
+    conn.execute(f"DROP TABLE IF EXISTS {table}_new")
+    conn.execute(f"CREATE TABLE {table}_new {body}")
+    conn.execute(f"INSERT INTO {table}_new ({column_list}) SELECT {select_list} FROM {table}")
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+
+
+#region Migration steps
+def _v1_base_schema(conn):
+    # Users table
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        uid INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        role TEXT CHECK(role IN ('Admin', 'User')) NOT NULL
+    )""")
+
+    # Categories table
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS categories (
+        cid INTEGER PRIMARY KEY AUTOINCREMENT,
+        category_name TEXT UNIQUE NOT NULL CHECK(category_name =LOWER(category_name))
+    )""")
+
+    # Payment methods table
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS payment_methods (
+        pid INTEGER PRIMARY KEY AUTOINCREMENT,
+        method TEXT NOT NULL
+    )""")
+
+    # Expenses table
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS expenses (
+        eid INTEGER PRIMARY KEY AUTOINCREMENT,
+        uid INTEGER NOT NULL,
+        amount REAL NOT NULL CHECK(amount >= 0),
+        cid INTEGER NOT NULL,
+        pid INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        description TEXT,
+        FOREIGN KEY(uid) REFERENCES users(uid),
+        FOREIGN KEY(cid) REFERENCES categories(cid) ON DELETE RESTRICT,
+        FOREIGN KEY(pid) REFERENCES payment_methods(pid) ON DELETE RESTRICT
+    )""")
+
+    # TAG table
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS tags(
+        tid INTEGER PRIMARY KEY AUTOINCREMENT,
+        tag_name TEXT UNIQUE NOT NULL CHECK(tag_name = LOWER(tag_name))
+    )""")
+
+    # Expenses group
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS groups(
+        gid INTEGER PRIMARY KEY AUTOINCREMENT,
+        date_created TEXT NOT NULL,
+        group_name TEXT UNIQUE NOT NULL,
+        description TEXT
+    )""")
+
+    # Group expenses table
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS group_expenses (
+        geid INTEGER PRIMARY KEY AUTOINCREMENT,
+        uid INTEGER NOT NULL,
+        gid INTEGER NOT NULL,
+        amount REAL NOT NULL CHECK(amount >= 0),
+        cid INTEGER NOT NULL,
+        pid INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        description TEXT,
+        FOREIGN KEY(uid) REFERENCES users(uid) ON DELETE RESTRICT,
+        FOREIGN KEY(gid) REFERENCES groups(gid) ON DELETE RESTRICT,
+        FOREIGN KEY(cid) REFERENCES categories(cid) ON DELETE RESTRICT,
+        FOREIGN KEY(pid) REFERENCES payment_methods(pid) ON DELETE RESTRICT
+    )""")
+
+    for table, body in JUNCTION_TABLES.items():
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} {body}")
+
+    # Default administrator
+    conn.execute("""
+    INSERT OR IGNORE INTO users (username, password, role)
+    VALUES ('admin', 'admin123', 'Admin')
+    """)
+
+
+def _v2_junction_tables_without_rowid(conn):
+    # Databases created before the junction tables were WITHOUT ROWID
+    for table, body in JUNCTION_TABLES.items():
+        if not _is_without_rowid(conn, table):
+            rebuild_table(conn, table, body)
+
+
+def _v3_secondary_indexes(conn):
+    create_indexes(conn)
+    conn.execute("ANALYZE")
+
+
+def _v4_monthly_rollups(conn):
+    for table, body in ROLLUP_TABLES.items():
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} {body}")
+    create_rollup_triggers(conn)
+    rebuild_rollups(conn)
+
+
+def _v5_category_stats(conn):
+    conn.execute(f"CREATE TABLE IF NOT EXISTS category_stats {CATEGORY_STATS_TABLE}")
+    create_category_stats_triggers(conn)
+    rebuild_category_stats(conn)
+
+
+def _v6_description_search(conn):
+    for fts_table, (table, key) in FTS_TABLES.items():
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+                description, content='{table}', content_rowid='{key}',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )""")
+    create_fts_triggers(conn)
+    rebuild_fts(conn)
+
+
+def _reconcile_splits(conn):
+    # Splits computed as amount / n in floating point round to paise that
+    # can miss the total by a paisa or so. Those are reallocated from the
+    # total in proportion to the rounded shares; bigger differences were
+    # entered that way and are left alone.
+    rows = conn.execute("""
+        SELECT ge.geid, ge.amount
+        FROM group_expenses ge
+        JOIN (SELECT geid, SUM(split_amount) AS total, COUNT(*) AS n
+              FROM split_users GROUP BY geid) s ON s.geid = ge.geid
+        WHERE s.total != ge.amount AND ABS(s.total - ge.amount) <= s.n
+    """).fetchall()
+    for geid, amount in rows:
+        splits = conn.execute("SELECT uid, split_amount FROM split_users WHERE geid = ? ORDER BY uid",
+                              (geid,)).fetchall()
+        weights = [share for _, share in splits]
+        shares = Money(amount).allocate(weights if sum(weights) else [1] * len(weights))
+        conn.executemany("UPDATE split_users SET split_amount = ? WHERE geid = ? AND uid = ?",
+                         [(share, geid, uid) for (uid, _), share in zip(splits, shares)])
+
+
+def _v7_integer_money(conn):
+    for table, columns in PAISE_COLUMNS.items():
+        rebuild_table(conn, table, PAISE_TABLES[table],
+                      {column: _TO_PAISE.format(column=column) for column in columns})
+    _reconcile_splits(conn)
+    # Summaries are recomputed from the converted rows
+    for table in ('monthly_category_totals', 'monthly_user_totals', 'category_stats'):
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute(f"CREATE TABLE {table} {PAISE_TABLES[table]}")
+    # The rebuilt tables lost their indexes and triggers. Row ids are
+    # kept, so the full-text indexes stay valid.
+    create_indexes(conn)
+    create_rollup_triggers(conn)
+    create_category_stats_triggers(conn)
+    create_fts_triggers(conn)
+    rebuild_rollups(conn)
+    rebuild_category_stats(conn)
+    conn.execute("ANALYZE")
+
+
+def _v8_date_keys(conn):
+    for table, body in DATE_KEY_TABLES.items():
+        rebuild_table(conn, table, body)
+    # Same row ids, so the summaries and full-text indexes are still valid;
+    # only the dropped indexes and triggers need recreating
+    create_indexes(conn)
+    create_rollup_triggers(conn)
+    create_category_stats_triggers(conn)
+    create_fts_triggers(conn)
+    conn.execute("ANALYZE")
+
+
+def _v9_payment_method_totals(conn):
+    conn.execute(f"CREATE TABLE IF NOT EXISTS payment_method_totals {PAYMENT_TOTALS_TABLE}")
+    create_payment_totals_triggers(conn)
+    rebuild_payment_totals(conn)
+#endregion
+
+
+MIGRATIONS = [
+    (1, "Base schema", _v1_base_schema),
+    (2, "WITHOUT ROWID junction tables", _v2_junction_tables_without_rowid),
+    (3, "Secondary indexes", _v3_secondary_indexes),
+    (4, "Monthly rollup tables", _v4_monthly_rollups),
+    (5, "Category statistics", _v5_category_stats),
+    (6, "Description search", _v6_description_search),
+    (7, "Integer money amounts", _v7_integer_money),
+    (8, "Day numbers and month keys", _v8_date_keys),
+    (9, "Payment method totals", _v9_payment_method_totals),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, target=LATEST_VERSION):
+    current = get_version(conn)
+    if current >= target:
+        return current
+
+    # Table rebuilds must run with foreign key enforcement off, and that
+    # can only be changed outside a transaction.
+    foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        for version, description, step in MIGRATIONS:
+            if version <= current or version > target:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Another process may have migrated while we waited for the lock
+                if get_version(conn) >= version:
+                    conn.commit()
+                    continue
+                # Rows that were already orphaned are not this step's fault
+                before = len(conn.execute("PRAGMA foreign_key_check").fetchall())
+                step(conn)
+                after = len(conn.execute("PRAGMA foreign_key_check").fetchall())
+                if after > before:
+                    raise sqlite3.IntegrityError(
+                        f"Migration {version} ({description}) introduced "
+                        f"{after - before} foreign key violation(s)")
+                conn.execute(f"PRAGMA user_version = {int(version)}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            print(f"Applied migration {version}: {description}")
+    finally:
+        conn.execute(f"PRAGMA foreign_keys = {'ON' if foreign_keys else 'OFF'}")
+
+    return get_version(conn)
@@ -0,0 +1,67 @@
+"""Money amounts as integer paise.
+
+Amounts are stored in the database as whole paise (INTEGER columns), so
+sums are exact and splits add back up to their total. Money is an int
+subclass holding paise: sqlite3 binds it as a plain integer, and
+arithmetic on it gives plain ints. Queries turn paise back into rupees
+only for display, e.g. SELECT SUM(amount) / 100.0.
+
+Money.parse() reads rupee amounts typed by the user or found in a CSV
+file, rounding half up to the nearest paisa. allocate() and split()
+divide an amount with the largest-remainder method: every share is
+rounded down, and the paise left over go one at a time to the shares
+with the largest remainders, so the shares always sum to the total.
+"""
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+PAISE_PER_RUPEE = 100
+
+
+class Money(int):
+    @classmethod
+    def parse(cls, value):
+        # Rupees (str, int, float or Decimal) -> Money. Raises ValueError.
+        if isinstance(value, Money):
+            return value
+        try:
+            rupees = Decimal(str(value).strip())
+        except (InvalidOperation, ValueError):
+            raise ValueError(f"Invalid amount '{value}'")
+        if not rupees.is_finite():
+            raise ValueError(f"Invalid amount '{value}'")
+        return cls(int((rupees * PAISE_PER_RUPEE).to_integral_value(ROUND_HALF_UP)))
+
+    @property
+    def rupees(self):
+        return self / PAISE_PER_RUPEE
+
+    def __str__(self):
+        sign = '-' if self < 0 else ''
+        rupees, paise = divmod(abs(int(self)), PAISE_PER_RUPEE)
+        return f"{sign}{rupees}.{paise:02d}"
+
+    def __repr__(self):
+        return f"Money('{self}')"
+
+    def allocate(self, weights):
+        """Shares of this amount in proportion to `weights` (non-negative ints)."""
+        weights = list(weights)
+        total_weight = sum(weights)
+        if not weights or total_weight <= 0 or any(w < 0 for w in weights):
+            raise ValueError("Weights must be non-negative and not all zero")
+
+        shares = []
+        remainders = []
+        for i, weight in enumerate(weights):
+            share, remainder = divmod(int(self) * weight, total_weight)
+            shares.append(share)
+            remainders.append((remainder, -i))
+        left = int(self) - sum(shares)
+        # Largest remainder first; ties go to the earlier share
+        for _, i in sorted(remainders, reverse=True)[:left]:
+            shares[-i] += 1
+        return [Money(share) for share in shares]
+
+    def split(self, n):
+        # n shares as equal as possible, the larger ones first
+        return self.allocate([1] * n)
@@ -0,0 +1,280 @@
+"""Per-command profiling of the CLI.
+
+While the profiler is enabled (`profile on` in the CLI, or main.py
+--profile), every command run through app.cli.process_command records:
+
+- wall time, and how much of it was spent inside SQLite;
+- connections opened and borrowed from the pool;
+- SQL statements executed, counted by sqlite3's trace callback. SQLite
+  reports trigger programs and implicit BEGIN/COMMIT as statements too;
+- rows fetched, and the time and rows per statement text.
+
+Connections are opened as ProfiledConnection (see app.db), which times
+execute() and fetches through ProfiledCursor only while profiling or the
+slow-query log (app.slowlog) is on; otherwise it hands out plain cursors
+and the overhead is one Python call per execute(). The profiles of the
+session are kept for summary(), which the CLI `stats` command prints.
+"""
+import sqlite3
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Dict, List
+
+from app.slowlog import slow_log
+
+# Statements listed per command, and profiles kept for `stats`
+TOP_STATEMENTS = 5
+HISTORY_SIZE = 1000
+
+
+@dataclass
+class CommandProfile:
+    command: str
+    wall: float = 0.0
+    sql_time: float = 0.0
+    connections: int = 0
+    borrows: int = 0
+    statements: int = 0
+    rows: int = 0
+    # SQL text -> [executions, seconds, rows]
+    by_statement: Dict[str, List] = field(default_factory=dict)
+
+    @property
+    def name(self):
+        # 'report top_expenses 5 ...' -> 'report top_expenses'
+        words = self.command.split()
+        return ' '.join(words[:2]) if words[:1] == ['report'] else ' '.join(words[:1])
+
+    def top_statements(self, n=TOP_STATEMENTS):
+        return sorted(self.by_statement.items(), key=lambda item: item[1][1], reverse=True)[:n]
+
+    def render(self):
+        print(f"[profile] {self.wall * 1000:.2f} ms wall "
+              f"({self.sql_time * 1000:.2f} ms SQL, {(self.wall - self.sql_time) * 1000:.2f} ms Python), "
+              f"{self.statements} statements, {self.rows} rows fetched, "
+              f"{self.connections} connections opened, {self.borrows} borrowed")
+        for sql, (executions, seconds, rows) in self.top_statements():
+            text = ' '.join(sql.split())
+            if len(text) > 80:
+                text = text[:77] + '...'
+            print(f"  {seconds * 1000:9.2f} ms {executions:>5}x {rows:>7} rows  {text}")
+
+
+def _percentile(values, p):
+    # Nearest-rank percentile of a sorted list
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, int(round(p / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+class Profiler:
+    def __init__(self, history=HISTORY_SIZE):
+        self.active = False
+        self.current = None
+        self.history = deque(maxlen=history)
+
+    def enable(self):
+        self.active = True
+
+    def disable(self):
+        self.active = False
+
+    def reset(self):
+        self.history.clear()
+
+    @contextmanager
+    def command(self, text):
+        profile = CommandProfile(text)
+        self.current = profile
+        started = perf_counter()
+        try:
+            yield profile
+        finally:
+            profile.wall = perf_counter() - started
+            self.current = None
+            self.history.append(profile)
+
+    # Hooks called by the connection layer
+    def connection_opened(self):
+        if self.current is not None:
+            self.current.connections += 1
+
+    def connection_borrowed(self):
+        if self.current is not None:
+            self.current.borrows += 1
+
+    def statement_started(self, sql):
+        # sqlite3 trace callback
+        if self.current is not None:
+            self.current.statements += 1
+
+    def record(self, sql, seconds, rows=0, executions=0):
+        profile = self.current
+        if profile is None:
+            return
+        profile.sql_time += seconds
+        profile.rows += rows
+        entry = profile.by_statement.get(sql)
+        if entry is None:
+            entry = profile.by_statement[sql] = [0, 0.0, 0]
+        entry[0] += executions
+        entry[1] += seconds
+        entry[2] += rows
+
+    def summary(self):
+        """Rows of (command, runs, wall p50/p90/p99/max ms, SQL p50 ms, statements p50, rows p50).
+
+        The last row, 'all', covers every profiled command.
+        """
+        groups = {}
+        for profile in self.history:
+            groups.setdefault(profile.name, []).append(profile)
+        if self.history:
+            groups['all'] = list(self.history)
+
+        rows = []
+        for name, profiles in groups.items():
+            wall = sorted(p.wall * 1000 for p in profiles)
+            sql = sorted(p.sql_time * 1000 for p in profiles)
+            statements = sorted(p.statements for p in profiles)
+            fetched = sorted(p.rows for p in profiles)
+            rows.append((name, len(profiles), _percentile(wall, 50), _percentile(wall, 90),
+                         _percentile(wall, 99), wall[-1], _percentile(sql, 50),
+                         _percentile(statements, 50), _percentile(fetched, 50)))
+        return rows
+
+
+profiler = Profiler()
+
+
+def _instrumented():
+    return profiler.active or slow_log.enabled
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor that times its statement for the profiler and the slow-query log.
+
+    A statement is finished, and checked against the slow-query threshold,
+    when it returns no rows, its last row is fetched, fetchall() or
+    fetchone() is called, or the cursor is reused or closed.
+    """
+
+    _sql = None
+    _parameters = None
+    _elapsed = 0.0
+    _pending = False
+
+    def _start(self, sql, parameters):
+        self._finish()
+        self._sql = sql
+        self._parameters = parameters
+        self._elapsed = 0.0
+        self._pending = True
+
+    def _timed(self, seconds, rows=0, executions=0, done=False):
+        profiler.record(self._sql, seconds, rows, executions)
+        self._elapsed += seconds
+        if done:
+            self._finish()
+
+    def _finish(self):
+        if self._pending:
+            self._pending = False
+            slow_log.check(self.connection, self._sql, self._parameters, self._elapsed)
+
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters)
+        started = perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._timed(perf_counter() - started, executions=1, done=self.description is None)
+
+    def executemany(self, sql, seq_of_parameters):
+        if slow_log.enabled and not isinstance(seq_of_parameters, (list, tuple)):
+            seq_of_parameters = list(seq_of_parameters)
+        # The plan of the first row stands for all of them
+        self._start(sql, seq_of_parameters[0] if slow_log.enabled and seq_of_parameters else None)
+        started = perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._timed(perf_counter() - started, executions=1, done=True)
+
+    def fetchone(self):
+        started = perf_counter()
+        row = super().fetchone()
+        self._timed(perf_counter() - started, 0 if row is None else 1, done=True)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = perf_counter()
+        rows = super().fetchmany(size)
+        self._timed(perf_counter() - started, len(rows), done=len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        started = perf_counter()
+        rows = super().fetchall()
+        self._timed(perf_counter() - started, len(rows), done=True)
+        return rows
+
+    def __next__(self):
+        started = perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._timed(perf_counter() - started, done=True)
+            raise
+        self._timed(perf_counter() - started, 1)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """Connection that feeds the profiler and the slow-query log while either is on."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._traced = False
+        profiler.connection_opened()
+
+    def _sync_trace(self):
+        # Attach or detach the trace callback after profiling was switched
+        if self._traced != profiler.active:
+            self.set_trace_callback(profiler.statement_started if profiler.active else None)
+            self._traced = profiler.active
+
+    def cursor(self, factory=None):
+        self._sync_trace()
+        if factory is None:
+            factory = ProfiledCursor if _instrumented() else sqlite3.Cursor
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        if not (_instrumented() or self._traced):
+            return super().execute(sql, parameters)
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not (_instrumented() or self._traced):
+            return super().executemany(sql, seq_of_parameters)
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        if not _instrumented():
+            return super().commit()
+        started = perf_counter()
+        try:
+            return super().commit()
+        finally:
+            seconds = perf_counter() - started
+            profiler.record('COMMIT', seconds, executions=1)
+            slow_log.check(self, 'COMMIT', None, seconds)
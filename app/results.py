@@ -0,0 +1,130 @@
+"""Result objects returned by the report and listing commands.
+
+A Result holds the rows of a query as plain tuples together with the
+metadata of its columns. The CLI prints it with render(); the Streamlit
+app turns it into a DataFrame with to_dataframe(). Commands still return
+False (after printing the reason) when a report cannot be produced, e.g.
+for a permission error. An empty Result is falsy and carries the message
+to show instead of the table.
+
+A Page is a Result holding one page of a paginated listing, with the
+opaque cursors to pass back for the next (older) and previous (newer)
+pages; a cursor is None when there is no such page.
+
+ImportReport describes what happened to one file of a multi-file import.
+"""
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Column:
+    key: str            # column name in the query
+    label: str          # heading shown to the user
+    width: int = 15     # CLI column width
+    kind: str = 'text'  # 'text', 'int', 'money', 'date' or 'month'
+
+
+@dataclass
+class Result:
+    title: Optional[str]
+    columns: List[Column]
+    rows: List[Tuple[Any, ...]] = field(default_factory=list)
+    empty_message: str = "No data available"
+
+    @classmethod
+    def from_cursor(cls, title, columns, cursor, empty_message="No data available"):
+        # The query must select exactly the columns, in order. Plain tuples
+        # are cheaper to build and to hand over to pandas than sqlite3.Row.
+        cursor.row_factory = None
+        return cls(title, list(columns), cursor.fetchall(), empty_message)
+
+    def __bool__(self):
+        return bool(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    @property
+    def keys(self):
+        return [column.key for column in self.columns]
+
+    @property
+    def labels(self):
+        return [column.label for column in self.columns]
+
+    def column(self, key):
+        index = self.keys.index(key)
+        return [row[index] for row in self.rows]
+
+    def records(self):
+        keys = self.keys
+        return [dict(zip(keys, row)) for row in self.rows]
+
+    def to_dataframe(self):
+        import pandas as pd
+
+        df = pd.DataFrame(self.rows, columns=self.labels)
+        for column in self.columns:
+            if column.kind == 'date':
+                df[column.label] = pd.to_datetime(df[column.label], errors='coerce')
+        return df
+
+    def render(self):
+        if not self.rows:
+            print(self.empty_message)
+            return
+
+        header = " ".join("{:<{}}".format(column.label, column.width) for column in self.columns)
+        if self.title:
+            print(f"\n{self.title}:")
+        else:
+            print()
+        print(header)
+        print("-" * len(header))
+        for row in self.rows:
+            print(" ".join(_format_cell(column, value) for column, value in zip(self.columns, row)))
+        print()
+
+
+@dataclass
+class Page(Result):
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+    def render(self):
+        super().render()
+        if self.rows and (self.next_cursor or self.prev_cursor):
+            links = [name for name, cursor in (('prev', self.prev_cursor), ('next', self.next_cursor)) if cursor]
+            print(f"{len(self.rows)} rows shown. More: {', '.join(links)}")
+
+
+def _format_cell(column, value):
+    if value is None or value == '':
+        return "{:<{}}".format("-", column.width)
+    if column.kind == 'money':
+        return "₹{:<{}.2f}".format(value, column.width - 1)
+    return "{:<{}}".format(value, column.width)
+
+
+@dataclass
+class ImportReport:
+    # Outcome of one file in a multi-file import (import_files)
+    file_path: str
+    group_name: Optional[str] = None  # None for individual expenses
+    status: str = 'pending'           # 'staged', 'imported' or 'failed'
+    rows: int = 0
+    staged: int = 0
+    imported: int = 0
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+    warnings: List[Tuple[int, str]] = field(default_factory=list)
+    message: str = ''
+    stage_seconds: float = 0.0
+    staging_path: Optional[str] = None
+
+    @property
+    def rejected(self):
+        return len(self.errors)
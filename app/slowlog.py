@@ -0,0 +1,179 @@
+"""Slow-query log.
+
+When enabled, every statement that takes longer than the threshold is
+appended to a rotating log file (logging's RotatingFileHandler), one JSON
+object per line:
+
+    {"time": "...", "ms": 412.7, "sql": "SELECT ...", "params": ["int", "str"],
+     "plan": ["SCAN e", "USE TEMP B-TREE FOR ORDER BY"], "full_scans": ["e"]}
+
+The duration covers execute() and fetching the rows, up to the last row
+or the first fetchone(). Parameters are logged by type only, never by
+value. The plan is the statement's EXPLAIN QUERY PLAN, run once per SQL
+text with the same parameters; full_scans lists the tables and indexes
+it reads from end to end.
+
+Statements are timed by app.profiler.ProfiledConnection, the class of
+every pooled connection. The log is off by default: enable it with
+SLOW_QUERY_CONFIG in config/config.py, the EXPENSES_SLOW_QUERY_MS
+environment variable (the threshold in milliseconds) or the CLI command
+`slow_queries on <ms>`. `slow_queries` summarises the full-scan
+offenders found in the log.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from config.config import SLOW_QUERY_CONFIG
+
+# Statements EXPLAIN QUERY PLAN can describe
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+# Plans cached per SQL text
+_PLAN_CACHE_SIZE = 256
+
+# 'SCAN e', 'SCAN expenses USING COVERING INDEX idx_...'. Virtual tables
+# (json_each, FTS), subqueries and constant rows are not table scans.
+_SCAN = re.compile(r"^SCAN ([^\s(]\S*)(?: USING (?:COVERING )?INDEX (\S+))?$")
+
+
+def _parameter_shape(parameters):
+    # Types of the parameters, never their values
+    if parameters is None:
+        return []
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    return [type(value).__name__ for value in parameters]
+
+
+def full_scans(plan):
+    """Tables (or 'table (index)' for full index scans) read end to end in `plan`."""
+    scans = []
+    for line in plan:
+        match = _SCAN.match(line.strip())
+        if match:
+            table, index = match.groups()
+            scans.append(f"{table} ({index})" if index else table)
+    return scans
+
+
+class SlowQueryLog:
+    def __init__(self, config=SLOW_QUERY_CONFIG):
+        self.config = config
+        self.enabled = False
+        self.threshold = config['threshold_ms'] / 1000
+        self._logger = None
+        self._plans = {}
+        self._lock = threading.Lock()
+
+        threshold_ms = os.environ.get('EXPENSES_SLOW_QUERY_MS')
+        if threshold_ms:
+            self.enable(float(threshold_ms))
+        elif config['enabled']:
+            self.enable()
+
+    @property
+    def path(self):
+        return self.config['log_path']
+
+    def enable(self, threshold_ms=None):
+        if threshold_ms is not None:
+            self.threshold = threshold_ms / 1000
+        if self._logger is None:
+            logger = logging.getLogger('expenses.slow_queries')
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            if not logger.handlers:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                handler = RotatingFileHandler(self.path, maxBytes=self.config['max_bytes'],
+                                              backupCount=self.config['backup_count'])
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                logger.addHandler(handler)
+            self._logger = logger
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def _plan(self, conn, sql, parameters):
+        with self._lock:
+            plan = self._plans.get(sql)
+        if plan is not None:
+            return plan
+        if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+            return []
+        try:
+            # Plain sqlite3 execute, so the plan query is not timed itself
+            rows = sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {sql}",
+                                              parameters or ()).fetchall()
+        except sqlite3.Error as e:
+            return [f"(no plan: {e})"]
+        # (id, parent, notused, detail), indented by depth like the sqlite3 shell
+        depth = {0: -1}
+        plan = []
+        for node, parent, _, detail in rows:
+            depth[node] = depth.get(parent, -1) + 1
+            plan.append('  ' * depth[node] + detail)
+        with self._lock:
+            if len(self._plans) >= _PLAN_CACHE_SIZE:
+                self._plans.clear()
+            self._plans[sql] = plan
+        return plan
+
+    def check(self, conn, sql, parameters, seconds):
+        # Called by the connection layer when a statement has finished
+        if not self.enabled or seconds < self.threshold:
+            return
+        plan = self._plan(conn, sql, parameters)
+        self._logger.info(json.dumps({
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'ms': round(seconds * 1000, 3),
+            'sql': ' '.join(sql.split()),
+            'params': _parameter_shape(parameters),
+            'plan': plan,
+            'full_scans': full_scans(plan),
+        }))
+
+    def entries(self):
+        # Every entry still in the log, oldest file first
+        paths = [f"{self.path}.{n}" for n in range(self.config['backup_count'], 0, -1)] + [self.path]
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path) as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+    def summary(self, limit=10):
+        """Statements with full scans, slowest in total first.
+
+        Returns (rows, slow_count): rows of (sql, count, total_ms, max_ms,
+        full_scans) and the number of slow statements logged altogether.
+        """
+        offenders = {}
+        slow_count = 0
+        for entry in self.entries():
+            slow_count += 1
+            scans = entry.get('full_scans') or full_scans(entry.get('plan', []))
+            if not scans:
+                continue
+            row = offenders.setdefault(entry['sql'], [0, 0.0, 0.0, set()])
+            row[0] += 1
+            row[1] += entry['ms']
+            row[2] = max(row[2], entry['ms'])
+            row[3].update(scans)
+        rows = sorted(((sql, count, total, slowest, sorted(scans))
+                       for sql, (count, total, slowest, scans) in offenders.items()),
+                      key=lambda row: row[2], reverse=True)
+        return rows[:limit], slow_count
+
+
+slow_log = SlowQueryLog()
@@ -5,8 +5,12 @@ sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 import streamlit as st
 import pandas as pd
 from datetime import datetime
+import functools
 import tempfile
+import threading
 import os
+from config.config import LISTING_CONFIG
+from app.db import data_version
 # Update the imports at the top of the file to include update_group:
 
 from app.commands import (
@@ -27,13 +31,127 @@ from app.commands import (
     report_group_expenses, report_group_tag_usage, report_group_category_spending, 
     report_group_user_expenses, check_group_permissions,
     # Import/Export
-    import_expenses, export_csv, import_group_csv, export_group_csv,
+    import_expenses, import_files, export_csv, import_group_csv, export_group_csv,
     # Reports
     report_top_expenses, report_category_spending, report_above_average_expenses, 
-    report_monthly_category_spending, report_highest_spender_per_month,
-    report_frequent_category, report_payment_method_usage, report_tag_expenses
+    report_monthly_category_spending, report_monthly_totals, report_highest_spender_per_month,
+    report_frequent_category, report_payment_method_usage, report_tag_expenses,
+    # Dashboard
+    dashboard_summary
 )
 
+#region Query cache
+class QueryCache:
+    """Results of read-only commands, shared by every session of the app.
+
+    Each entry lists what it was read from: 'categories', 'payment_methods',
+    'tags', 'expenses', 'groups' or 'users'. A command wrapped with
+    _invalidates() drops the entries depending on what it changes when it
+    runs, and a new PRAGMA data_version (a commit from any connection,
+    e.g. the CLI) drops them all. Failed commands (False) are not cached.
+    """
+
+    def __init__(self):
+        self._entries = {}  # key -> (depends, value)
+        self._version = None
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, key, depends, load):
+        version = data_version()
+        with self._lock:
+            if version != self._version:
+                self._entries = {}
+                self._version = version
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.stats['hits'] += 1
+                return entry[1]
+            self.stats['misses'] += 1
+        value = load()
+        if value is not False:
+            with self._lock:
+                # Not if the data changed while loading
+                if version == self._version:
+                    self._entries[key] = (depends, value)
+        return value
+
+    def invalidate(self, *groups):
+        with self._lock:
+            self._entries = {key: entry for key, entry in self._entries.items()
+                             if not set(entry[0]) & set(groups)}
+
+
+query_cache = QueryCache()
+
+
+def _cached(*depends, per_user=True):
+    # Results depending on the logged in user (permissions, own expenses)
+    # are cached per user
+    def wrap(func):
+        @functools.wraps(func)
+        def cached(*args):
+            user = (current_user['uid'], current_user['role']) if per_user else None
+            return query_cache.get((func.__name__, repr(args), user), depends, lambda: func(*args))
+        return cached
+    return wrap
+
+
+def _invalidates(*groups):
+    def wrap(func):
+        @functools.wraps(func)
+        def command(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                query_cache.invalidate(*groups)
+        return command
+    return wrap
+
+
+# Reference data for the selectboxes, read several times per render
+list_categories = _cached('categories', per_user=False)(list_categories)
+list_payment_methods = _cached('payment_methods', per_user=False)(list_payment_methods)
+list_tags = _cached('tags', per_user=False)(list_tags)
+list_users = _cached('users')(list_users)
+list_groups = _cached('groups', 'users')(list_groups)
+
+# Report results
+dashboard_summary = _cached('expenses')(dashboard_summary)
+report_top_expenses = _cached('expenses', 'tags')(report_top_expenses)
+report_category_spending = _cached('expenses')(report_category_spending)
+report_above_average_expenses = _cached('expenses')(report_above_average_expenses)
+report_monthly_category_spending = _cached('expenses')(report_monthly_category_spending)
+report_highest_spender_per_month = _cached('expenses', 'users')(report_highest_spender_per_month)
+report_frequent_category = _cached('expenses')(report_frequent_category)
+report_payment_method_usage = _cached('expenses')(report_payment_method_usage)
+report_tag_expenses = _cached('expenses', 'tags')(report_tag_expenses)
+report_group_expenses = _cached('groups', 'tags', 'users')(report_group_expenses)
+report_group_tag_usage = _cached('groups', 'tags')(report_group_tag_usage)
+report_group_category_spending = _cached('groups')(report_group_category_spending)
+report_group_user_expenses = _cached('groups', 'users')(report_group_user_expenses)
+
+# Commands and what they change. New tags can come with any expense.
+add_category = _invalidates('categories')(add_category)
+add_payment_method = _invalidates('payment_methods')(add_payment_method)
+add_tag = _invalidates('tags')(add_tag)
+delete_tag = _invalidates('tags', 'expenses', 'groups')(delete_tag)
+add_expense = _invalidates('expenses', 'tags')(add_expense)
+update_expense = _invalidates('expenses', 'tags')(update_expense)
+delete_expense = _invalidates('expenses')(delete_expense)
+import_expenses = _invalidates('expenses', 'tags')(import_expenses)
+import_files = _invalidates('expenses', 'groups', 'tags')(import_files)
+create_group = _invalidates('groups')(create_group)
+update_group = _invalidates('groups')(update_group)
+delete_group = _invalidates('groups')(delete_group)
+add_user_to_group = _invalidates('groups')(add_user_to_group)
+add_group_expense = _invalidates('groups', 'tags')(add_group_expense)
+import_group_csv = _invalidates('groups', 'tags')(import_group_csv)
+add_user = _invalidates('users')(add_user)
+update_user = _invalidates('users', 'expenses', 'groups')(update_user)
+delete_user = _invalidates('users', 'expenses', 'groups')(delete_user)
+# endregion
+
 def initialize_session_state():
     """Initialize session state variables if they don't exist"""
     if 'authenticated' not in st.session_state:
@@ -46,6 +164,11 @@ def initialize_session_state():
         st.session_state.uid = None
     if 'expense_list_container' not in st.session_state:
         st.session_state.expense_list_container = None
+    # Paged expense listing: filters of the last search and the page cursor
+    if 'expense_filters' not in st.session_state:
+        st.session_state.expense_filters = None
+    if 'expense_cursor' not in st.session_state:
+        st.session_state.expense_cursor = None
 
 # Function to sync session state with current_user from commands
 def sync_user_state():
@@ -60,6 +183,20 @@ def sync_user_state():
         st.session_state.role = None
         st.session_state.uid = None
 
+# Show a Result returned by a report or listing as a table
+def display_result(result, error_message="Failed to generate report."):
+    if result is False or result is None:
+        st.error(error_message)
+        return None
+    if not result:
+        st.info(result.empty_message)
+        return None
+    df = result.to_dataframe()
+    if result.title:
+        st.markdown(f"#### {result.title}")
+    st.dataframe(df, use_container_width=True, hide_index=True)
+    return df
+
 def main():
     st.set_page_config(page_title="Expense Management System", layout="wide")
     
@@ -161,6 +298,8 @@ def display_login():
 def logout_user():
     logout()
     sync_user_state()
+    st.session_state.expense_filters = None
+    st.session_state.expense_cursor = None
     st.session_state.current_page = 'dashboard'
     st.rerun()
 
@@ -207,79 +346,22 @@ def display_dashboard():
     
     # Get expense data for the current user
     try:
-        # Capture expenses data
-        import io
-        import sys
-        from contextlib import redirect_stdout
-        from datetime import datetime, timedelta
-        import pandas as pd
-        import numpy as np
-        
-        # Get current date and calculate date ranges
-        today = datetime.today()
-        this_month_start = datetime(today.year, today.month, 1)
-        last_month_start = (this_month_start - timedelta(days=1)).replace(day=1)
-        
-        # Capture console output when calling list_expenses
-        f = io.StringIO()
-        with redirect_stdout(f):
-            list_expenses()
-        
-        output = f.getvalue()
+        # Metrics and charts are aggregated in SQL from the rollups, so the
+        # page loads in the same time however long the history is
+        summary = dashboard_summary(datetime.today().date().isoformat())
         
         # Display a welcome message and basic stats
         st.markdown(f"### Welcome back, {st.session_state.username}!")
         
-        # Parse expense data
-        lines = output.strip().split('\n')
-        expenses_data = []
-        header_idx = -1
-        
-        for i, line in enumerate(lines):
-            if "ID" in line and "Amount" in line and "Category" in line:
-                header_idx = i
-                break
-                
-        if header_idx >= 0:
-            for line in lines[header_idx+2:]:  # Skip header and separator line
-                if line.strip():
-                    parts = line.split()
-                    if len(parts) >= 6:
-                        expense_id = parts[0]
-                        amount = float(parts[1].replace('₹', '').replace(',', ''))
-                        category = parts[2]
-                        payment = parts[3]
-                        date_str = parts[4]
-                        description = ' '.join(parts[5:])
-                        
-                        try:
-                            date = datetime.strptime(date_str, '%Y-%m-%d')
-                            
-                            expenses_data.append({
-                                "ID": expense_id,
-                                "Amount": amount,
-                                "Category": category,
-                                "Payment": payment,
-                                "Date": date,
-                                "Description": description
-                            })
-                        except ValueError:
-                            # Skip entries with invalid date format
-                            pass
-        
-        if expenses_data:
-            # Convert to DataFrame for easier analysis
-            df = pd.DataFrame(expenses_data)
-            
+        if summary and summary['count']:
             # Create a row of metric cards with real data
             col1, col2, col3 = st.columns(3)
             
             # Calculate metrics
             with col1:
-                # Get most frequent category
-                if not df.empty and 'Category' in df.columns:
-                    top_category = df['Category'].value_counts().idxmax()
-                    category_count = df['Category'].value_counts().max()
+                # Most frequent category
+                if summary['top_category']:
+                    top_category, category_count = summary['top_category']
                     st.metric(
                         label="Most Used Category", 
                         value=top_category,
@@ -289,32 +371,25 @@ def display_dashboard():
                     st.metric(label="Most Used Category", value="No data")
             
             with col2:
-                # Calculate total expenses this month
-                if not df.empty and 'Date' in df.columns and 'Amount' in df.columns:
-                    df['Date'] = pd.to_datetime(df['Date'])
-                    this_month_expenses = df[df['Date'] >= this_month_start]['Amount'].sum()
-                    last_month_expenses = df[(df['Date'] >= last_month_start) & (df['Date'] < this_month_start)]['Amount'].sum()
-                    
-                    if last_month_expenses > 0:
-                        delta_percentage = ((this_month_expenses - last_month_expenses) / last_month_expenses) * 100
-                    else:
-                        delta_percentage = None
-                    
-                    st.metric(
-                        label="Total Expenses This Month", 
-                        value=f"₹{this_month_expenses:,.2f}",
-                        delta=f"{delta_percentage:.1f}% from last month" if delta_percentage is not None else None,
-                        delta_color="inverse"
-                    )
+                # Total expenses this month
+                this_month_expenses = summary['this_month']
+                last_month_expenses = summary['last_month']
+                if last_month_expenses > 0:
+                    delta_percentage = ((this_month_expenses - last_month_expenses) / last_month_expenses) * 100
                 else:
-                    st.metric(label="Total Expenses This Month", value="₹0.00")
+                    delta_percentage = None
+                
+                st.metric(
+                    label="Total Expenses This Month", 
+                    value=f"₹{this_month_expenses:,.2f}",
+                    delta=f"{delta_percentage:.1f}% from last month" if delta_percentage is not None else None,
+                    delta_color="inverse"
+                )
             
             with col3:
-                # Count payments by method
-                if not df.empty and 'Payment' in df.columns:
-                    payment_counts = df['Payment'].value_counts()
-                    top_payment = payment_counts.idxmax() if not payment_counts.empty else "None"
-                    payment_count = payment_counts.max() if not payment_counts.empty else 0
+                # Most used payment method
+                if summary['top_payment_method']:
+                    top_payment, payment_count = summary['top_payment_method']
                     st.metric(
                         label="Top Payment Method", 
                         value=top_payment,
@@ -326,27 +401,23 @@ def display_dashboard():
             # Add expense summary charts
             st.markdown("### Expense Summary")
             
-            if not df.empty:
-                tab1, tab2 = st.tabs(["Category Breakdown", "Monthly Trend"])
-                
-                with tab1:
-                    # Category breakdown chart
-                    if 'Category' in df.columns and 'Amount' in df.columns:
-                        category_totals = df.groupby('Category')['Amount'].sum().sort_values(ascending=False)
-                        st.bar_chart(category_totals)
-                
-                with tab2:
-                    # Monthly trend chart
-                    if 'Date' in df.columns and 'Amount' in df.columns:
-                        df['Month'] = df['Date'].dt.strftime('%Y-%m')
-                        monthly_totals = df.groupby('Month')['Amount'].sum()
-                        st.line_chart(monthly_totals)
+            tab1, tab2 = st.tabs(["Category Breakdown", "Monthly Trend"])
+            
+            with tab1:
+                # Category breakdown chart, largest first
+                category_totals = pd.DataFrame(summary['category_totals'], columns=['Category', 'Amount'])
+                st.bar_chart(category_totals.set_index('Category')['Amount'])
+            
+            with tab2:
+                # Monthly trend chart
+                monthly_totals = pd.DataFrame(summary['monthly_totals'], columns=['Month', 'Total Amount'])
+                st.line_chart(monthly_totals.set_index('Month')['Total Amount'])
             
             # Recent expenses table
             st.markdown("### Recent Expenses")
-            if expenses_data:
+            if summary['recent']:
                 st.dataframe(
-                    df.sort_values('Date', ascending=False).head(5),
+                    summary['recent'].to_dataframe(),
                     use_container_width=True,
                     hide_index=True
                 )
@@ -373,13 +444,13 @@ def display_expenses_page():
         filters = {}
         
         with col1:
-            category_filter = st.selectbox("Category", ["All"] + [cat["category_name"] for cat in list_categories()])
-            if category_filter != "All":
+            category_filter = st.multiselect("Categories", [cat["category_name"] for cat in list_categories()])
+            if category_filter:
                 filters["category"] = category_filter
         
         with col2:
-            payment_filter = st.selectbox("Payment Method", ["All"] + [method["method"] for method in list_payment_methods()])
-            if payment_filter != "All":
+            payment_filter = st.multiselect("Payment Methods", [method["method"] for method in list_payment_methods()])
+            if payment_filter:
                 filters["payment_method"] = payment_filter
         
         with col3:
@@ -393,28 +464,48 @@ def display_expenses_page():
                 filters["max_amount"] = max_amount
         
         # Date range filter
-        col1, col2 = st.columns(2)
+        col1, col2, col3 = st.columns([1, 1, 2])
         with col1:
-            start_date = st.date_input("Start Date", value=None)
+            start_date = st.date_input("From", value=None)
             if start_date:
-                filters["date"] = start_date.isoformat()
-                
+                filters["start_date"] = start_date.isoformat()
+
         with col2:
+            end_date = st.date_input("To", value=None)
+            if end_date:
+                filters["end_date"] = end_date.isoformat()
+                
+        with col3:
             tags = st.multiselect("Tags", [tag["tag_name"] for tag in list_tags()])
+            tag_mode = st.radio("Match", ["All selected tags", "Any selected tag"], horizontal=True)
             if tags:
-                filters["tag"] = tags[0]  # Currently only supporting one tag filter
+                filters["tags"] = tags
+                filters["tag_mode"] = 'all' if tag_mode == "All selected tags" else 'any'
+
+        search_text = st.text_input("Search descriptions", placeholder="e.g. dinner or rest* for a prefix")
+        if search_text.strip():
+            filters["text"] = search_text
         
         if st.button("Filter Expenses"):
-            # Create custom capture for list_expenses output
-            import io
-            from contextlib import redirect_stdout
-            
-            f = io.StringIO()
-            with redirect_stdout(f):
-                list_expenses(filters)
-            
-            output = f.getvalue()
-            st.text_area("Expenses", output, height=400)
+            # Start again from the newest expenses
+            st.session_state.expense_filters = filters
+            st.session_state.expense_cursor = None
+
+        if st.session_state.expense_filters is not None:
+            page = list_expenses(st.session_state.expense_filters,
+                                 LISTING_CONFIG['page_size'], st.session_state.expense_cursor)
+            display_result(page, "Failed to list expenses.")
+
+            if page:
+                col1, col2 = st.columns(2)
+                with col1:
+                    if st.button("← Newer", disabled=not page.prev_cursor):
+                        st.session_state.expense_cursor = page.prev_cursor
+                        st.rerun()
+                with col2:
+                    if st.button("Older →", disabled=not page.next_cursor):
+                        st.session_state.expense_cursor = page.next_cursor
+                        st.rerun()
     
     with tab2:
         st.markdown("### Add New Expense")
@@ -547,9 +638,6 @@ def display_reports_page():
         "Frequent Category"
     ] + (["Highest Spender Per Month"] if st.session_state.role == "Admin" else []))
     
-    import io
-    from contextlib import redirect_stdout
-    
     # Report container
     report_container = st.container()
     
@@ -567,104 +655,51 @@ def display_reports_page():
         
         if st.button("Generate Report"):
             with report_container:
-                f = io.StringIO()
-                with redirect_stdout(f):
-                    report_top_expenses(n, start_date.isoformat(), end_date.isoformat())
-                
-                st.text_area("Top Expenses Report", f.getvalue(), height=400)
+                display_result(report_top_expenses(n, start_date.isoformat(), end_date.isoformat()))
     
     elif report_type == "Category Spending":
         category = st.selectbox("Select Category", [cat["category_name"] for cat in list_categories()])
         
         if st.button("Generate Report"):
             with report_container:
-                f = io.StringIO()
-                with redirect_stdout(f):
-                    report_category_spending(category)
-                
-                output = f.getvalue()
-                st.text_area("Category Spending Report", output, height=200)
-                
-                # Try to extract the total amount for a chart
-                import re
-                amount_match = re.search(r'₹([\d.]+)', output)
-                if amount_match:
-                    amount = float(amount_match.group(1))
-                    st.bar_chart({category: amount})
+                df = display_result(report_category_spending(category))
+                if df is not None:
+                    st.bar_chart(df.set_index("Category")["Total"])
     
     elif report_type == "Above Average Expenses":
+        use_z_score = st.checkbox("Only unusually large expenses (z-score)")
+        min_z_score = st.number_input("Minimum z-score", min_value=0.0, value=2.0, step=0.5,
+                                      disabled=not use_z_score)
         if st.button("Generate Report"):
             with report_container:
-                f = io.StringIO()
-                with redirect_stdout(f):
-                    report_above_average_expenses()
-                
-                st.text_area("Above Average Expenses Report", f.getvalue(), height=400)
+                display_result(report_above_average_expenses(min_z_score if use_z_score else None))
     
     elif report_type == "Monthly Category Spending":
         if st.button("Generate Report"):
             with report_container:
-                f = io.StringIO()
-                with redirect_stdout(f):
-                    report_monthly_category_spending()
-                
-                output = f.getvalue()
-                st.text_area("Monthly Category Spending Report", output, height=400)
-                
-                # Try to parse and visualize the data
-                lines = output.strip().split('\n')
-                if len(lines) > 4:
-                    data = []
-                    for line in lines[4:]:  # Skip header and separator
-                        parts = line.split()
-                        if len(parts) >= 4:
-                            try:
-                                month = parts[0]
-                                category = parts[1]
-                                amount = float(parts[2].replace('₹', '').replace(',', ''))
-                                data.append({"Month": month, "Category": category, "Amount": amount})
-                            except:
-                                pass
-                    
-                    if data:
-                        df = pd.DataFrame(data)
-                        st.bar_chart(df.pivot(index="Month", columns="Category", values="Amount"))
+                df = display_result(report_monthly_category_spending())
+                if df is not None:
+                    st.bar_chart(df.pivot(index="Month", columns="Category", values="Total Amount"))
     
     elif report_type == "Highest Spender Per Month":
         if st.button("Generate Report"):
             with report_container:
-                f = io.StringIO()
-                with redirect_stdout(f):
-                    report_highest_spender_per_month()
-                
-                st.text_area("Highest Spender Per Month Report", f.getvalue(), height=300)
+                display_result(report_highest_spender_per_month())
     
     elif report_type == "Frequent Category":
         if st.button("Generate Report"):
             with report_container:
-                f = io.StringIO()
-                with redirect_stdout(f):
-                    report_frequent_category()
-                
-                st.text_area("Frequent Category Report", f.getvalue(), height=100)
+                display_result(report_frequent_category())
     
     elif report_type == "Payment Method Usage":
         if st.button("Generate Report"):
             with report_container:
-                f = io.StringIO()
-                with redirect_stdout(f):
-                    report_payment_method_usage()
-                
-                st.text_area("Payment Method Usage Report", f.getvalue(), height=300)
+                display_result(report_payment_method_usage())
     
     elif report_type == "Tag Expenses":
         if st.button("Generate Report"):
             with report_container:
-                f = io.StringIO()
-                with redirect_stdout(f):
-                    report_tag_expenses()
-                
-                st.text_area("Tag Expenses Report", f.getvalue(), height=300)
+                display_result(report_tag_expenses())
 
 # Admin Page
 def display_admin_page():
@@ -895,18 +930,7 @@ def display_groups_page():
                 # List existing groups
         st.markdown("### Your Groups")
         if st.button("Refresh Group List"):
-            import io
-            from contextlib import redirect_stdout
-            
-            f = io.StringIO()
-            with redirect_stdout(f):
-                list_groups()
-            
-            output = f.getvalue()
-            if output:
-                st.text_area("Your Groups", output, height=200)
-            else:
-                st.info("You don't have any groups yet.")
+            display_result(list_groups(), "Failed to list groups.")
         
         # Delete Group
         st.markdown("### Delete Group")
@@ -1006,32 +1030,28 @@ def display_groups_page():
         st.markdown("### View Group Expenses")
         view_group_name = st.text_input("Group Name to View Expenses")
         
-        col1, col2 = st.columns(2)
+        col1, col2, col3, col4 = st.columns(4)
         with col1:
-            category_filter = st.selectbox("Filter by Category", ["All"] + [cat["category_name"] for cat in list_categories()])
+            category_filter = st.multiselect("Filter by Category", [cat["category_name"] for cat in list_categories()])
         with col2:
             tag_filter = st.selectbox("Filter by Tag", ["All"] + [tag["tag_name"] for tag in list_tags()])
+        with col3:
+            group_start_date = st.date_input("From", value=None, key="group_start_date")
+        with col4:
+            group_end_date = st.date_input("To", value=None, key="group_end_date")
         
         if st.button("View Group Expenses") and view_group_name:
             filters = {}
-            if category_filter != "All":
+            if category_filter:
                 filters["category"] = category_filter
             if tag_filter != "All":
                 filters["tag"] = tag_filter
-            # Add this code to capture and display the output
-            import io
-            from contextlib import redirect_stdout
-            
-            f = io.StringIO()
-            with redirect_stdout(f):
-                success = report_group_expenses(view_group_name, filters)
-            
-            output = f.getvalue()
-            
-            if output:
-                st.text_area("Group Expenses", output, height=400)
-            elif not success:
-                st.error(f"Failed to view expenses for group '{view_group_name}'. Check if you have permission.")
+            if group_start_date:
+                filters["start_date"] = group_start_date.isoformat()
+            if group_end_date:
+                filters["end_date"] = group_end_date.isoformat()
+            display_result(report_group_expenses(view_group_name, filters),
+                           f"Failed to view expenses for group '{view_group_name}'. Check if you have permission.")
 
     
         with tabs[2]:  # Group Reports tab
@@ -1049,48 +1069,18 @@ def display_groups_page():
                 if report_type == "Category Spending":
                     category_name = st.selectbox("Select Category", [cat["category_name"] for cat in list_categories()])
                     if st.button("Generate Report"):
-                        import io
-                        from contextlib import redirect_stdout
-                        
-                        f = io.StringIO()
-                        with redirect_stdout(f):
-                            success = report_group_category_spending(report_group_name, category_name)
-                        
-                        output = f.getvalue()
-                        if output:
-                            st.text_area("Category Spending Report", output, height=300)
-                        elif not success:
-                            st.error(f"Failed to generate category spending report for group '{report_group_name}'.")
+                        display_result(report_group_category_spending(report_group_name, category_name),
+                                       f"Failed to generate category spending report for group '{report_group_name}'.")
                 
                 elif report_type == "Tag Usage":
                     if st.button("Generate Report"):
-                        import io
-                        from contextlib import redirect_stdout
-                        
-                        f = io.StringIO()
-                        with redirect_stdout(f):
-                            success = report_group_tag_usage(report_group_name)
-                        
-                        output = f.getvalue()
-                        if output:
-                            st.text_area("Tag Usage Report", output, height=300)
-                        elif not success:
-                            st.error(f"Failed to generate tag usage report for group '{report_group_name}'.")
+                        display_result(report_group_tag_usage(report_group_name),
+                                       f"Failed to generate tag usage report for group '{report_group_name}'.")
                 
                 elif report_type == "User Expenses":
                     if st.button("Generate Report"):
-                        import io
-                        from contextlib import redirect_stdout
-                        
-                        f = io.StringIO()
-                        with redirect_stdout(f):
-                            success = report_group_user_expenses(report_group_name)
-                        
-                        output = f.getvalue()
-                        if output:
-                            st.text_area("User Expenses Report", output, height=300)
-                        elif not success:
-                            st.error(f"Failed to generate user expenses report for group '{report_group_name}'.")
+                        display_result(report_group_user_expenses(report_group_name),
+                                       f"Failed to generate user expenses report for group '{report_group_name}'.")
 
 def display_import_export_page():
     st.markdown('<p class="section-header">Import/Export Data</p>', unsafe_allow_html=True)
@@ -1147,6 +1137,59 @@ def display_import_export_page():
                 except Exception as e:
                     st.error(f"Import error: {str(e)}")
                     os.unlink(tmp_path)
+
+        # Several files at once
+        st.markdown("#### Multiple Files")
+        st.info("Upload several CSV files of the same kind. They are checked in parallel and imported together; leave the group name empty for individual expenses.")
+
+        group_name_multi = st.text_input("Group Name (optional)", key="multi_import_group")
+        multi_files = st.file_uploader("Choose CSV files", type="csv",
+                                       accept_multiple_files=True, key="multi_import")
+
+        if multi_files and st.button("Import Files"):
+            # Temp path -> uploaded name, for the progress and the summary
+            names = {}
+            for uploaded in multi_files:
+                with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp_file:
+                    tmp_file.write(uploaded.getvalue())
+                    names[tmp_file.name] = uploaded.name
+
+            progress_bar = st.progress(0.0)
+            status = st.empty()
+            total_steps = 2 * len(names)  # staging, then merging
+            steps = [0]
+
+            def progress(report, done, total):
+                steps[0] += 1
+                progress_bar.progress(min(steps[0] / total_steps, 1.0))
+                status.text(f"{names[report.file_path]}: {report.status} ({done}/{total})")
+
+            try:
+                jobs = [(path, group_name_multi or None) for path in names]
+                reports = import_files(jobs, progress=progress)
+                if reports:
+                    st.success(f"Imported {sum(r.imported for r in reports)} rows from {len(reports)} files")
+                    st.dataframe(pd.DataFrame([{
+                        'File': names[r.file_path],
+                        'Status': r.status,
+                        'Rows': r.rows,
+                        'Imported': r.imported,
+                        'Rejected': r.rejected,
+                        'Parse time (s)': round(r.stage_seconds, 2),
+                    } for r in reports]), use_container_width=True)
+                    problems = [(names[r.file_path], row_num, message)
+                                for r in reports for row_num, message in r.errors + r.warnings]
+                    if problems:
+                        with st.expander(f"Rejected rows and warnings ({len(problems)})"):
+                            st.dataframe(pd.DataFrame(problems, columns=['File', 'Row', 'Message']),
+                                         use_container_width=True)
+                else:
+                    st.error("Import failed. Nothing was imported.")
+            except Exception as e:
+                st.error(f"Import error: {str(e)}")
+            finally:
+                for path in names:
+                    os.unlink(path)
     
     with tab2:
         st.markdown("### Export Expenses")
@@ -0,0 +1,131 @@
+"""In-process inverted index from tags to the expenses carrying them.
+
+For each user the index maps a tag id to the sorted ids (eids) of that
+user's expenses with the tag, stored as compact integer arrays. A user's
+lists are loaded with one query the first time that user filters by tag.
+list_expenses then combines the lists for the requested tags (all of them
+or any of them) and hands the resulting eids to SQL, so the cost grows
+with the size of those lists rather than with the expenses table.
+
+The lists are updated on writes: add_expense, update_expense,
+delete_expense and the imports call add() and remove() for the expenses
+they tag, in the same transaction (lists of users not loaded yet are left
+alone). A rolled-back transaction drops the index, so nothing remains from
+writes that were undone. Commits by other connections, e.g. another
+process, are found with app.db.ChangeWatch before every lookup and also
+drop everything; the lists of a user are rebuilt on their next lookup.
+"""
+import threading
+from array import array
+from bisect import bisect_left
+
+from app.db import ChangeWatch, add_rollback_listener
+
+_EMPTY = array('q')
+
+
+def _contains(postings, eid):
+    i = bisect_left(postings, eid)
+    return i < len(postings) and postings[i] == eid
+
+
+class TagIndex:
+    def __init__(self):
+        self._postings = {}  # uid -> {tid: array of eids}
+        self._watch = ChangeWatch()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'builds': 0, 'resets': 0, 'updates': 0}
+
+    def _check_changes(self, conn):
+        # Another connection committed: the lists may be stale
+        if self._watch.changed(conn):
+            with self._lock:
+                if self._postings:
+                    self.stats['resets'] += 1
+                self._postings = {}
+
+    def _load(self, conn, uid):
+        postings = {}
+        # Walks the user's expenses and their (eid, tid) keys, sorted by
+        # tag so each list is filled in eid order
+        rows = conn.execute("""
+            SELECT et.tid, et.eid
+            FROM expenses e
+            JOIN expenses_tags et ON et.eid = e.eid
+            WHERE e.uid = ?
+            ORDER BY et.tid, et.eid
+        """, (uid,))
+        for tid, eid in rows:
+            eids = postings.get(tid)
+            if eids is None:
+                eids = postings[tid] = array('q')
+            eids.append(eid)
+        with self._lock:
+            self._postings[uid] = postings
+            self.stats['builds'] += 1
+        return postings
+
+    def postings(self, conn, uid):
+        self._check_changes(conn)
+        postings = self._postings.get(uid)
+        if postings is None:
+            return self._load(conn, uid)
+        self.stats['hits'] += 1
+        return postings
+
+    def match(self, conn, uid, tids, match_all=True):
+        """Sorted eids of the user's expenses having all (or any) of tids."""
+        postings = self.postings(conn, uid)
+        lists = [postings.get(tid, _EMPTY) for tid in dict.fromkeys(tids)]
+        if not lists:
+            return []
+
+        if not match_all:
+            return sorted(set().union(*lists))
+
+        # Walk the shortest list and probe the others by binary search
+        lists.sort(key=len)
+        shortest, others = lists[0], lists[1:]
+        return [eid for eid in shortest if all(_contains(other, eid) for other in others)]
+
+    def add(self, uid, eid, tids):
+        """Records that the user's expense eid has the tags tids."""
+        with self._lock:
+            postings = self._postings.get(uid)
+            if postings is None:
+                return
+            for tid in tids:
+                eids = postings.get(tid)
+                if eids is None:
+                    eids = postings[tid] = array('q')
+                if not eids or eids[-1] < eid:
+                    # New expenses have the largest eid
+                    eids.append(eid)
+                elif not _contains(eids, eid):
+                    eids.insert(bisect_left(eids, eid), eid)
+            self.stats['updates'] += 1
+
+    def remove(self, uid, eid, tids=None):
+        """Takes eid off the lists of tids, or of every tag when None."""
+        with self._lock:
+            postings = self._postings.get(uid)
+            if postings is None:
+                return
+            for tid in list(postings) if tids is None else tids:
+                eids = postings.get(tid)
+                if eids and _contains(eids, eid):
+                    del eids[bisect_left(eids, eid)]
+            self.stats['updates'] += 1
+
+    def invalidate(self, uid=None):
+        with self._lock:
+            if uid is None:
+                self._postings = {}
+            else:
+                self._postings.pop(uid, None)
+
+
+tag_index = TagIndex()
+
+# The index may have been loaded inside the transaction that was rolled back
+add_rollback_listener(tag_index.invalidate)
@@ -0,0 +1,14 @@
+"""Benchmarks for app.commands at growing data sizes.
+
+benchmarks.datagen builds deterministic synthetic databases: the same
+size and seed always give the same rows, from a thousand expenses up to
+tens of millions. benchmarks.harness times every public function of
+app/commands.py against them and writes the timings as JSON, optionally
+compared with a stored baseline run.
+
+    python -m benchmarks --sizes tiny,small --output bench.json
+    python -m benchmarks --sizes small --baseline benchmarks/baseline.json
+    python -m benchmarks --sizes small --save-baseline benchmarks/baseline.json
+
+Defaults come from BENCHMARK_CONFIG in config/config.py.
+"""
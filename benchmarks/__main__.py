@@ -0,0 +1,68 @@
+import argparse
+import json
+import sys
+
+from benchmarks import harness
+from config.config import BENCHMARK_CONFIG
+
+
+def _progress(size, name, summary):
+    if 'error' in summary:
+        print(f"  [{size}] {name}: {summary['error']}")
+    else:
+        print(f"  [{size}] {name}: {summary.get('median_ms', 0):.2f} ms "
+              f"({summary['runs']} runs, {summary['failures']} failed)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description="Benchmark the commands in app/commands.py.")
+    parser.add_argument('--sizes', help="Comma-separated sizes: names from benchmarks.datagen.SIZES "
+                                        "or expense counts (default: %(default)s)",
+                        default=','.join(map(str, BENCHMARK_CONFIG['sizes'])))
+    parser.add_argument('--repeat', type=int, default=BENCHMARK_CONFIG['repeat'],
+                        help="Runs per case (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=BENCHMARK_CONFIG['seed'])
+    parser.add_argument('--data-dir', default=BENCHMARK_CONFIG['data_dir'],
+                        help="Where generated databases are kept (default: %(default)s)")
+    parser.add_argument('--only', help="Comma-separated parts of case names to run")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--baseline', help="Compare with the results in this JSON file")
+    parser.add_argument('--save-baseline', help="Also write the results to this JSON file "
+                                                "as the new baseline")
+    parser.add_argument('--threshold', type=float, default=BENCHMARK_CONFIG['threshold'],
+                        help="Slowdown that counts as a regression (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) if size.isdigit() else size for size in args.sizes.split(',') if size]
+    only = [part for part in (args.only or '').split(',') if part]
+
+    results = harness.run(sizes, args.seed, args.repeat, args.data_dir, only, _progress)
+    print()
+    harness.print_scaling(results)
+
+    missing = {name for result in results['sizes'].values() for name in result['missing']}
+    if missing:
+        print(f"\nCommands without a benchmark case: {', '.join(sorted(missing))}")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=2)
+            print(f"Results written to {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = harness.compare(results, baseline, args.threshold)
+        print()
+        harness.print_comparison(rows)
+        regressions = [row for row in rows if row[-1] in ('regression', 'failed')]
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed or failed")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
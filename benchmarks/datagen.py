@@ -0,0 +1,331 @@
+"""Deterministic synthetic expense data.
+
+A DatasetSpec fixes how many rows of each kind a database holds; spec_for()
+derives one from a named size or an expense count. generate() builds a
+fresh database from a spec with the current schema (app.migrations). Every
+value is drawn from one random.Random(seed), in a fixed order, so a spec
+always produces the same rows.
+
+The data is skewed the way real data is: a few users own most of the
+expenses (user00001 the most), a few tags are on most tagged expenses,
+and amounts follow a log-normal distribution around a hundred rupees.
+Rows are streamed in chunks, so memory stays flat however large the
+database gets. Triggers and secondary indexes are dropped for the load
+and recreated afterwards, followed by one rebuild of the rollups,
+category statistics and full-text indexes.
+"""
+import contextlib
+import csv
+import io
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, replace
+from datetime import date, timedelta
+from itertools import islice
+from random import Random
+
+from app.db import apply_profile
+from app.migrations import (migrate, rebuild_category_stats, rebuild_fts, rebuild_payment_totals,
+                            rebuild_rollups)
+from app.money import Money
+
+# Named sizes: number of individual expenses
+SIZES = {
+    'tiny': 1_000,
+    'small': 10_000,
+    'medium': 100_000,
+    'large': 1_000_000,
+    'xl': 10_000_000,
+    'xxl': 30_000_000,
+}
+
+PASSWORD = 'bench'
+
+CATEGORIES = ['food', 'groceries', 'travel', 'rent', 'utilities', 'transport',
+              'entertainment', 'health', 'shopping', 'education', 'insurance', 'gifts']
+PAYMENT_METHODS = ['cash', 'upi', 'credit card', 'debit card', 'net banking', 'wallet']
+TAGS = ['work', 'trip', 'family', 'monthly', 'reimbursable', 'weekend', 'household', 'urgent']
+WORDS = ['coffee', 'lunch', 'dinner', 'team', 'taxi', 'train', 'flight', 'hotel', 'weekly',
+         'groceries', 'rent', 'electricity', 'water', 'internet', 'phone', 'movie', 'concert',
+         'doctor', 'pharmacy', 'books', 'course', 'gift', 'birthday', 'fuel', 'parking',
+         'snacks', 'market', 'shoes', 'clothes', 'repair', 'gym', 'insurance', 'office',
+         'client', 'meeting', 'conference', 'airport', 'breakfast', 'party', 'subscription']
+
+# Rows per executemany batch
+CHUNK_SIZE = 50_000
+
+# Tables whose secondary indexes are dropped during the load
+_LOADED_TABLES = ('expenses', 'expenses_tags', 'group_expenses', 'group_expense_tags',
+                  'split_users', 'user_group')
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    expenses: int
+    users: int
+    categories: int
+    payment_methods: int
+    tags: int
+    groups: int
+    members_per_group: int
+    group_expenses: int
+    max_tags: int = 3           # tags per expense: 0 to max_tags
+    start_date: str = '2022-01-01'
+    days: int = 3 * 365
+    seed: int = 42
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def spec_for(size, **overrides):
+    """Spec for a named size (see SIZES) or a number of expenses."""
+    if isinstance(size, str):
+        if size not in SIZES:
+            raise ValueError(f"Unknown size '{size}'. Available sizes: {', '.join(SIZES)}")
+        size = SIZES[size]
+    expenses = int(size)
+    spec = DatasetSpec(
+        expenses=expenses,
+        users=_clamp(expenses // 500, 20, 100_000),
+        categories=len(CATEGORIES),
+        payment_methods=len(PAYMENT_METHODS),
+        tags=_clamp(expenses // 1000, 20, 5_000),
+        groups=_clamp(expenses // 2000, 5, 50_000),
+        members_per_group=6,
+        group_expenses=expenses // 4,
+    )
+    return replace(spec, **overrides)
+
+
+def username(i):
+    # i counts from 0; user00001 owns the most expenses
+    return f"user{i + 1:05d}"
+
+
+def group_name(i):
+    return f"group{i + 1:05d}"
+
+
+def _names(base, prefix, n):
+    return [base[i] if i < len(base) else f"{prefix}{i + 1:04d}" for i in range(n)]
+
+
+class _Generator:
+    """Draws the rows of one spec. Ids are assigned in insertion order."""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.rng = Random(spec.seed)
+        start = date.fromisoformat(spec.start_date)
+        self.dates = [(start + timedelta(days=d)).isoformat() for d in range(spec.days)]
+        self.categories = _names(CATEGORIES, 'category', spec.categories)
+        self.payment_methods = _names(PAYMENT_METHODS, 'method', spec.payment_methods)
+        self.tags = _names(TAGS, 'tag', spec.tags)
+        # Ids in a fresh database: the administrator is uid 1
+        self.first_uid = 2
+        self.members = [
+            sorted(self.rng.sample(range(spec.users), min(spec.members_per_group, spec.users)))
+            for _ in range(spec.groups)
+        ]
+
+    def _index(self, n):
+        # Uniform index in [0, n); random() is much cheaper than randrange()
+        return int(n * self.rng.random())
+
+    def _skewed(self, n):
+        # Index in [0, n), heavily biased towards 0
+        return int(n * self.rng.random() ** 2)
+
+    def _amount(self):
+        return Money(100 + int(self.rng.lognormvariate(9.2, 1.1)))
+
+    def _description(self):
+        return ' '.join(self.rng.choices(WORDS, k=2 + self._index(3)))
+
+    def _tag_indexes(self):
+        n = self._index(self.spec.max_tags + 1)
+        return sorted({self._skewed(self.spec.tags) for _ in range(n)})
+
+    def expense(self):
+        # (user index, amount, category index, method index, date, description, tag indexes)
+        return (self._skewed(self.spec.users), self._amount(),
+                self._index(self.spec.categories), self._index(self.spec.payment_methods),
+                self.dates[self._index(self.spec.days)], self._description(), self._tag_indexes())
+
+    def group_expense(self):
+        # (group index, payer index, amount, category index, method index, date,
+        #  description, tag indexes, [(user index, share)])
+        rng = self.rng
+        g = self._index(self.spec.groups)
+        members = self.members[g]
+        payer = rng.choice(members)
+        others = [m for m in members if m != payer]
+        shared = [payer] + rng.sample(others, rng.randint(min(1, len(others)), len(others)))
+        amount = self._amount()
+        splits = list(zip(shared, amount.split(len(shared))))
+        return (g, payer, amount, self._index(self.spec.categories),
+                self._index(self.spec.payment_methods), self.dates[self._index(self.spec.days)],
+                self._description(), self._tag_indexes(), splits)
+
+
+def _chunks(rows, size=CHUNK_SIZE):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _drop_schema_objects(conn):
+    # Returns the CREATE statements of the dropped triggers and indexes
+    triggers = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger'").fetchall()
+    placeholders = ', '.join('?' * len(_LOADED_TABLES))
+    indexes = conn.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+        f"AND tbl_name IN ({placeholders})", _LOADED_TABLES).fetchall()
+    for name, _ in triggers:
+        conn.execute(f"DROP TRIGGER {name}")
+    for name, _ in indexes:
+        conn.execute(f"DROP INDEX {name}")
+    return [sql for _, sql in indexes + triggers]
+
+
+def _load(conn, gen, progress):
+    spec = gen.spec
+    uid = gen.first_uid
+    counts = {}
+
+    conn.executemany("INSERT INTO users (uid, username, password, role) VALUES (?, ?, ?, 'User')",
+                     [(uid + i, username(i), PASSWORD) for i in range(spec.users)])
+    conn.executemany("INSERT INTO categories (cid, category_name) VALUES (?, ?)",
+                     list(enumerate(gen.categories, 1)))
+    conn.executemany("INSERT INTO payment_methods (pid, method) VALUES (?, ?)",
+                     list(enumerate(gen.payment_methods, 1)))
+    conn.executemany("INSERT INTO tags (tid, tag_name) VALUES (?, ?)",
+                     list(enumerate(gen.tags, 1)))
+    conn.executemany("INSERT INTO groups (gid, date_created, group_name, description) VALUES (?, ?, ?, ?)",
+                     [(g + 1, spec.start_date, group_name(g), f"Synthetic group {g + 1}")
+                      for g in range(spec.groups)])
+    conn.executemany("INSERT INTO user_group (uid, gid) VALUES (?, ?)",
+                     [(uid + m, g + 1) for g, members in enumerate(gen.members) for m in members])
+    counts.update(users=spec.users + 1, categories=spec.categories,
+                  payment_methods=spec.payment_methods, tags=spec.tags, groups=spec.groups,
+                  user_group=sum(len(members) for members in gen.members))
+
+    eid = 0
+    tagged = 0
+    for chunk in _chunks(gen.expense() for _ in range(spec.expenses)):
+        expenses = []
+        tags = []
+        for user, amount, c, p, day, description, tag_indexes in chunk:
+            eid += 1
+            expenses.append((eid, uid + user, amount, c + 1, p + 1, day, description))
+            tags.extend((t + 1, eid) for t in tag_indexes)
+        conn.executemany("INSERT INTO expenses (eid, uid, amount, cid, pid, date, description) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)", expenses)
+        conn.executemany("INSERT INTO expenses_tags (tid, eid) VALUES (?, ?)", tags)
+        tagged += len(tags)
+        if progress:
+            progress('expenses', eid, spec.expenses)
+    counts.update(expenses=eid, expenses_tags=tagged)
+
+    geid = 0
+    tagged = 0
+    split_count = 0
+    for chunk in _chunks(gen.group_expense() for _ in range(spec.group_expenses)):
+        expenses = []
+        tags = []
+        splits = []
+        for g, payer, amount, c, p, day, description, tag_indexes, shares in chunk:
+            geid += 1
+            expenses.append((geid, uid + payer, g + 1, amount, c + 1, p + 1, day, description))
+            tags.extend((t + 1, geid) for t in tag_indexes)
+            splits.extend((geid, uid + user, share) for user, share in shares)
+        conn.executemany("INSERT INTO group_expenses (geid, uid, gid, amount, cid, pid, date, description) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", expenses)
+        conn.executemany("INSERT INTO group_expense_tags (tid, geid) VALUES (?, ?)", tags)
+        conn.executemany("INSERT INTO split_users (geid, uid, split_amount) VALUES (?, ?, ?)", splits)
+        tagged += len(tags)
+        split_count += len(splits)
+        if progress:
+            progress('group_expenses', geid, spec.group_expenses)
+    counts.update(group_expenses=geid, group_expense_tags=tagged, split_users=split_count)
+    return counts
+
+
+def generate(path, spec, progress=None):
+    """Creates the database at `path` from `spec`. Returns the row counts.
+
+    progress(table, done, total) is called after every chunk. The file must
+    not exist yet; it is removed again if generation fails.
+    """
+    if os.path.exists(path):
+        raise FileExistsError(f"Database '{path}' already exists")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    started = time.perf_counter()
+    conn = sqlite3.connect(path)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrate(conn)
+        # A half-built file is deleted anyway, so there is nothing to protect
+        apply_profile(conn, 'bulk-load')
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA foreign_keys = OFF")
+
+        conn.execute("BEGIN")
+        recreate = _drop_schema_objects(conn)
+        counts = _load(conn, _Generator(spec), progress)
+        for sql in recreate:
+            conn.execute(sql)
+        rebuild_rollups(conn)
+        rebuild_category_stats(conn)
+        rebuild_payment_totals(conn)
+        rebuild_fts(conn)
+        conn.commit()
+
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.close()
+    except BaseException:
+        conn.close()
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        raise
+
+    counts['seconds'] = round(time.perf_counter() - started, 3)
+    return counts
+
+
+def write_expense_csv(path, spec, rows, seed=None):
+    # An import file in the format read by import_expenses
+    gen = _Generator(replace(spec, seed=spec.seed if seed is None else seed))
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['amount', 'category', 'payment_method', 'date', 'description', 'tag'])
+        for _ in range(rows):
+            _, amount, c, p, day, description, tag_indexes = gen.expense()
+            writer.writerow([str(amount), gen.categories[c], gen.payment_methods[p], day,
+                             description, ','.join(gen.tags[t] for t in tag_indexes)])
+
+
+def write_group_csv(path, spec, rows, seed=None):
+    # An import file in the format read by import_group_csv
+    gen = _Generator(replace(spec, seed=spec.seed if seed is None else seed))
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['amount', 'category_name', 'payment_method', 'expense_date',
+                         'expense_description', 'tags', 'split_usernames', 'split_amounts'])
+        for _ in range(rows):
+            _, _, amount, c, p, day, description, tag_indexes, shares = gen.group_expense()
+            writer.writerow([str(amount), gen.categories[c], gen.payment_methods[p], day, description,
+                             ','.join(gen.tags[t] for t in tag_indexes),
+                             ','.join(username(user) for user, _ in shares),
+                             ','.join(str(share) for _, share in shares)])
+
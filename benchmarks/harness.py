@@ -0,0 +1,403 @@
+"""Times every public function of app.commands on synthetic databases.
+
+Each Case calls one command with arguments built from the dataset, logged
+in as a given role: 'user' is user00001, who owns the most expenses,
+'member' a member of the group with the most group expenses, and 'admin'
+the administrator. A command may have several cases, named
+'command[variant]'. Reads run first, then the writes; the cases that
+delete rows remove what the earlier cases added, except delete_group,
+which drops populated groups other than the benchmarked one.
+
+Every size is generated once into the data directory and copied before
+each run, so the writes never touch the cached database. Results are
+plain dicts, written as JSON:
+
+    {"meta": {...},
+     "sizes": {"small": {"spec": {...}, "counts": {...},
+                         "cases": {"list_expenses": {"runs": 5, "median_ms": ...}},
+                         "missing": []}}}
+
+compare() checks a run against a baseline run of the same sizes.
+"""
+import contextlib
+import inspect
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import date, datetime
+from typing import Callable, Optional
+
+import app.db
+from app import commands
+from app.lookups import dimensions
+from app.migrations import LATEST_VERSION
+from app.tag_index import tag_index
+from benchmarks import datagen
+from config.config import BENCHMARK_CONFIG, LISTING_CONFIG
+
+ADMIN = ('admin', 'admin123')
+PAGE = LISTING_CONFIG['page_size']
+
+# Rows in the generated import files, relative to the dataset
+_IMPORT_FRACTION = 10
+_IMPORT_ROWS = (500, 50_000)
+
+
+@dataclass
+class Case:
+    name: str                           # command, optionally with a [variant]
+    args: Callable                      # args(ctx, i) -> positional arguments of run i
+    role: str = 'user'                  # 'user', 'member', 'admin' or None
+    repeat: Optional[int] = None        # runs; None uses the configured repeat
+    setup: Optional[Callable] = None    # setup(ctx), untimed, before the runs
+
+    @property
+    def command(self):
+        return self.name.split('[')[0]
+
+
+class Context:
+    """What the cases need to know about the dataset being benchmarked."""
+
+    def __init__(self, conn, spec, work_dir):
+        self.spec = spec
+        self.work_dir = work_dir
+        self.user = datagen.username(0)
+        group = conn.execute("""
+            SELECT g.group_name, g.gid FROM groups g
+            JOIN group_expenses ge ON ge.gid = g.gid
+            GROUP BY g.gid ORDER BY COUNT(*) DESC, g.gid LIMIT 1
+        """).fetchone()
+        self.group, gid = group
+        self.members = [row[0] for row in conn.execute("""
+            SELECT u.username FROM user_group ug JOIN users u ON u.uid = ug.uid
+            WHERE ug.gid = ? ORDER BY u.uid
+        """, (gid,))]
+        self.member = self.members[0]
+        self.other_groups = [row[0] for row in conn.execute(
+            "SELECT group_name FROM groups WHERE gid != ? ORDER BY gid DESC", (gid,))]
+        # The middle of the date range, for range reports
+        start = date.fromisoformat(spec.start_date).toordinal()
+        self.start_date = date.fromordinal(start + spec.days // 4).isoformat()
+        self.end_date = date.fromordinal(start + spec.days * 3 // 4).isoformat()
+        self.cursor = None
+        self.eids = []
+
+        rows = max(_IMPORT_ROWS[0], min(_IMPORT_ROWS[1], spec.expenses // _IMPORT_FRACTION))
+        self.expense_csv = os.path.join(work_dir, 'import-expenses.csv')
+        self.group_csv = os.path.join(work_dir, 'import-group.csv')
+        # Another seed, so the imported rows are new rows
+        datagen.write_expense_csv(self.expense_csv, spec, rows, seed=spec.seed + 1)
+        datagen.write_group_csv(self.group_csv, spec, rows // 10, seed=spec.seed + 2)
+
+    def path(self, name, i):
+        return os.path.join(self.work_dir, f"{name}-{i}.csv")
+
+
+#region Cases
+def _walk_pages(ctx, pages=4):
+    # Cursor of page pages + 1 of the listing
+    cursor = None
+    for _ in range(pages):
+        page = commands.list_expenses(None, PAGE, cursor)
+        cursor = page.next_cursor if page else None
+    ctx.cursor = cursor
+
+
+def _added_expenses(ctx):
+    with app.db.db_connection() as conn:
+        ctx.eids = [row[0] for row in conn.execute(
+            "SELECT eid FROM expenses WHERE description = 'benchmark expense' ORDER BY eid")]
+
+
+CASES = [
+    # Session and lookups
+    Case('login', lambda c, i: (c.user, datagen.PASSWORD), role=None),
+    Case('logout', lambda c, i: ()),
+    Case('validate_date', lambda c, i: ('2023-05-17',)),
+    Case('list_users', lambda c, i: (), role='admin'),
+    Case('list_categories', lambda c, i: ()),
+    Case('list_payment_methods', lambda c, i: ()),
+    Case('list_tags', lambda c, i: ()),
+    Case('list_groups', lambda c, i: ()),
+    Case('list_groups[admin]', lambda c, i: (), role='admin'),
+
+    # Listings and search
+    Case('list_expenses', lambda c, i: (None, PAGE)),
+    Case('list_expenses[page 5]', lambda c, i: (None, PAGE, c.cursor), setup=_walk_pages),
+    Case('list_expenses[all]', lambda c, i: ()),
+    Case('list_expenses[filters]', lambda c, i: ({
+        'category': 'food,travel', 'start_date': c.start_date, 'min_amount': 100}, PAGE)),
+    Case('list_expenses[tags]', lambda c, i: ({'tags': 'work,trip', 'tag_mode': 'any'}, PAGE)),
+    Case('list_expenses[text]', lambda c, i: ({'text': 'coffee'}, PAGE)),
+    Case('search_expenses', lambda c, i: ('coffee',)),
+    Case('search_expenses[prefix]', lambda c, i: ('gro*',)),
+
+    # Reports
+    Case('report_top_expenses', lambda c, i: (10, c.start_date, c.end_date)),
+    Case('report_category_spending', lambda c, i: ('food',)),
+    Case('report_above_average_expenses', lambda c, i: ()),
+    Case('report_monthly_category_spending', lambda c, i: ()),
+    Case('report_highest_spender_per_month', lambda c, i: (), role='admin'),
+    Case('report_monthly_totals', lambda c, i: ()),
+    Case('dashboard_summary', lambda c, i: (c.end_date,)),
+    Case('report_frequent_category', lambda c, i: ()),
+    Case('report_payment_method_usage', lambda c, i: ()),
+    Case('report_tag_expenses', lambda c, i: ()),
+
+    # Groups
+    Case('check_group_permissions', lambda c, i: (c.group,), role='member'),
+    Case('report_group_expenses', lambda c, i: (c.group, None, PAGE), role='member'),
+    Case('report_group_expenses[all]', lambda c, i: (c.group,), role='member'),
+    Case('report_group_expenses[filters]', lambda c, i: (
+        c.group, {'category': 'food', 'start_date': c.start_date}, PAGE), role='member'),
+    Case('search_group_expenses', lambda c, i: (c.group, 'dinner'), role='member'),
+    Case('report_group_category_spending', lambda c, i: (c.group, 'food'), role='member'),
+    Case('report_group_tag_usage', lambda c, i: (c.group,), role='member'),
+    Case('report_group_user_expenses', lambda c, i: (c.group,), role='member'),
+
+    # Exports
+    Case('export_csv', lambda c, i: (c.path('export', i), 'date')),
+    Case('export_csv[admin]', lambda c, i: (c.path('export-all', i), 'date'), role='admin', repeat=1),
+    Case('export_group_csv', lambda c, i: (c.group, c.path('export-group', i), 'date'), role='member'),
+
+    # Writes
+    Case('add_user', lambda c, i: (f"benchuser{i}", datagen.PASSWORD, 'User'), role='admin'),
+    Case('update_user', lambda c, i: (f"benchuser{i}", 'password', 'changed'), role='admin'),
+    Case('add_category', lambda c, i: (f"benchcategory{i}",), role='admin'),
+    Case('add_payment_method', lambda c, i: (f"benchmethod{i}",), role='admin'),
+    Case('add_tag', lambda c, i: (f"benchtag{i}",)),
+    Case('delete_tag', lambda c, i: (f"benchtag{i}",)),
+    Case('add_expense', lambda c, i: (
+        '123.45', 'food', 'cash', '2023-05-17', 'benchmark expense', ['work', 'trip'])),
+    Case('update_expense', lambda c, i: (c.eids[i], 'amount', '99.50'), setup=_added_expenses),
+    Case('update_expense[date]', lambda c, i: (c.eids[i], 'date', '2023-06-01')),
+    Case('delete_expense', lambda c, i: (c.eids[i],)),
+    Case('create_group', lambda c, i: (f"benchgroup{i}", 'Benchmark group')),
+    Case('add_user_to_group', lambda c, i: (datagen.username(1), f"benchgroup{i}")),
+    Case('update_group', lambda c, i: (f"benchgroup{i}", 'description', 'Updated')),
+    Case('add_group_expense', lambda c, i: (
+        '300.00', c.group, 'food', 'cash', '2023-05-17', 'benchmark group expense',
+        ['trip'], c.members[:3]), role='member'),
+    Case('import_expenses', lambda c, i: (c.expense_csv,), repeat=1),
+    Case('import_group_csv', lambda c, i: (c.group, c.group_csv), role='member', repeat=1),
+    Case('import_files', lambda c, i: ([(c.expense_csv, None), (c.group_csv, c.group)], 1),
+         role='member', repeat=1),
+    Case('rebuild_rollups', lambda c, i: (), role='admin', repeat=1),
+    Case('delete_group', lambda c, i: (f"benchgroup{i}",)),
+    Case('delete_group[populated]', lambda c, i: (c.other_groups[i],), role='admin', repeat=1),
+    Case('delete_user', lambda c, i: (f"benchuser{i}",), role='admin'),
+]
+#endregion
+
+
+def public_commands():
+    # Names of the public functions defined in app/commands.py
+    return sorted(name for name, func in inspect.getmembers(commands, inspect.isfunction)
+                  if func.__module__ == commands.__name__ and not name.startswith('_'))
+
+
+def _use_database(path):
+    # Points the app at another database file and drops everything cached
+    # from the previous one
+    commands.logout()
+    app.db.close_pool()
+    app.db.DB_PATH = path
+    dimensions.invalidate()
+    tag_index.invalidate()
+
+
+def _login(ctx, role):
+    if role is None:
+        return
+    username, password = {
+        'user': (ctx.user, datagen.PASSWORD),
+        'member': (ctx.member, datagen.PASSWORD),
+        'admin': ADMIN,
+    }[role]
+    if commands.current_user.get('username') != username:
+        commands.login(username, password)
+
+
+def _summary(times, failures, error=None):
+    times_ms = sorted(t * 1000 for t in times)
+    summary = {'runs': len(times_ms), 'failures': failures}
+    if times_ms:
+        summary.update(
+            min_ms=round(times_ms[0], 4),
+            median_ms=round(statistics.median(times_ms), 4),
+            mean_ms=round(statistics.mean(times_ms), 4),
+            p95_ms=round(times_ms[min(len(times_ms) - 1, int(len(times_ms) * 0.95))], 4),
+            max_ms=round(times_ms[-1], 4),
+        )
+    if error:
+        summary['error'] = error
+    return summary
+
+
+def run_case(ctx, case, repeat):
+    func = getattr(commands, case.command)
+    times = []
+    failures = 0
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        _login(ctx, case.role)
+        if case.setup:
+            case.setup(ctx)
+        for i in range(case.repeat or repeat):
+            try:
+                args = case.args(ctx, i)
+            except IndexError:
+                break
+            _login(ctx, case.role)
+            started = time.perf_counter()
+            try:
+                result = func(*args)
+            except Exception as e:
+                return _summary(times, failures + 1, f"{type(e).__name__}: {e}")
+            times.append(time.perf_counter() - started)
+            # Commands report failure by returning False
+            if result is False:
+                failures += 1
+    return _summary(times, failures)
+
+
+def prepare(size, seed, data_dir, progress=None):
+    """Path and metadata of the cached database for `size`, generating it if needed."""
+    spec = datagen.spec_for(size, seed=seed)
+    name = f"{size}-{seed}"
+    db_path = os.path.join(data_dir, f"{name}.db")
+    meta_path = os.path.join(data_dir, f"{name}.json")
+
+    if os.path.exists(meta_path) and os.path.exists(db_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        # Databases from an older schema are generated again
+        if meta['spec'] == asdict(spec) and meta.get('schema') == LATEST_VERSION:
+            return db_path, meta
+        os.remove(db_path)
+    elif os.path.exists(db_path):
+        os.remove(db_path)
+
+    counts = datagen.generate(db_path, spec, progress)
+    meta = {'spec': asdict(spec), 'schema': LATEST_VERSION, 'counts': counts}
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    return db_path, meta
+
+
+def run_size(size, seed=None, repeat=None, data_dir=None, only=None, progress=None):
+    """Runs the cases on one dataset size. Returns its result dict."""
+    seed = BENCHMARK_CONFIG['seed'] if seed is None else seed
+    repeat = repeat or BENCHMARK_CONFIG['repeat']
+    data_dir = data_dir or BENCHMARK_CONFIG['data_dir']
+
+    db_path, meta = prepare(size, seed, data_dir)
+    spec = datagen.DatasetSpec(**meta['spec'])
+    work_dir = tempfile.mkdtemp(prefix='expense-bench-')
+    previous_path = app.db.DB_PATH
+    try:
+        work_db = os.path.join(work_dir, 'bench.db')
+        shutil.copyfile(db_path, work_db)
+        _use_database(work_db)
+        with app.db.db_connection() as conn:
+            ctx = Context(conn, spec, work_dir)
+
+        cases = {}
+        for case in CASES:
+            if only and not any(part in case.name for part in only):
+                continue
+            cases[case.name] = run_case(ctx, case, repeat)
+            if progress:
+                progress(size, case.name, cases[case.name])
+    finally:
+        _use_database(previous_path)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    covered = {case.command for case in CASES}
+    return {
+        'spec': meta['spec'],
+        'counts': meta['counts'],
+        'cases': cases,
+        # Public commands without a case, e.g. ones added since
+        'missing': [name for name in public_commands() if name not in covered],
+    }
+
+
+def run(sizes=None, seed=None, repeat=None, data_dir=None, only=None, progress=None):
+    sizes = sizes or BENCHMARK_CONFIG['sizes']
+    seed = BENCHMARK_CONFIG['seed'] if seed is None else seed
+    repeat = repeat or BENCHMARK_CONFIG['repeat']
+    results = {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'seed': seed,
+            'repeat': repeat,
+        },
+        'sizes': {},
+    }
+    for size in sizes:
+        results['sizes'][str(size)] = run_size(size, seed, repeat, data_dir, only, progress)
+    return results
+
+
+def compare(current, baseline, threshold=None, min_delta_ms=None):
+    """Rows (size, case, baseline_ms, current_ms, ratio, status) for every case.
+
+    status is 'regression', 'improvement', 'ok', 'new' (no baseline) or
+    'failed' (the case raised an error in the current run).
+    """
+    threshold = BENCHMARK_CONFIG['threshold'] if threshold is None else threshold
+    min_delta_ms = BENCHMARK_CONFIG['min_delta_ms'] if min_delta_ms is None else min_delta_ms
+    rows = []
+    for size, result in current['sizes'].items():
+        base_cases = baseline.get('sizes', {}).get(size, {}).get('cases', {})
+        for name, case in result['cases'].items():
+            now = case.get('median_ms')
+            before = base_cases.get(name, {}).get('median_ms')
+            if 'error' in case or now is None:
+                rows.append((size, name, before, now, None, 'failed'))
+            elif before is None:
+                rows.append((size, name, None, now, None, 'new'))
+            else:
+                ratio = now / before if before else float('inf')
+                status = 'ok'
+                if now - before >= min_delta_ms and ratio > 1 + threshold:
+                    status = 'regression'
+                elif before - now >= min_delta_ms and ratio < 1 / (1 + threshold):
+                    status = 'improvement'
+                rows.append((size, name, before, now, ratio, status))
+    return rows
+
+
+def _ms(value):
+    return '-' if value is None else f"{value:.2f}"
+
+
+def print_comparison(rows):
+    print(f"{'Size':<8} {'Case':<38} {'Baseline ms':>12} {'Current ms':>12} {'Ratio':>7}  Status")
+    for size, name, before, now, ratio, status in rows:
+        ratio = '-' if ratio is None else f"{ratio:.2f}"
+        print(f"{size:<8} {name:<38} {_ms(before):>12} {_ms(now):>12} {ratio:>7}  {status}")
+
+
+def print_scaling(results):
+    # Median per case (rows) and size (columns)
+    sizes = list(results['sizes'])
+    names = list(dict.fromkeys(name for size in sizes for name in results['sizes'][size]['cases']))
+    print(f"{'Case':<38} " + ' '.join(f"{size + ' ms':>12}" for size in sizes))
+    for name in names:
+        cells = []
+        for size in sizes:
+            case = results['sizes'][size]['cases'].get(name, {})
+            cells.append('error' if 'error' in case else _ms(case.get('median_ms')))
+        print(f"{name:<38} " + ' '.join(f"{cell:>12}" for cell in cells))
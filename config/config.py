@@ -3,6 +3,113 @@
 DATABASE_CONFIG = {
     "type": "sqlite",
     "sqlite": {
-        "db_path": "db/expenses.db"
+        "db_path": "db/expenses.db",
+
+        # Performance profile applied to every connection when it is opened.
+        # Can be overridden with the EXPENSES_DB_PROFILE environment variable.
+        "profile": "durable",
+
+        # PRAGMA presets. journal_mode=WAL lets the Streamlit app and the CLI
+        # read while the other one writes; busy_timeout (ms) makes a writer
+        # wait for the lock instead of failing with "database is locked".
+        # cache_size follows SQLite's convention: negative values are KiB.
+        "profiles": {
+            # Every commit is fsynced: safe against power loss.
+            "durable": {
+                "journal_mode": "wal",
+                "synchronous": "full",
+                "cache_size": -16384,
+                "mmap_size": 268435456,
+                "temp_store": "memory",
+                "busy_timeout": 5000,
+                "foreign_keys": True,
+            },
+            # WAL + NORMAL cannot corrupt the file, but the last commits may
+            # be rolled back after a power failure. Good for day-to-day use.
+            "balanced": {
+                "journal_mode": "wal",
+                "synchronous": "normal",
+                "cache_size": -32768,
+                "mmap_size": 268435456,
+                "temp_store": "memory",
+                "busy_timeout": 5000,
+                "foreign_keys": True,
+            },
+            # For large imports and backfills: no fsync, big cache. Use only
+            # for work that can be re-run if the machine goes down.
+            "bulk-load": {
+                "journal_mode": "wal",
+                "synchronous": "off",
+                "cache_size": -262144,
+                "mmap_size": 1073741824,
+                # The savepoint journal of a long import transaction grows
+                # with every row; kept in memory it gets slower per write.
+                "temp_store": "file",
+                "busy_timeout": 30000,
+                "foreign_keys": True,
+            },
+        },
     }
 }
+
+# CSV import of individual expenses (import_expenses)
+IMPORT_CONFIG = {
+    # Rows parsed, validated and inserted per executemany batch
+    "chunk_size": 5000,
+    # Commit after roughly this many imported rows. None imports the whole
+    # file in a single transaction, so a failed import leaves no trace.
+    "commit_every": None,
+    # Connection profile used for the duration of the import
+    "profile": "bulk-load",
+    # Worker processes parsing files in import_files. None uses every core.
+    "workers": None,
+}
+
+# CSV export (export_csv): rows fetched from the cursor and written per batch
+EXPORT_CONFIG = {
+    "chunk_size": 5000,
+}
+
+# Paged listings (list_expenses, report_group_expenses) in the CLI and the
+# Streamlit app: rows per page
+LISTING_CONFIG = {
+    "page_size": 20,
+}
+
+# Benchmark suite (python -m benchmarks). Sizes are names from
+# benchmarks.datagen.SIZES or expense counts. Generated databases are kept
+# in data_dir and reused while their spec is unchanged.
+BENCHMARK_CONFIG = {
+    "sizes": ["tiny", "small", "medium"],
+    "repeat": 5,
+    "seed": 42,
+    "data_dir": "benchmarks/data",
+    # A case regresses when its median is this fraction slower than the
+    # baseline's and at least min_delta_ms slower in absolute terms
+    "threshold": 0.25,
+    "min_delta_ms": 1.0,
+}
+
+# Slow-query log (app/slowlog.py). Statements slower than threshold_ms are
+# logged with their EXPLAIN QUERY PLAN to log_path, rotated at max_bytes
+# with backup_count old files kept. The EXPENSES_SLOW_QUERY_MS environment
+# variable enables it with that threshold.
+SLOW_QUERY_CONFIG = {
+    "enabled": False,
+    "threshold_ms": 100,
+    "log_path": "db/slow_queries.log",
+    "max_bytes": 1048576,
+    "backup_count": 3,
+}
+
+# Script mode of the CLI (python main.py --script <file>, see app/script.py)
+SCRIPT_CONFIG = {
+    # Commit after this many commands. The write lock is held in between.
+    "batch_size": 1000,
+    # Run the whole script in one transaction: all of it or nothing
+    "transaction": False,
+    # Go on with the next command after a failed one instead of stopping
+    "continue_on_error": False,
+    # Connection profile used while the script runs
+    "profile": "bulk-load",
+}
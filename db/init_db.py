@@ -7,14 +7,13 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from app.db import get_db_connection, initialize_db
+from app.db import initialize_db
+from app.migrations import LATEST_VERSION
 
 def init():
     print("Initializing the SQLite database...")
-    conn = get_db_connection()
-    initialize_db(conn)
-    conn.close()
-    print("SQLite database initialized successfully.")
+    version = initialize_db()
+    print(f"SQLite database initialized successfully (schema version {version}/{LATEST_VERSION}).")
 
 if __name__ == "__main__":
     init()
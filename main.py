@@ -1,7 +1,44 @@
+import argparse
+import sys
+
 from app.db import initialize_db
 from app.cli import main_cli
+from app.profiler import profiler
+from app.script import run_script
+from config.config import SCRIPT_CONFIG
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Expense Management System")
+    parser.add_argument('--profile', action='store_true',
+                        help="Print a timing profile after every command")
+    parser.add_argument('--script', nargs='?', const='-', metavar='FILE',
+                        help="Run the commands in FILE, one per line, instead of the "
+                             "interactive prompt ('-' or no FILE: read stdin)")
+    parser.add_argument('--transaction', action='store_true', default=SCRIPT_CONFIG['transaction'],
+                        help="Run the whole script in one transaction")
+    parser.add_argument('--batch-size', type=int, default=SCRIPT_CONFIG['batch_size'],
+                        help="Commit after this many commands (default: %(default)s)")
+    parser.add_argument('--continue-on-error', action='store_true',
+                        default=SCRIPT_CONFIG['continue_on_error'],
+                        help="Go on after a failed command instead of stopping")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
+    args = parse_args()
     initialize_db()
     print("Database initialized")
-    main_cli()
\ No newline at end of file
+    if args.profile:
+        profiler.enable()
+    if args.script is None:
+        main_cli()
+    else:
+        if args.batch_size < 1:
+            print("--batch-size must be at least 1")
+            sys.exit(2)
+        lines = sys.stdin if args.script == '-' else open(args.script)
+        with lines:
+            summary = run_script(lines, args.transaction, args.batch_size, args.continue_on_error)
+        summary.render()
+        sys.exit(1 if summary.failed else 0)
@@ -0,0 +1,60 @@
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from app import db
+from app.commands import current_user, login
+from app.lookups import dimensions
+from app.tag_index import tag_index
+
+
+def quiet():
+    # The commands print their progress and errors
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Runs each test against a freshly migrated database in a temp directory."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'expenses.db')
+
+        db.close_pool()
+        self.saved_path, db.DB_PATH = db.DB_PATH, self.db_path
+        self.reset_caches()
+        with quiet():
+            db.initialize_db()
+
+    def tearDown(self):
+        db.close_pool()
+        db.DB_PATH = self.saved_path
+        self.reset_caches()
+        current_user.update({'uid': None, 'username': None, 'role': None})
+        self.tmp.cleanup()
+
+    def reset_caches(self):
+        dimensions.invalidate()
+        tag_index.invalidate()
+
+    def path(self, name, content=None):
+        path = os.path.join(self.tmp.name, name)
+        if content is not None:
+            with open(path, 'w') as f:
+                f.write(content)
+        return path
+
+    def other_connection(self):
+        # A connection outside the pool, like another process would have
+        return contextlib.closing(sqlite3.connect(self.db_path, isolation_level=None))
+
+    def query(self, sql, params=()):
+        with self.other_connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def login(self, username='admin', password='admin123'):
+        with quiet():
+            self.assertTrue(login(username, password))
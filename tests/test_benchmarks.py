@@ -0,0 +1,84 @@
+import contextlib
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from benchmarks.datagen import generate, spec_for, write_expense_csv
+from benchmarks.harness import compare
+
+
+class DatagenTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.spec = spec_for(400)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def generate(self, name, spec=None):
+        path = os.path.join(self.tmp.name, name)
+        counts = generate(path, spec or self.spec)
+        return path, counts
+
+    def dump(self, path, table):
+        with contextlib.closing(sqlite3.connect(path)) as conn:
+            return conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2").fetchall()
+
+    def test_spec_for(self):
+        self.assertEqual(spec_for('tiny').expenses, 1000)
+        self.assertEqual(spec_for(400, users=3).users, 3)
+        with self.assertRaises(ValueError):
+            spec_for('enormous')
+
+    def test_same_spec_same_rows(self):
+        first, counts = self.generate('first.db')
+        second, _ = self.generate('second.db')
+        self.assertEqual(counts['expenses'], 400)
+        self.assertEqual(counts['group_expenses'], 100)
+        for table in ('expenses', 'expenses_tags', 'split_users'):
+            self.assertEqual(self.dump(first, table), self.dump(second, table))
+        with self.assertRaises(FileExistsError):
+            generate(first, self.spec)
+
+    def test_summaries_match_the_rows(self):
+        path, _ = self.generate('bench.db')
+        with contextlib.closing(sqlite3.connect(path)) as conn:
+            self.assertEqual(conn.execute("SELECT SUM(total), SUM(count) FROM monthly_category_totals").fetchone(),
+                             conn.execute("SELECT SUM(amount), COUNT(*) FROM expenses").fetchone())
+            self.assertEqual(conn.execute("SELECT SUM(count) FROM payment_method_totals").fetchone()[0], 400)
+            self.assertEqual(conn.execute("PRAGMA foreign_key_check").fetchall(), [])
+            # Splits add up to their expense
+            self.assertEqual(conn.execute("""
+                SELECT COUNT(*) FROM group_expenses ge
+                WHERE ge.amount != (SELECT SUM(split_amount) FROM split_users WHERE geid = ge.geid)
+            """).fetchone()[0], 0)
+
+    def test_expense_csv(self):
+        path = os.path.join(self.tmp.name, 'import.csv')
+        write_expense_csv(path, self.spec, 5, seed=7)
+        with open(path) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[0], 'amount,category,payment_method,date,description,tag')
+        self.assertEqual(len(lines), 6)
+
+
+class CompareTest(unittest.TestCase):
+
+    def test_statuses(self):
+        def results(cases):
+            return {'sizes': {'tiny': {'cases': cases}}}
+
+        baseline = results({'same': {'median_ms': 10.0}, 'slower': {'median_ms': 10.0},
+                            'faster': {'median_ms': 10.0}, 'noise': {'median_ms': 0.1}})
+        current = results({'same': {'median_ms': 11.0}, 'slower': {'median_ms': 20.0},
+                           'faster': {'median_ms': 5.0}, 'noise': {'median_ms': 0.5},
+                           'new': {'median_ms': 1.0}, 'broken': {'error': 'boom'}})
+        statuses = {row[1]: row[5] for row in compare(current, baseline, threshold=0.25, min_delta_ms=1.0)}
+        self.assertEqual(statuses, {'same': 'ok', 'slower': 'regression', 'faster': 'improvement',
+                                    'noise': 'ok', 'new': 'new', 'broken': 'failed'})
+
+
+if __name__ == '__main__':
+    unittest.main()
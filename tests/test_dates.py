@@ -0,0 +1,57 @@
+import unittest
+
+from app.commands import add_category, add_expense, add_payment_method, current_user, update_expense
+from app.dates import day_number, parse_date
+from app.db import db_connection
+from support import DatabaseTestCase, quiet
+
+
+class DatesTest(unittest.TestCase):
+
+    def test_parse_date(self):
+        self.assertEqual(parse_date(' 2024-02-29 '), '2024-02-29')
+        for value in ('2023-02-29', '20240315', '2024-1-05', '2024/01/05', '', None):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_date(value)
+
+    def test_day_number(self):
+        self.assertEqual(day_number('1970-01-01'), 0)
+        self.assertEqual(day_number('1969-12-31'), -1)
+        self.assertEqual(day_number('2024-03-01') - day_number('2024-02-28'), 2)
+
+
+class DateKeyTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.login()
+        with quiet():
+            add_category('food')
+            add_payment_method('cash')
+
+    def test_generated_columns_match_day_number(self):
+        dates = ['1999-12-31', '2000-02-29', '2024-01-01', '2024-12-31']
+        with quiet():
+            for date in dates:
+                self.assertTrue(add_expense('1', 'food', 'cash', date, date, []))
+        self.assertEqual(self.query("SELECT date, day, month FROM expenses ORDER BY eid"),
+                         [(date, day_number(date), date[:7]) for date in dates])
+
+        eid = self.query("SELECT MIN(eid) FROM expenses")[0][0]
+        with quiet():
+            self.assertTrue(update_expense(eid, 'date', '2025-06-15'))
+        self.assertEqual(self.query("SELECT day, month FROM expenses WHERE eid = ?", (eid,)),
+                         [(day_number('2025-06-15'), '2025-06')])
+
+    def test_listings_use_the_day_index(self):
+        with db_connection() as conn:
+            plan = ' '.join(row[3] for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT eid FROM expenses e "
+                "WHERE e.uid = ? AND e.day >= ? AND e.day <= ? ORDER BY e.day DESC, e.eid DESC",
+                (current_user['uid'], 0, 100000)))
+        self.assertIn("idx_expenses_uid_day", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import os
+import threading
+import unittest
+from unittest import mock
+
+from app import db
+from app.db import ConnectionPool, PoolTimeout, apply_profile, get_profile, profile_override
+from support import DatabaseTestCase
+
+
+class ConnectionPoolTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.pool = ConnectionPool(db.get_db_connection, max_size=2, timeout=0.05)
+
+    def tearDown(self):
+        self.pool.close()
+        super().tearDown()
+
+    def test_connections_are_reused(self):
+        with self.pool.connection() as conn:
+            first = conn
+        with self.pool.connection() as conn:
+            self.assertIs(conn, first)
+        stats = self.pool.stats()
+        self.assertEqual((stats['created'], stats['reused'], stats['in_use'], stats['idle']), (1, 1, 0, 1))
+
+    def test_nested_borrows_share_the_connection(self):
+        with self.pool.connection() as outer:
+            with self.pool.connection() as inner:
+                self.assertIs(inner, outer)
+            # The inner borrow did not give the connection back
+            self.assertEqual(self.pool.stats()['in_use'], 1)
+        stats = self.pool.stats()
+        self.assertEqual((stats['borrowed'], stats['nested_borrows'], stats['in_use']), (1, 1, 0))
+
+    def test_threads_get_their_own_connections(self):
+        borrowed = []
+        inside = threading.Barrier(2)
+
+        def borrow():
+            with self.pool.connection() as conn:
+                borrowed.append(conn)
+                inside.wait(timeout=5)
+
+        threads = [threading.Thread(target=borrow) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertIsNot(borrowed[0], borrowed[1])
+        self.assertEqual(self.pool.stats()['peak_in_use'], 2)
+
+    def test_open_transaction_is_rolled_back_on_release(self):
+        rollbacks = []
+        db.add_rollback_listener(lambda: rollbacks.append(True))
+        try:
+            with self.pool.connection() as conn:
+                conn.execute("BEGIN")
+                conn.execute("INSERT INTO categories (category_name) VALUES ('abandoned')")
+            with self.pool.connection() as conn:
+                self.assertFalse(conn.in_transaction)
+        finally:
+            db._rollback_listeners.pop()
+        self.assertEqual(self.query("SELECT * FROM categories WHERE category_name = 'abandoned'"), [])
+        self.assertEqual(self.pool.stats()['rollbacks_on_release'], 1)
+        self.assertEqual(rollbacks, [True])
+
+    def test_acquire_times_out_when_the_pool_is_exhausted(self):
+        held = [self.pool.acquire(), self.pool.acquire()]
+        with self.assertRaises(PoolTimeout):
+            self.pool.acquire()
+        self.assertEqual(self.pool.stats()['timeouts'], 1)
+
+        self.pool.release(held.pop())
+        self.pool.release(self.pool.acquire())
+        self.pool.release(held.pop())
+        self.assertEqual(self.pool.stats()['size'], 2)
+
+    def test_broken_connections_are_replaced(self):
+        self.pool.health_check_interval = 0
+        with self.pool.connection() as conn:
+            broken = conn
+        broken.close()
+        with self.pool.connection() as conn:
+            self.assertIsNot(conn, broken)
+            self.assertEqual(conn.execute("SELECT 1").fetchone()[0], 1)
+        stats = self.pool.stats()
+        self.assertEqual((stats['failed_health_checks'], stats['discarded'], stats['size']), (1, 1, 1))
+
+    def test_closed_pool_refuses_borrows(self):
+        self.pool.close()
+        with self.assertRaises(PoolTimeout):
+            self.pool.acquire()
+
+
+class ProfileTest(DatabaseTestCase):
+
+    def pragmas(self, conn):
+        return tuple(conn.execute(f"PRAGMA {name}").fetchone()[0]
+                     for name in ('journal_mode', 'synchronous', 'cache_size', 'foreign_keys'))
+
+    def test_pool_connections_get_the_default_profile(self):
+        with db.db_connection() as conn:
+            # durable: WAL, synchronous FULL (2), 16 MiB cache
+            self.assertEqual(self.pragmas(conn), ('wal', 2, -16384, 1))
+
+    def test_profile_from_the_environment(self):
+        with mock.patch.dict(os.environ, {'EXPENSES_DB_PROFILE': 'balanced'}):
+            self.assertEqual(get_profile()['synchronous'], 'normal')
+        with self.assertRaises(ValueError):
+            get_profile('turbo')
+
+    def test_invalid_pragma_values_are_rejected(self):
+        profiles = dict(db.SQLITE_CONFIG['profiles'], bad={'synchronous': 'off; DROP TABLE users'})
+        with db.db_connection() as conn, mock.patch.dict(db.SQLITE_CONFIG, {'profiles': profiles}):
+            with self.assertRaises(ValueError):
+                apply_profile(conn, 'bad')
+        self.assertEqual(len(self.query("SELECT * FROM users")), 1)
+
+    def test_profile_override_is_restored(self):
+        with db.db_connection() as conn:
+            with profile_override(conn, 'bulk-load'):
+                self.assertEqual(self.pragmas(conn), ('wal', 0, -262144, 1))
+            self.assertEqual(self.pragmas(conn), ('wal', 2, -16384, 1))
+
+    def test_profile_override_keeps_an_open_transaction(self):
+        with db.db_connection() as conn:
+            conn.execute("BEGIN")
+            with profile_override(conn, 'bulk-load'):
+                self.assertEqual(self.pragmas(conn)[1], 2)
+            conn.rollback()
+
+
+if __name__ == '__main__':
+    unittest.main()
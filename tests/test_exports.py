@@ -0,0 +1,107 @@
+import csv
+import unittest
+
+from app.commands import (add_category, add_expense, add_group_expense, add_payment_method, add_user,
+                          add_user_to_group, create_group, export_csv, export_group_csv)
+from config.config import EXPORT_CONFIG
+from support import DatabaseTestCase, quiet
+
+
+class ExportCsvTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.login()
+        with quiet():
+            for name in ('food', 'rent'):
+                add_category(name)
+            for method in ('cash', 'card'):
+                add_payment_method(method)
+            self.assertTrue(add_user('bob', 'secret', 'User'))
+            self.assertTrue(add_expense('30', 'rent', 'cash', '2024-01-02', 'b', ['x', 'y']))
+            self.assertTrue(add_expense('10', 'food', 'card', '2024-01-03', 'c', []))
+            self.assertTrue(add_expense('20', 'food', 'cash', '2024-01-01', 'a', ['x']))
+        self.login('bob', 'secret')
+        with quiet():
+            self.assertTrue(add_expense('5', 'food', 'cash', '2024-01-01', 'bob', []))
+
+    def export(self, *args):
+        path = self.path('out.csv')
+        with quiet():
+            self.assertTrue(export_csv(path, *args))
+        with open(path, newline='') as f:
+            return list(csv.reader(f))
+
+    def test_users_export_their_own_expenses(self):
+        header, *rows = self.export('date')
+        self.assertEqual(header, ['ID', 'Amount', 'Category', 'Payment Method', 'Date', 'Description', 'Tags'])
+        self.assertEqual([row[5] for row in rows], ['bob'])
+
+    def test_sort_fields(self):
+        self.login()
+        # Ties are broken by id
+        cases = {'date': ['a', 'bob', 'b', 'c'], 'amount': ['bob', 'c', 'a', 'b'],
+                 'category': ['c', 'a', 'bob', 'b'], 'payment_method': ['c', 'b', 'a', 'bob'],
+                 'user': ['b', 'c', 'a', 'bob']}
+        for sort_field, expected in cases.items():
+            with self.subTest(sort_field=sort_field):
+                header, *rows = self.export(sort_field.upper())
+                self.assertEqual(header[1], 'User')
+                self.assertEqual([row[6] for row in rows], expected)
+        header, *rows = self.export('tags')
+        self.assertEqual([row[7] for row in rows], ['', '', 'x', 'x, y'])
+
+    def test_rows_are_streamed_in_chunks(self):
+        self.login()
+        chunk_size, EXPORT_CONFIG['chunk_size'] = EXPORT_CONFIG['chunk_size'], 1
+        try:
+            header, *rows = self.export('date', {'category': 'food', 'min_amount': '10'})
+        finally:
+            EXPORT_CONFIG['chunk_size'] = chunk_size
+        self.assertEqual([row[6] for row in rows], ['a', 'c'])
+
+    def test_invalid_sort_field_or_filter(self):
+        with quiet():
+            self.assertFalse(export_csv(self.path('out.csv'), 'eid; DROP TABLE expenses'))
+            self.assertFalse(export_csv(self.path('out.csv'), 'date', {'colour': 'red'}))
+
+
+class ExportGroupCsvTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.login()
+        with quiet():
+            add_category('food')
+            add_payment_method('cash')
+            self.assertTrue(create_group('trip', 'weekend'))
+            self.assertTrue(add_user('bob', 'secret', 'User'))
+            self.assertTrue(add_user_to_group('bob', 'trip'))
+            self.assertTrue(add_group_expense('30', 'trip', 'food', 'cash', '2024-01-02', 'b', ['x'], ['bob']))
+            self.assertTrue(add_group_expense('10', 'trip', 'food', 'cash', '2024-01-03', 'c', ['x', 'y'], ['bob']))
+            self.assertTrue(add_group_expense('20', 'trip', 'food', 'cash', '2024-01-01', 'a', [], ['bob']))
+
+    def export(self, *args, **kwargs):
+        path = self.path('group.csv')
+        with quiet():
+            self.assertTrue(export_group_csv('trip', path, *args, **kwargs))
+        with open(path, newline='') as f:
+            return list(csv.DictReader(f))
+
+    def test_rows_with_tags_and_splits(self):
+        rows = self.export()
+        self.assertEqual([row['expense_description'] for row in rows], ['b', 'c', 'a'])
+        self.assertEqual([row['tags'] for row in rows], ['x', 'x, y', ''])
+        self.assertEqual({row['split_usernames'] for row in rows}, {'admin, bob'})
+        self.assertEqual(rows[0]['group_name'], 'trip')
+
+    def test_sort_and_filters(self):
+        self.assertEqual([row['expense_description'] for row in self.export('date')], ['a', 'b', 'c'])
+        self.assertEqual([row['expense_description'] for row in self.export('amount')], ['c', 'a', 'b'])
+        self.assertEqual([row['expense_description'] for row in self.export(filters={'tags': 'x'})], ['b', 'c'])
+        with quiet():
+            self.assertFalse(export_group_csv('trip', self.path('group.csv'), 'geid; --'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+
+from app.commands import (add_category, add_expense, add_group_expense, add_payment_method, add_user,
+                          add_user_to_group, create_group, list_expenses, report_group_expenses)
+from app.db import db_connection
+from app.filters import FilterError, compile_filters, normalize_filters, parse_filter_args
+from support import DatabaseTestCase, quiet
+
+
+class NormalizeFiltersTest(unittest.TestCase):
+
+    def test_values_are_canonical(self):
+        self.assertEqual(normalize_filters({
+            'category': 'Food, travel,food', 'tag': ['Work', ' '], 'tag_mode': 'ANY',
+            'user': 'Bob', 'start_date': '2024-01-05', 'max_amount': '10.005', 'min_amount': None,
+            'text': 'lunch',
+        }), {
+            'category': ['food', 'travel'], 'tags': ['work'], 'tag_mode': 'any',
+            'user': ['Bob'], 'start_date': '2024-01-05', 'max_amount': 1001, 'text': 'lunch',
+        })
+        self.assertEqual(normalize_filters(None), {})
+        self.assertEqual(normalize_filters({'tags': 'a'})['tag_mode'], 'all')
+
+    def test_invalid_filters(self):
+        for filters in ({'colour': 'red'}, {'date': '2024-13-01'}, {'min_amount': 'ten'},
+                        {'tags': 'a', 'tag_mode': 'some'},
+                        {'start_date': '2024-02-01', 'end_date': '2024-01-01'}):
+            with self.subTest(filters=filters), self.assertRaises(FilterError):
+                normalize_filters(filters)
+
+    def test_parse_filter_args(self):
+        self.assertEqual(parse_filter_args(['--category=food', '--tag=a', '--tag=b', '--amount=1-5.5',
+                                            '--date=2024-01-01..2024-01-31', '--tag-mode=any']),
+                         {'category': 'food', 'tags': 'a,b', 'min_amount': '1', 'max_amount': '5.5',
+                          'start_date': '2024-01-01', 'end_date': '2024-01-31', 'tag_mode': 'any'})
+        for args in (['category=food'], ['--colour=red'], ['--amount=5'], ['--from=someday']):
+            with self.subTest(args=args), self.assertRaises(FilterError):
+                parse_filter_args(args)
+
+
+class CompileFiltersTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.login()
+        with quiet():
+            for name in ('food', 'travel'):
+                add_category(name)
+            for method in ('cash', 'card'):
+                add_payment_method(method)
+            self.assertTrue(add_expense('10', 'food', 'cash', '2024-01-05', 'team lunch', ['work']))
+            self.assertTrue(add_expense('250', 'travel', 'card', '2024-01-20', 'train', ['work', 'trip']))
+            self.assertTrue(add_expense('40', 'food', 'card', '2024-02-02', 'dinner', ['trip']))
+
+    def descriptions(self, filters):
+        result = list_expenses(filters)
+        self.assertIsNot(result, False)
+        return sorted(result.column('description'))
+
+    def test_filters_select_the_matching_expenses(self):
+        cases = [
+            ({'category': 'food'}, ['dinner', 'team lunch']),
+            ({'category': 'food,travel', 'payment_method': 'card'}, ['dinner', 'train']),
+            ({'start_date': '2024-01-06', 'end_date': '2024-01-31'}, ['train']),
+            ({'date': '2024-02-02'}, ['dinner']),
+            ({'min_amount': '40', 'max_amount': '250'}, ['dinner', 'train']),
+            ({'tags': 'work,trip'}, ['train']),
+            ({'tags': 'work,trip', 'tag_mode': 'any'}, ['dinner', 'team lunch', 'train']),
+            ({'tags': 'work,unknown'}, []),
+            ({'tags': 'work,unknown', 'tag_mode': 'any'}, ['team lunch', 'train']),
+            ({'text': 'lun*'}, ['team lunch']),
+            ({'category': 'unknown'}, []),
+        ]
+        for filters, expected in cases:
+            with self.subTest(filters=filters):
+                self.assertEqual(self.descriptions(filters), expected)
+
+    def test_sql_depends_only_on_the_shape(self):
+        with db_connection() as conn:
+            first = compile_filters(conn, 'expenses', {'category': 'food', 'min_amount': '5'})
+            second = compile_filters(conn, 'expenses', {'category': 'travel,food', 'min_amount': '7.5'})
+        self.assertEqual(first[0], second[0])
+        self.assertNotEqual(first[1], second[1])
+        self.assertEqual(second[1][1], 750)
+
+    def test_group_expenses_scope(self):
+        with quiet():
+            self.assertTrue(create_group('trip', 'weekend'))
+            self.assertTrue(add_user('bob', 'secret', 'User'))
+            self.assertTrue(add_user_to_group('bob', 'trip'))
+            self.assertTrue(add_group_expense('90', 'trip', 'food', 'cash', '2024-01-05', 'picnic', ['work'], ['bob']))
+            self.assertTrue(add_group_expense('30', 'trip', 'travel', 'card', '2024-01-06', 'bus', [], ['bob']))
+        self.assertEqual(report_group_expenses('trip', {'tags': 'work'}).column('description'), ['picnic'])
+        self.assertEqual(report_group_expenses('trip', {'payment_method': 'card'}).column('description'), ['bus'])
+        with quiet():
+            self.assertFalse(report_group_expenses('trip', {'colour': 'red'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
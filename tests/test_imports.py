@@ -0,0 +1,102 @@
+import unittest
+
+from app.commands import add_category, add_payment_method, current_user, import_expenses, import_files
+from support import DatabaseTestCase, quiet
+
+EXPENSES_CSV = """amount,category,payment_method,date,description,tags
+10.50,food,cash,2024-01-01,lunch,"work, Trip"
+-5,food,cash,2024-01-02,negative,
+7,rent,cash,2024-01-03,unknown category,
+20,Food,Card,2024-01-04,dinner,trip
+3,food,cash,2024-02-30,bad date,
+1,food,cash,2024-01-05,boom,
+4,food,card,2024-01-06,snack,
+"""
+
+
+class ImportExpensesTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.login()
+        with quiet():
+            add_category('food')
+            add_payment_method('cash')
+            add_payment_method('card')
+        self.csv_path = self.path('expenses.csv', EXPENSES_CSV)
+
+    def imported(self):
+        return self.query("""
+            SELECT e.amount, e.description,
+                   (SELECT GROUP_CONCAT(tag_name) FROM (
+                        SELECT t.tag_name FROM expenses_tags et JOIN tags t ON et.tid = t.tid
+                        WHERE et.eid = e.eid ORDER BY t.tag_name))
+            FROM expenses e ORDER BY e.eid""")
+
+    def test_valid_rows_are_imported(self):
+        for chunk_size in (1, 2, 100):
+            with self.subTest(chunk_size=chunk_size):
+                self.query("DELETE FROM expenses_tags")
+                self.query("DELETE FROM expenses")
+                with quiet():
+                    self.assertTrue(import_expenses(self.csv_path, chunk_size=chunk_size))
+                self.assertEqual(self.imported(), [(1050, 'lunch', 'trip,work'), (2000, 'dinner', 'trip'),
+                                                   (100, 'boom', None), (400, 'snack', None)])
+
+    def test_rows_rejected_by_the_database_are_skipped(self):
+        # Fails the chunk insert, so the chunk is retried row by row
+        self.query("""CREATE TRIGGER reject_boom BEFORE INSERT ON expenses WHEN NEW.description = 'boom'
+                      BEGIN SELECT RAISE(ABORT, 'boom rejected'); END""")
+        with quiet() as out:
+            self.assertTrue(import_expenses(self.csv_path, chunk_size=3, commit_every=1))
+        self.assertEqual([row[1] for row in self.imported()], ['lunch', 'dinner', 'snack'])
+        self.assertIn("Row 6: Error - boom rejected", out.getvalue())
+        self.assertIn("imported 3/7 expenses (4 rejected)", out.getvalue())
+        # The rollups saw exactly the imported rows
+        self.assertEqual(self.query("SELECT SUM(total), SUM(count) FROM monthly_category_totals"), [(3450, 3)])
+
+    def test_missing_file(self):
+        with quiet() as out:
+            self.assertFalse(import_expenses(self.path('missing.csv')))
+        self.assertIn("File not found", out.getvalue())
+
+
+class ImportFilesTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.login()
+        with quiet():
+            add_category('food')
+            add_payment_method('cash')
+
+    def test_files_are_imported_in_one_transaction(self):
+        first = self.path('first.csv', "amount,category,payment_method,date,tags\n"
+                                       "1,food,cash,2024-01-01,a\n"
+                                       "x,food,cash,2024-01-01,\n")
+        second = self.path('second.csv', "amount,category,payment_method,date,tags\n"
+                                         "2,food,cash,2024-01-02,a\n"
+                                         "3,rent,cash,2024-01-03,\n")
+        group = self.path('group.csv', "amount,category_name,payment_method,expense_date,expense_description\n"
+                                       "9,food,cash,2024-01-04,picnic\n")
+        progress = []
+        with quiet():
+            reports = import_files([(first, None), (self.path('missing.csv'), None), (second, None), (group, 'trip')],
+                                   workers=2, progress=lambda report, done, total: progress.append(done))
+        self.assertEqual([report.status for report in reports], ['imported', 'failed', 'imported', 'imported'])
+        self.assertEqual([(report.rows, report.imported, report.rejected) for report in reports],
+                         [(2, 1, 1), (0, 0, 0), (2, 1, 1), (1, 1, 0)])
+        self.assertEqual(len(progress), 8)
+        self.assertEqual(self.query("SELECT amount, uid FROM expenses ORDER BY eid"),
+                         [(100, current_user['uid']), (200, current_user['uid'])])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM expenses_tags"), [(2,)])
+        self.assertEqual(self.query("SELECT g.group_name, ge.amount FROM group_expenses ge "
+                                    "JOIN groups g ON ge.gid = g.gid"), [('trip', 900)])
+
+    def test_nothing_to_import(self):
+        with quiet():
+            self.assertFalse(import_files([]))
+
+
+if __name__ == '__main__':
+    unittest.main()
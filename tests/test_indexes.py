@@ -0,0 +1,35 @@
+import unittest
+
+from app.db import db_connection
+from support import DatabaseTestCase
+
+
+class IndexTest(DatabaseTestCase):
+
+    def plan(self, sql):
+        with db_connection() as conn:
+            return ' '.join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql))
+
+    def test_indexes_exist(self):
+        names = {row[0] for row in self.query("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        for name in ('idx_expenses_uid_cid_amount', 'idx_expenses_uid_pid_amount', 'idx_expenses_cid_amount',
+                     'idx_expenses_tags_tid_eid', 'idx_group_expense_tags_tid_geid',
+                     'idx_split_users_geid_uid', 'idx_user_group_gid_uid'):
+            self.assertIn(name, names)
+
+    def test_lookups_use_an_index(self):
+        cases = {
+            "SELECT SUM(amount) FROM expenses WHERE uid = 1 AND cid = 2": 'idx_expenses_uid_cid_amount',
+            "SELECT eid FROM expenses_tags WHERE tid = 1": 'idx_expenses_tags_tid_eid',
+            "SELECT geid FROM group_expense_tags WHERE tid = 1": 'idx_group_expense_tags_tid_geid',
+            "SELECT uid FROM user_group WHERE gid = 1": 'idx_user_group_gid_uid',
+        }
+        for sql, index in cases.items():
+            with self.subTest(sql=sql):
+                plan = self.plan(sql)
+                self.assertIn(index, plan)
+                self.assertNotIn("SCAN", plan.replace("COVERING INDEX", ""))
+
+
+if __name__ == '__main__':
+    unittest.main()
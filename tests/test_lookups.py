@@ -0,0 +1,69 @@
+import unittest
+
+from app.commands import add_category, add_expense, add_payment_method
+from app.db import db_connection
+from app.lookups import dimensions, normalize
+from support import DatabaseTestCase, quiet
+
+
+class DimensionCacheTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.login()
+        with quiet():
+            add_category('food')
+            add_payment_method('cash')
+
+    def test_normalize(self):
+        self.assertEqual(normalize('categories', ' Food '), 'food')
+        self.assertEqual(normalize('users', ' Admin '), 'Admin')
+        self.assertIsNone(normalize('tags', None))
+
+    def test_lookups_are_cached(self):
+        with db_connection() as conn:
+            cid = dimensions.category_id(conn, 'FOOD')
+            loads = dimensions.stats['loads']
+            self.assertEqual(dimensions.category_id(conn, 'food'), cid)
+            self.assertIsNone(dimensions.category_id(conn, 'rent'))
+        self.assertEqual(self.query("SELECT cid FROM categories WHERE category_name = 'food'"), [(cid,)])
+        # Only the miss reloaded the table
+        self.assertEqual(dimensions.stats['loads'], loads + 1)
+
+    def test_own_writes_keep_the_cache(self):
+        with quiet():
+            self.assertTrue(add_expense('10', 'food', 'cash', '2024-01-01', 'x', ['a', 'b']))
+        loads, resets = dimensions.stats['loads'], dimensions.stats['resets']
+        with quiet():
+            self.assertTrue(add_expense('20', 'food', 'cash', '2024-01-02', 'y', ['b', 'c']))
+            self.assertTrue(add_expense('30', 'food', 'cash', '2024-01-03', 'z', ['a']))
+        self.assertEqual((dimensions.stats['loads'], dimensions.stats['resets']), (loads, resets))
+
+    def test_changes_from_other_connections_drop_the_cache(self):
+        with db_connection() as conn:
+            self.assertIsNotNone(dimensions.category_id(conn, 'food'))
+        with self.other_connection() as other:
+            other.execute("DELETE FROM categories WHERE category_name = 'food'")
+        with db_connection() as conn:
+            self.assertIsNone(dimensions.category_id(conn, 'food'))
+
+    def test_tag_map_creates_missing_tags(self):
+        with db_connection() as conn:
+            tags = dimensions.tag_map(conn, ['Travel', 'work', 'travel', ''])
+            conn.commit()
+        self.assertEqual(list(tags), ['travel', 'work'])
+        self.assertEqual(dict(self.query("SELECT tag_name, tid FROM tags")), tags)
+
+    def test_rollback_forgets_created_tags(self):
+        with db_connection() as conn:
+            conn.execute("BEGIN")
+            dimensions.tag_map(conn, ['temporary'])
+            # Returned with the transaction open: the pool rolls it back
+        with db_connection() as conn:
+            tid = dimensions.tag_map(conn, ['temporary'])['temporary']
+            conn.commit()
+        self.assertEqual(self.query("SELECT tid FROM tags WHERE tag_name = 'temporary'"), [(tid,)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from app import migrations
+from app.migrations import LATEST_VERSION, get_version, migrate
+
+# The schema initialize_db created before the migrations (user_version 0)
+BASELINE_SCHEMA = """
+CREATE TABLE users (
+    uid INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    role TEXT CHECK(role IN ('Admin', 'User')) NOT NULL
+);
+CREATE TABLE categories (
+    cid INTEGER PRIMARY KEY AUTOINCREMENT,
+    category_name TEXT UNIQUE NOT NULL CHECK(category_name =LOWER(category_name))
+);
+CREATE TABLE payment_methods (
+    pid INTEGER PRIMARY KEY AUTOINCREMENT,
+    method TEXT NOT NULL
+);
+CREATE TABLE expenses (
+    eid INTEGER PRIMARY KEY AUTOINCREMENT,
+    uid INTEGER NOT NULL,
+    amount REAL NOT NULL CHECK(amount >= 0),
+    cid INTEGER NOT NULL,
+    pid INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    description TEXT,
+    FOREIGN KEY(uid) REFERENCES users(uid),
+    FOREIGN KEY(cid) REFERENCES categories(cid) ON DELETE RESTRICT,
+    FOREIGN KEY(pid) REFERENCES payment_methods(pid) ON DELETE RESTRICT
+);
+CREATE TABLE tags(
+    tid INTEGER PRIMARY KEY AUTOINCREMENT,
+    tag_name TEXT UNIQUE NOT NULL CHECK(tag_name = LOWER(tag_name))
+);
+CREATE TABLE expenses_tags (
+    tid INTEGER NOT NULL,
+    eid INTEGER NOT NULL,
+    PRIMARY KEY (eid, tid),
+    FOREIGN KEY(tid) REFERENCES tags(tid) ON DELETE RESTRICT,
+    FOREIGN KEY(eid) REFERENCES expenses(eid) ON DELETE RESTRICT
+);
+CREATE TABLE groups(
+    gid INTEGER PRIMARY KEY AUTOINCREMENT,
+    date_created TEXT NOT NULL,
+    group_name TEXT UNIQUE NOT NULL,
+    description TEXT
+);
+CREATE TABLE user_group (
+    uid INTEGER NOT NULL,
+    gid INTEGER NOT NULL,
+    PRIMARY KEY (uid, gid),
+    FOREIGN KEY(uid) REFERENCES users(uid) ON DELETE RESTRICT,
+    FOREIGN KEY(gid) REFERENCES groups(gid) ON DELETE RESTRICT
+);
+CREATE TABLE group_expenses (
+    geid INTEGER PRIMARY KEY AUTOINCREMENT,
+    uid INTEGER NOT NULL,
+    gid INTEGER NOT NULL,
+    amount REAL NOT NULL CHECK(amount >= 0),
+    cid INTEGER NOT NULL,
+    pid INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    description TEXT,
+    FOREIGN KEY(uid) REFERENCES users(uid) ON DELETE RESTRICT,
+    FOREIGN KEY(gid) REFERENCES groups(gid) ON DELETE RESTRICT,
+    FOREIGN KEY(cid) REFERENCES categories(cid) ON DELETE RESTRICT,
+    FOREIGN KEY(pid) REFERENCES payment_methods(pid) ON DELETE RESTRICT
+);
+CREATE TABLE split_users (
+    geid INTEGER NOT NULL,
+    uid INTEGER NOT NULL,
+    split_amount REAL NOT NULL CHECK(split_amount >= 0),
+    PRIMARY KEY (uid, geid),
+    FOREIGN KEY(uid) REFERENCES users(uid) ON DELETE RESTRICT,
+    FOREIGN KEY(geid) REFERENCES group_expenses(geid) ON DELETE RESTRICT
+);
+CREATE TABLE group_expense_tags(
+    tid INTEGER NOT NULL,
+    geid INTEGER NOT NULL,
+    PRIMARY KEY (geid, tid),
+    FOREIGN KEY(tid) REFERENCES tags(tid) ON DELETE RESTRICT,
+    FOREIGN KEY(geid) REFERENCES group_expenses(geid) ON DELETE RESTRICT
+);
+
+INSERT INTO users (username, password, role) VALUES ('admin', 'admin123', 'Admin'), ('bob', 'pw', 'User');
+INSERT INTO categories (category_name) VALUES ('food'), ('rent');
+INSERT INTO payment_methods (method) VALUES ('cash'), ('card');
+INSERT INTO tags (tag_name) VALUES ('work');
+INSERT INTO expenses (uid, amount, cid, pid, date, description) VALUES
+    (1, 10.1, 1, 1, '2024-01-05', 'Team lunch'),
+    (1, 0.29, 1, 2, '2024-01-20', 'Coffee'),
+    (2, 1200, 2, 2, '2024-02-01', 'Flat rent');
+INSERT INTO expenses_tags (tid, eid) VALUES (1, 1);
+INSERT INTO groups (date_created, group_name, description) VALUES ('2024-01-01', 'trip', NULL);
+INSERT INTO user_group (uid, gid) VALUES (1, 1), (2, 1);
+INSERT INTO group_expenses (uid, gid, amount, cid, pid, date, description)
+    VALUES (1, 1, 100, 1, 1, '2024-01-10', 'Dinner');
+INSERT INTO split_users (geid, uid, split_amount) VALUES (1, 1, 50.005), (1, 2, 49.99);
+"""
+
+
+class MigrationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.conn = sqlite3.connect(os.path.join(self.tmp.name, 'expenses.db'))
+        self.conn.executescript(BASELINE_SCHEMA)
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def migrate(self, *args):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            version = migrate(self.conn, *args)
+        return version, out.getvalue()
+
+    def query(self, sql, params=()):
+        return self.conn.execute(sql, params).fetchall()
+
+    def test_baseline_is_migrated_to_the_latest_version(self):
+        version, out = self.migrate()
+        self.assertEqual(version, LATEST_VERSION)
+        self.assertEqual(get_version(self.conn), LATEST_VERSION)
+        self.assertEqual(out.count("Applied migration"), LATEST_VERSION)
+        self.assertEqual(self.query("PRAGMA foreign_key_check"), [])
+
+        # The rows survive, with amounts in paise and the date keys filled in
+        self.assertEqual(self.query("SELECT eid, amount, day, month FROM expenses ORDER BY eid"),
+                         [(1, 1010, 19727, '2024-01'), (2, 29, 19742, '2024-01'), (3, 120000, 19754, '2024-02')])
+        self.assertEqual(self.query("SELECT tid, eid FROM expenses_tags"), [(1, 1)])
+        self.assertTrue(migrations._is_without_rowid(self.conn, 'expenses_tags'))
+        # Splits that missed the total by rounding add up again
+        self.assertEqual(self.query("SELECT SUM(split_amount) FROM split_users"), [(10000,)])
+
+        # The summaries are built from the existing rows
+        self.assertEqual(self.query("SELECT uid, month, cid, total, count FROM monthly_category_totals ORDER BY uid"),
+                         [(1, '2024-01', 1, 1039, 2), (2, '2024-02', 2, 120000, 1)])
+        self.assertEqual(self.query("SELECT uid, pid, total, count FROM payment_method_totals ORDER BY uid, pid"),
+                         [(1, 1, 1010, 1), (1, 2, 29, 1), (2, 2, 120000, 1)])
+        self.assertEqual(self.query("SELECT cid, count FROM category_stats ORDER BY cid"), [(1, 2), (2, 1)])
+        self.assertEqual(self.query("SELECT rowid FROM expenses_fts WHERE expenses_fts MATCH 'lunch'"), [(1,)])
+
+    def test_triggers_keep_the_summaries_current(self):
+        self.migrate()
+        self.conn.execute("UPDATE expenses SET date = '2024-02-03', pid = 1 WHERE eid = 2")
+        self.conn.execute("DELETE FROM expenses_tags")
+        self.conn.execute("DELETE FROM expenses WHERE eid = 1")
+        self.conn.commit()
+        self.assertEqual(self.query("SELECT uid, month, cid, total, count FROM monthly_category_totals ORDER BY uid"),
+                         [(1, '2024-02', 1, 29, 1), (2, '2024-02', 2, 120000, 1)])
+        self.assertEqual(self.query("SELECT uid, pid, total, count FROM payment_method_totals ORDER BY uid, pid"),
+                         [(1, 1, 29, 1), (2, 2, 120000, 1)])
+        self.assertEqual(self.query("SELECT rowid FROM expenses_fts WHERE expenses_fts MATCH 'lunch'"), [])
+
+    def test_current_database_is_left_alone(self):
+        self.migrate()
+        self.assertEqual(self.migrate(), (LATEST_VERSION, ''))
+
+    def test_migrations_can_stop_at_a_version(self):
+        self.assertEqual(self.migrate(6)[0], 6)
+        self.assertEqual(self.query("SELECT amount FROM expenses WHERE eid = 1"), [(10.1,)])
+        self.assertEqual(self.migrate()[0], LATEST_VERSION)
+        self.assertEqual(self.query("SELECT amount FROM expenses WHERE eid = 1"), [(1010,)])
+
+    def test_failed_migration_keeps_the_previous_version(self):
+        self.migrate()
+
+        def broken(conn):
+            conn.execute("CREATE TABLE half_done (x)")
+            raise sqlite3.OperationalError("broken step")
+
+        steps = migrations.MIGRATIONS + [(LATEST_VERSION + 1, "Broken", broken)]
+        with mock.patch.object(migrations, 'MIGRATIONS', steps), self.assertRaises(sqlite3.OperationalError):
+            self.migrate(LATEST_VERSION + 1)
+        self.assertEqual(get_version(self.conn), LATEST_VERSION)
+        self.assertEqual(self.query("SELECT name FROM sqlite_master WHERE name = 'half_done'"), [])
+        self.assertEqual(self.query("PRAGMA foreign_keys"), [(0,)])
+
+
+if __name__ == '__main__':
+    unittest.main()
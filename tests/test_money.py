@@ -0,0 +1,99 @@
+import csv
+import unittest
+
+from app.commands import (add_category, add_expense, add_group_expense, add_payment_method, add_user,
+                          add_user_to_group, create_group, export_csv, export_group_csv, import_group_csv)
+from app.money import Money
+from support import DatabaseTestCase, quiet
+
+
+class MoneyTest(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(Money.parse('12.5'), 1250)
+        self.assertEqual(Money.parse(' 0.285 '), 29)
+        self.assertEqual(Money.parse(0.1), 10)
+        self.assertEqual(Money.parse('1234567890123456.78'), 123456789012345678)
+        self.assertIs(type(Money.parse(3)), Money)
+        for value in ('ten', '', 'nan', 'inf', None):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                Money.parse(value)
+
+    def test_str(self):
+        self.assertEqual(str(Money(1250)), '12.50')
+        self.assertEqual(str(Money(5)), '0.05')
+        self.assertEqual(str(Money(-105)), '-1.05')
+        self.assertEqual(Money(1250).rupees, 12.5)
+
+    def test_allocate(self):
+        self.assertEqual(Money(10000).split(3), [3334, 3333, 3333])
+        self.assertEqual(Money(100).allocate([1, 1, 1, 1]), [25, 25, 25, 25])
+        self.assertEqual(Money(1000).allocate([2, 1]), [667, 333])
+        # Largest remainder wins, ties go to the earlier share
+        self.assertEqual(Money(10).allocate([3, 3, 4]), [3, 3, 4])
+        self.assertEqual(Money(5).allocate([1, 1, 1]), [2, 2, 1])
+        self.assertEqual(Money(7).allocate([0, 1]), [0, 7])
+        self.assertEqual(Money(0).split(2), [0, 0])
+        for weights in ([], [0, 0], [1, -1]):
+            with self.subTest(weights=weights), self.assertRaises(ValueError):
+                Money(100).allocate(weights)
+
+    def test_allocate_sums_to_the_total(self):
+        for amount in (1, 99, 10001, 123457):
+            for weights in ([1] * 7, [5, 3, 2], [3333, 3333, 3334], [1, 0, 2, 9]):
+                with self.subTest(amount=amount, weights=weights):
+                    shares = Money(amount).allocate(weights)
+                    self.assertEqual(sum(shares), amount)
+                    self.assertTrue(all(type(share) is Money for share in shares))
+                    # Each share is within a paisa of its exact proportion
+                    for share, weight in zip(shares, weights):
+                        self.assertLess(abs(share - amount * weight / sum(weights)), 1)
+
+
+class ExportAmountTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.login()
+        with quiet():
+            add_category('food')
+            add_payment_method('cash')
+
+    def read(self, path):
+        with open(path, newline='') as f:
+            return list(csv.DictReader(f))
+
+    def test_export_csv_amounts_are_exact(self):
+        with quiet():
+            self.assertTrue(add_expense('1234567890123456.78', 'food', 'cash', '2024-01-01', 'big', []))
+            self.assertTrue(add_expense('10.5', 'food', 'cash', '2024-01-02', 'small', []))
+            self.assertTrue(export_csv(self.path('out.csv'), 'date'))
+        self.assertEqual([row['Amount'] for row in self.read(self.path('out.csv'))],
+                         ['1234567890123456.78', '10.50'])
+
+    def test_export_group_csv_amounts_are_exact(self):
+        with quiet():
+            self.assertTrue(create_group('trip', 'weekend'))
+            for name in ('bob', 'carol'):
+                self.assertTrue(add_user(name, 'secret', 'User'))
+                self.assertTrue(add_user_to_group(name, 'trip'))
+            self.assertTrue(add_group_expense('100', 'trip', 'food', 'cash', '2024-01-01', 'dinner', [],
+                                              ['bob', 'carol']))
+            self.assertTrue(export_group_csv('trip', self.path('group.csv')))
+        [row] = self.read(self.path('group.csv'))
+        self.assertEqual(row['amount'], '100.00')
+        self.assertEqual(sorted(row['split_amounts'].split(', ')), ['33.33', '33.33', '33.34'])
+
+        # The export reads back into the same splits
+        with quiet():
+            self.assertTrue(import_group_csv('trip copy', self.path('group.csv')))
+        self.assertEqual(self.query("""
+            SELECT su.split_amount FROM split_users su
+            JOIN group_expenses ge ON su.geid = ge.geid
+            JOIN groups g ON ge.gid = g.gid
+            WHERE g.group_name = 'trip copy'
+            ORDER BY su.split_amount"""), [(3333,), (3333,), (3334,)])
+
+
+if __name__ == '__main__':
+    unittest.main()
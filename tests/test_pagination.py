@@ -0,0 +1,79 @@
+import unittest
+
+from app.commands import (add_category, add_expense, add_group_expense, add_payment_method, add_user,
+                          add_user_to_group, create_group, list_expenses, report_group_expenses)
+from support import DatabaseTestCase, quiet
+
+
+class KeysetPaginationTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.login()
+        with quiet():
+            add_category('food')
+            add_payment_method('cash')
+            # Several expenses share a day, so the id breaks the ties
+            for i, day in enumerate(['2024-01-01', '2024-01-02', '2024-01-02', '2024-01-02',
+                                     '2024-01-03', '2024-01-04', '2024-01-04']):
+                self.assertTrue(add_expense(str(i + 1), 'food', 'cash', day, f'e{i}', ['work'] if i % 2 else []))
+
+    def walk(self, fetch, page_size):
+        # Every page from the first, then back again from the last
+        pages = [fetch(page_size, None)]
+        while pages[-1].next_cursor:
+            pages.append(fetch(page_size, pages[-1].next_cursor))
+        backwards = [pages[-1]]
+        while backwards[-1].prev_cursor:
+            backwards.append(fetch(page_size, backwards[-1].prev_cursor))
+        return pages, backwards[::-1]
+
+    def test_pages_cover_the_listing_in_order(self):
+        everything = list_expenses().column('eid')
+        for page_size in (1, 2, 3, 7, 10):
+            with self.subTest(page_size=page_size):
+                pages, backwards = self.walk(lambda size, cursor: list_expenses(None, size, cursor), page_size)
+                self.assertEqual([eid for page in pages for eid in page.column('eid')], everything)
+                self.assertEqual([page.rows for page in backwards], [page.rows for page in pages])
+                self.assertIsNone(pages[0].prev_cursor)
+                self.assertTrue(all(len(page) == page_size for page in pages[:-1]))
+
+    def test_filters_apply_to_every_page(self):
+        everything = list_expenses({'tags': 'work'}).column('eid')
+        pages, _ = self.walk(lambda size, cursor: list_expenses({'tags': 'work'}, size, cursor), 2)
+        self.assertEqual([eid for page in pages for eid in page.column('eid')], everything)
+        self.assertEqual(len(everything), 3)
+
+    def test_cursor_is_stable_across_inserts(self):
+        first = list_expenses(None, 3)
+        with quiet():
+            # Newer than every listed row: must not shift the next page
+            self.assertTrue(add_expense('99', 'food', 'cash', '2024-02-01', 'new', []))
+        second = list_expenses(None, 3, first.next_cursor)
+        self.assertEqual(second.column('eid'), list_expenses().column('eid')[4:7])
+        self.assertNotIn('new', second.column('description'))
+
+    def test_empty_listing_has_no_cursors(self):
+        page = list_expenses({'category': 'rent'}, 5)
+        self.assertEqual((page.rows, page.next_cursor, page.prev_cursor), ([], None, None))
+
+    def test_invalid_cursor(self):
+        for cursor in ('garbage', 'WyJzaWRld2F5cyIsMSwxXQ'):
+            with self.subTest(cursor=cursor), quiet():
+                self.assertFalse(list_expenses(None, 2, cursor))
+
+    def test_group_expenses_pages(self):
+        with quiet():
+            self.assertTrue(create_group('trip', 'weekend'))
+            self.assertTrue(add_user('bob', 'secret', 'User'))
+            self.assertTrue(add_user_to_group('bob', 'trip'))
+            for i in range(5):
+                self.assertTrue(add_group_expense(str(10 + i), 'trip', 'food', 'cash', f'2024-03-0{i % 2 + 1}',
+                                                  f'g{i}', [], ['bob']))
+        pages, backwards = self.walk(lambda size, cursor: report_group_expenses('trip', None, size, cursor), 2)
+        self.assertEqual([page.column('description') for page in pages], [['g3', 'g1'], ['g4', 'g2'], ['g0']])
+        self.assertEqual([page.rows for page in backwards], [page.rows for page in pages])
+
+
+if __name__ == '__main__':
+    unittest.main()
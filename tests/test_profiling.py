@@ -0,0 +1,112 @@
+import logging
+import os
+import unittest
+from unittest import mock
+
+from app import cli, profiler as profiler_module
+from app.commands import add_category, add_expense, add_payment_method, list_expenses
+from app.db import db_connection
+from app.profiler import profiler
+from app.slowlog import SlowQueryLog, full_scans
+from support import DatabaseTestCase, quiet
+
+
+class ProfilerTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.login()
+        with quiet():
+            add_category('food')
+            add_payment_method('cash')
+            for day in ('2024-01-01', '2024-01-02', '2024-01-03'):
+                self.assertTrue(add_expense('10', 'food', 'cash', day, 'x', ['a']))
+        profiler.reset()
+        profiler.enable()
+
+    def tearDown(self):
+        profiler.disable()
+        profiler.reset()
+        super().tearDown()
+
+    def test_command_profile(self):
+        with profiler.command('list_expenses') as profile:
+            self.assertEqual(len(list_expenses()), 3)
+        self.assertEqual(profile.borrows, 1)
+        self.assertEqual(profile.rows, 3)
+        self.assertGreater(profile.statements, 0)
+        self.assertGreater(profile.wall, 0)
+        self.assertLessEqual(profile.sql_time, profile.wall)
+        [(sql, (executions, _, rows))] = profile.top_statements()
+        self.assertIn("FROM expenses e", sql)
+        self.assertEqual((executions, rows), (1, 3))
+
+    def test_cli_profiles_commands(self):
+        with quiet() as out:
+            self.assertTrue(cli.process_command("list_expenses"))
+            self.assertTrue(cli.process_command("report frequent_category"))
+            self.assertTrue(cli.process_command("stats"))
+        self.assertEqual(out.getvalue().count("[profile]"), 2)
+        names = [row[0] for row in profiler.summary()]
+        self.assertEqual(names, ['list_expenses', 'report frequent_category', 'all'])
+        self.assertEqual(profiler.summary()[-1][1], 2)
+
+    def test_nothing_is_recorded_outside_a_command(self):
+        list_expenses()
+        self.assertEqual(list(profiler.history), [])
+
+
+class SlowQueryLogTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # A log of our own, in the temp directory
+        self.logger = logging.getLogger('expenses.slow_queries')
+        self.saved_handlers, self.logger.handlers = self.logger.handlers, []
+        self.log = SlowQueryLog(dict(profiler_module.slow_log.config, enabled=False,
+                                     log_path=self.path('slow.log')))
+        patcher = mock.patch.object(profiler_module, 'slow_log', self.log)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        for handler in self.logger.handlers:
+            handler.close()
+        self.logger.handlers = self.saved_handlers
+        super().tearDown()
+
+    def test_full_scans(self):
+        self.assertEqual(full_scans(['SCAN e', 'SEARCH c USING INTEGER PRIMARY KEY (rowid=?)',
+                                     'SCAN expenses USING COVERING INDEX idx_expenses_uid_day',
+                                     'SCAN json_each VIRTUAL TABLE INDEX 1:', 'SCAN (subquery-1)']),
+                         ['e', 'expenses (idx_expenses_uid_day)'])
+
+    def test_slow_statements_are_logged_with_their_plan(self):
+        self.log.enable(0)
+        with db_connection() as conn:
+            conn.execute("SELECT * FROM expenses WHERE description = ?", ('secret',)).fetchall()
+            conn.execute("SELECT * FROM expenses WHERE eid = ?", (1,)).fetchall()
+        self.log.disable()
+        entries = {entry['sql']: entry for entry in self.log.entries()}
+
+        scan = entries["SELECT * FROM expenses WHERE description = ?"]
+        self.assertEqual((scan['params'], scan['full_scans']), (['str'], ['expenses']))
+        self.assertEqual(entries["SELECT * FROM expenses WHERE eid = ?"]['full_scans'], [])
+        # Parameter values never reach the file
+        with open(self.log.path) as f:
+            self.assertNotIn('secret', f.read())
+
+        rows, slow_count = self.log.summary()
+        self.assertEqual(slow_count, len(entries))
+        self.assertEqual([row[0] for row in rows], ["SELECT * FROM expenses WHERE description = ?"])
+
+    def test_fast_statements_are_not_logged(self):
+        self.log.enable(60000)
+        with db_connection() as conn:
+            conn.execute("SELECT * FROM expenses").fetchall()
+        self.assertEqual(list(self.log.entries()), [])
+        self.assertFalse(os.path.getsize(self.log.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import importlib.util
+import unittest
+
+from support import DatabaseTestCase, quiet
+
+HAS_STREAMLIT = all(importlib.util.find_spec(name) for name in ('streamlit', 'pandas'))
+if HAS_STREAMLIT:
+    from app import streamlit_app
+
+
+@unittest.skipUnless(HAS_STREAMLIT, "streamlit and pandas are not installed")
+class QueryCacheTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.login()
+        self.cache = streamlit_app.QueryCache()
+        self.loads = 0
+
+    def load(self, value='rows'):
+        def load():
+            self.loads += 1
+            return value
+        return load
+
+    def test_hits_and_group_invalidation(self):
+        self.assertEqual(self.cache.get('a', ('expenses',), self.load()), 'rows')
+        self.assertEqual(self.cache.get('a', ('expenses',), self.load()), 'rows')
+        self.cache.get('b', ('tags',), self.load())
+        self.assertEqual(self.cache.stats, {'hits': 1, 'misses': 2})
+
+        self.cache.invalidate('expenses')
+        self.cache.get('a', ('expenses',), self.load())
+        self.cache.get('b', ('tags',), self.load())
+        self.assertEqual(self.loads, 3)
+
+    def test_failures_are_not_cached(self):
+        self.cache.get('a', ('expenses',), self.load(False))
+        self.cache.get('a', ('expenses',), self.load(False))
+        self.assertEqual(self.loads, 2)
+
+    def test_commits_from_other_connections_clear_the_cache(self):
+        self.cache.get('a', ('categories',), self.load())
+        with self.other_connection() as conn:
+            conn.execute("INSERT INTO categories (category_name) VALUES ('food')")
+            conn.commit()
+        self.cache.get('a', ('categories',), self.load())
+        self.assertEqual(self.loads, 2)
+
+    def test_wrapped_commands(self):
+        with quiet():
+            self.assertTrue(streamlit_app.add_category('food'))
+        self.assertIn('food', [row[0] for row in streamlit_app.list_categories()])
+        hits = streamlit_app.query_cache.stats['hits']
+        streamlit_app.list_categories()
+        self.assertEqual(streamlit_app.query_cache.stats['hits'], hits + 1)
+        with quiet():
+            self.assertTrue(streamlit_app.add_category('rent'))
+        self.assertIn('rent', [row[0] for row in streamlit_app.list_categories()])
+
+
+if __name__ == '__main__':
+    unittest.main()
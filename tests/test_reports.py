@@ -0,0 +1,186 @@
+import statistics
+import unittest
+
+from app.commands import (add_category, add_expense, dashboard_summary, add_payment_method, add_user, delete_expense,
+                          report_above_average_expenses, report_category_spending, report_frequent_category,
+                          report_highest_spender_per_month, report_monthly_category_spending,
+                          rebuild_rollups, report_payment_method_usage, report_tag_expenses, report_top_expenses,
+                          update_expense)
+from support import DatabaseTestCase, quiet
+
+
+class RollupReportTest(DatabaseTestCase):
+    """The reports read the rollups; they must agree with the expenses table."""
+
+    def setUp(self):
+        super().setUp()
+        self.login()
+        with quiet():
+            for name in ('food', 'rent'):
+                add_category(name)
+            for method in ('cash', 'card'):
+                add_payment_method(method)
+            self.assertTrue(add_expense('10.50', 'food', 'cash', '2024-01-05', 'lunch', ['work']))
+            self.assertTrue(add_expense('200', 'rent', 'card', '2024-01-31', 'flat', ['home']))
+            self.assertTrue(add_expense('7.25', 'food', 'card', '2024-02-01', 'snack', ['work', 'home']))
+        self.eids = [eid for eid, in self.query("SELECT eid FROM expenses ORDER BY eid")]
+
+    def update(self, eid, field, value):
+        with quiet():
+            self.assertTrue(update_expense(eid, field, value))
+
+    def assertReportsMatchExpenses(self):
+        self.assertEqual(sorted(report_payment_method_usage()), self.query("""
+            SELECT p.method, SUM(e.amount) / 100.0, COUNT(*)
+            FROM expenses e JOIN payment_methods p ON e.pid = p.pid
+            GROUP BY p.method ORDER BY p.method"""))
+        self.assertEqual(sorted(report_monthly_category_spending()), self.query("""
+            SELECT substr(e.date, 1, 7), c.category_name, SUM(e.amount) / 100.0, COUNT(*)
+            FROM expenses e JOIN categories c ON e.cid = c.cid
+            GROUP BY 1, 2 ORDER BY 1, 2"""))
+        self.assertEqual(sorted(report_tag_expenses()), self.query("""
+            SELECT t.tag_name, COUNT(*)
+            FROM expenses_tags et JOIN tags t ON et.tid = t.tid
+            GROUP BY t.tag_name ORDER BY t.tag_name"""))
+        for category in ('food', 'rent'):
+            self.assertEqual(list(report_category_spending(category)), self.query("""
+                SELECT c.category_name, SUM(e.amount) / 100.0
+                FROM expenses e JOIN categories c ON e.cid = c.cid
+                WHERE c.category_name = ? GROUP BY c.category_name""", (category,)))
+
+    def test_reports(self):
+        self.assertReportsMatchExpenses()
+        self.assertEqual(list(report_frequent_category()), [('food', 2)])
+        self.assertEqual(report_top_expenses(1, '2024-01-01', '2024-12-31').column('amount'), [200.0])
+        self.assertEqual(list(report_highest_spender_per_month()),
+                         [('2024-02', 'admin', 7.25), ('2024-01', 'admin', 210.5)])
+
+    def test_edits_show_up_immediately(self):
+        first, second, third = self.eids
+        self.update(first, 'payment_method', 'card')
+        self.update(second, 'date', '2024-02-10')
+        self.update(third, 'category', 'rent')
+        self.update(third, 'tags', ['home'])
+        self.update(first, 'amount', '11')
+        self.assertReportsMatchExpenses()
+        self.assertEqual(list(report_payment_method_usage()), [('card', 218.25, 3)])
+        self.assertEqual(list(report_frequent_category()), [('rent', 2)])
+
+        with quiet():
+            self.assertTrue(delete_expense(second))
+        self.assertReportsMatchExpenses()
+        self.assertEqual(sorted(report_frequent_category()), [('food', 1), ('rent', 1)])
+
+    def test_reports_are_per_user(self):
+        with quiet():
+            self.assertTrue(add_user('bob', 'secret', 'User'))
+        self.login('bob', 'secret')
+        with quiet():
+            self.assertTrue(add_expense('1', 'food', 'cash', '2024-01-01', 'tea', []))
+        self.assertEqual(list(report_payment_method_usage()), [('cash', 1.0, 1)])
+        self.assertEqual(list(report_category_spending('rent')), [])
+        with quiet():
+            self.assertFalse(report_highest_spender_per_month())
+
+    def test_rebuild_rollups(self):
+        # Summary rows lost or damaged outside the triggers are recomputed
+        with self.other_connection() as conn:
+            conn.execute("DELETE FROM monthly_category_totals")
+            conn.execute("UPDATE payment_method_totals SET total = 0, count = 99")
+            conn.commit()
+        with quiet():
+            self.assertTrue(rebuild_rollups())
+        self.assertReportsMatchExpenses()
+
+        with quiet():
+            self.assertTrue(add_user('bob', 'secret', 'User'))
+        self.login('bob', 'secret')
+        with quiet():
+            self.assertFalse(rebuild_rollups())
+
+
+class AboveAverageTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.login()
+        with quiet():
+            add_category('food')
+            add_payment_method('cash')
+            self.assertTrue(add_user('bob', 'secret', 'User'))
+            for amount in ('10', '20', '90'):
+                self.assertTrue(add_expense(amount, 'food', 'cash', '2024-01-01', amount, []))
+        self.login('bob', 'secret')
+        with quiet():
+            self.assertTrue(add_expense('40', 'food', 'cash', '2024-01-01', 'bob', []))
+        self.login()
+
+    def test_average_is_over_every_user(self):
+        result = report_above_average_expenses()
+        self.assertEqual(result.column('amount'), [90.0])
+        self.assertEqual(result.column('category_avg'), [40.0])
+
+    def test_z_score(self):
+        z_score = round((90 - 40) / statistics.pstdev([10, 20, 90, 40]), 2)
+        result = report_above_average_expenses(1.5)
+        self.assertEqual(list(zip(result.column('amount'), result.column('z_score'))), [(90.0, z_score)])
+        self.assertEqual(len(report_above_average_expenses(2)), 0)
+        with quiet():
+            self.assertFalse(report_above_average_expenses(-1))
+
+    def test_statistics_follow_edits(self):
+        eid = report_above_average_expenses().column('eid')[0]
+        with quiet():
+            self.assertTrue(update_expense(eid, 'amount', '30'))
+        # Average now 25: 30 and bob's 40 are above it, only 30 is ours
+        self.assertEqual(report_above_average_expenses().column('amount'), [30.0])
+        self.assertEqual(report_above_average_expenses().column('category_avg'), [25.0])
+        with quiet():
+            self.assertTrue(delete_expense(eid))
+        # 10, 20 and 40 left: average 23.33
+        self.assertEqual(len(report_above_average_expenses()), 0)
+
+
+class DashboardTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.login()
+        with quiet():
+            for name in ('food', 'rent'):
+                add_category(name)
+            for method in ('cash', 'card'):
+                add_payment_method(method)
+
+    def add(self, amount, category, method, date):
+        with quiet():
+            self.assertTrue(add_expense(amount, category, method, date, f'{category} {date}', []))
+
+    def test_summary(self):
+        self.add('10', 'food', 'cash', '2024-01-10')
+        self.add('500', 'rent', 'card', '2024-01-31')
+        self.add('20.50', 'food', 'card', '2024-02-03')
+        self.add('5', 'food', 'card', '2024-02-10')
+        summary = dashboard_summary(today='2024-02-15', recent=2)
+        self.assertEqual(summary['count'], 4)
+        self.assertEqual(summary['top_category'], ('food', 3))
+        self.assertEqual(summary['top_payment_method'], ('card', 3))
+        self.assertEqual((summary['this_month'], summary['last_month']), (25.5, 510.0))
+        self.assertEqual(summary['category_totals'], [('rent', 500.0), ('food', 35.5)])
+        self.assertEqual(summary['monthly_totals'], [('2024-01', 510.0), ('2024-02', 25.5)])
+        self.assertEqual(summary['recent'].column('date'), ['2024-02-10', '2024-02-03'])
+
+    def test_month_boundaries(self):
+        self.add('10', 'food', 'cash', '2024-12-31')
+        self.add('20', 'food', 'cash', '2025-01-01')
+        summary = dashboard_summary(today='2025-01-01')
+        self.assertEqual((summary['this_month'], summary['last_month']), (20.0, 10.0))
+
+    def test_no_expenses(self):
+        summary = dashboard_summary(today='2024-02-15')
+        self.assertEqual((summary['count'], summary['top_category'], summary['top_payment_method']), (0, None, None))
+        self.assertEqual((summary['this_month'], summary['category_totals'], len(summary['recent'])), (0, [], 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import sqlite3
+import unittest
+
+from app.results import Column, Page, Result
+from support import quiet
+
+COLUMNS = [Column('name', 'Name', 6), Column('total', 'Total', 8, 'money'), Column('note', 'Note', 5)]
+
+
+class ResultTest(unittest.TestCase):
+
+    def render(self, result):
+        with quiet() as out:
+            result.render()
+        return out.getvalue()
+
+    def test_from_cursor(self):
+        conn = sqlite3.connect(':memory:')
+        conn.row_factory = sqlite3.Row
+        result = Result.from_cursor("Totals", COLUMNS, conn.execute("SELECT 'food', 12.5, NULL UNION ALL "
+                                                                    "SELECT 'rent', 100, 'x'"))
+        self.assertEqual(result.rows, [('food', 12.5, None), ('rent', 100, 'x')])
+        self.assertEqual(result.keys, ['name', 'total', 'note'])
+        self.assertEqual(result.labels, ['Name', 'Total', 'Note'])
+        self.assertEqual(result.column('total'), [12.5, 100])
+        self.assertEqual(result.records()[1], {'name': 'rent', 'total': 100, 'note': 'x'})
+        self.assertTrue(result)
+        self.assertEqual(len(result), 2)
+        self.assertEqual(list(result), result.rows)
+
+    def test_render(self):
+        output = self.render(Result("Totals", COLUMNS, [('food', 12.5, None), ('rent', 100, '')]))
+        self.assertEqual(output.splitlines(), [
+            '', 'Totals:',
+            'Name   Total    Note ',
+            '---------------------',
+            'food   ₹12.50   -    ',
+            'rent   ₹100.00  -    ',
+            '',
+        ])
+
+    def test_empty_result(self):
+        result = Result("Totals", COLUMNS, [], "Nothing here")
+        self.assertFalse(result)
+        self.assertEqual(self.render(result), "Nothing here\n")
+
+    def test_page_links(self):
+        rows = [('food', 1, None)]
+        self.assertTrue(self.render(Page(None, COLUMNS, rows, next_cursor='n')).endswith(
+            "1 rows shown. More: next\n"))
+        self.assertTrue(self.render(Page(None, COLUMNS, rows, next_cursor='n', prev_cursor='p')).endswith(
+            "1 rows shown. More: prev, next\n"))
+        self.assertNotIn("More", self.render(Page(None, COLUMNS, rows)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+
+from app.db import db_connection
+from app.script import run_script
+from support import DatabaseTestCase, quiet
+
+GROUP_CSV = """amount,category_name,payment_method,expense_date,description
+100,Food,Cash,2024-01-05,lunch
+"""
+
+EXPENSES_CSV = """amount,category,payment_method,date,description,tags
+12.50,food,cash,2024-01-05,lunch,"work,meals"
+7.25,food,cash,2024-01-06,coffee,
+"""
+
+
+class ScriptTransactionTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.csv_path = self.path('group.csv', GROUP_CSV)
+
+    def run_lines(self, *lines, **options):
+        with quiet():
+            return run_script(lines, **options)
+
+    def group_count(self):
+        return self.query("SELECT COUNT(*) FROM groups WHERE group_name = 'newgrp'")[0][0]
+
+    def test_import_group_csv_is_rolled_back_with_the_transaction(self):
+        summary = self.run_lines(
+            "login admin admin123",
+            f"import_group_csv newgrp {self.csv_path}",
+            "add_expense abc Food Cash 2024-01-01 x",
+            transaction=True)
+
+        self.assertEqual(summary.failed, 1)
+        self.assertEqual(summary.stopped_at, 3)
+        self.assertTrue(summary.rolled_back)
+        self.assertEqual(self.group_count(), 0)
+
+    def test_import_group_csv_is_committed_with_the_script(self):
+        summary = self.run_lines(
+            "login admin admin123",
+            f"import_group_csv newgrp {self.csv_path}",
+            "add_expense 12.50 Food Cash 2024-01-01 x",
+            transaction=True)
+
+        self.assertEqual(summary.failed, 0)
+        self.assertFalse(summary.rolled_back)
+        self.assertEqual(self.group_count(), 1)
+
+    def test_add_expense_amount_is_exact(self):
+        summary = self.run_lines(
+            "login admin admin123",
+            "add_category food",
+            "add_payment_method cash",
+            "add_expense 1234567890123456.78 food cash 2024-01-01 x",
+            "add_expense nan food cash 2024-01-01 x",
+            continue_on_error=True)
+
+        self.assertEqual(summary.failed, 1)
+        self.assertEqual(self.query("SELECT amount FROM expenses"), [(123456789012345678,)])
+
+    def test_import_expenses_runs_in_a_script(self):
+        csv_path = self.path('expenses.csv', EXPENSES_CSV)
+        summary = self.run_lines(
+            "login admin admin123",
+            "add_category food",
+            "add_payment_method cash",
+            f"import_expenses {csv_path}",
+            transaction=True)
+
+        self.assertEqual(summary.failed, 0)
+        self.assertEqual(self.query("SELECT amount FROM expenses ORDER BY amount"), [(725,), (1250,)])
+
+    def test_failed_cli_command_stops_and_rolls_back(self):
+        summary = self.run_lines(
+            "login admin admin123",
+            "add_category food",
+            "list_expenses",
+            "report monthly_totals",
+            "update_expense 999 amount 10",
+            "add_payment_method cash",
+            transaction=True)
+
+        self.assertEqual(summary.failed, 1)
+        self.assertEqual(summary.stopped_at, 5)
+        self.assertTrue(summary.rolled_back)
+        self.assertEqual(self.query("SELECT cid FROM categories WHERE category_name = 'food'"), [])
+
+    def test_failed_cli_commands_are_counted(self):
+        summary = self.run_lines(
+            "login admin admin123",
+            "delete_expense 999",
+            "add_category",
+            "no_such_command",
+            "add_category food",
+            continue_on_error=True)
+
+        self.assertEqual(summary.failed, 3)
+        self.assertEqual(summary.commands, 5)
+
+    def test_transaction_statements_are_deferred_in_a_batch(self):
+        with db_connection() as conn:
+            conn.begin_batch()
+            conn.begin_command()
+            conn.execute("INSERT INTO groups (group_name, description, date_created) "
+                         "VALUES ('newgrp', '', date('now'))")
+            conn.execute("COMMIT")
+            conn.end_command(True)
+            conn.begin_command()
+            conn.execute("DELETE FROM groups WHERE group_name = 'newgrp'")
+            conn.execute("ROLLBACK")
+            conn.end_command(True)
+            self.assertTrue(conn.in_transaction)
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM groups "
+                                          "WHERE group_name = 'newgrp'").fetchone()[0], 1)
+            conn.end_batch(commit=False)
+        self.assertEqual(self.group_count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+
+from app.commands import (add_category, add_expense, add_group_expense, add_payment_method, add_user,
+                          add_user_to_group, create_group, delete_expense, rebuild_rollups,
+                          search_expenses, search_group_expenses, update_expense)
+from app.filters import fts_query
+from support import DatabaseTestCase, quiet
+
+
+class FtsQueryTest(unittest.TestCase):
+
+    def test_words_are_quoted(self):
+        self.assertEqual(fts_query('team lunch'), '"team" "lunch"')
+        self.assertEqual(fts_query('lun*'), '"lun"*')
+        # FTS5 syntax is searched for as plain text
+        self.assertEqual(fts_query('a OR "b" NEAR(c)'), '"a" "OR" "b" "NEAR(c)"')
+        self.assertIsNone(fts_query(' * - '))
+
+
+class SearchTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.login()
+        with quiet():
+            add_category('food')
+            add_payment_method('cash')
+            self.assertTrue(add_expense('10', 'food', 'cash', '2024-01-05', 'Team lunch at the café', []))
+            self.assertTrue(add_expense('20', 'food', 'cash', '2024-01-06', 'Lunch lunch lunch', []))
+            self.assertTrue(add_expense('30', 'food', 'cash', '2024-01-07', 'Dinner', []))
+
+    def search(self, text):
+        result = search_expenses(text)
+        self.assertIsNot(result, False)
+        return result.column('description')
+
+    def test_search(self):
+        # Best match first, matching words highlighted
+        self.assertEqual(self.search('LUNCH'), ['[Lunch] [lunch] [lunch]', 'Team [lunch] at the café'])
+        self.assertEqual(self.search('team lunch'), ['[Team] [lunch] at the café'])
+        self.assertEqual(self.search('din*'), ['[Dinner]'])
+        # Diacritics are folded
+        self.assertEqual(self.search('cafe'), ['Team lunch at the [café]'])
+        self.assertEqual(self.search('breakfast'), [])
+        with quiet():
+            self.assertFalse(search_expenses('***'))
+
+    def test_index_follows_writes(self):
+        eid = search_expenses('dinner').column('eid')[0]
+        with quiet():
+            self.assertTrue(update_expense(eid, 'description', 'Late supper'))
+        self.assertEqual(self.search('dinner'), [])
+        self.assertEqual(self.search('supper'), ['Late [supper]'])
+        with quiet():
+            self.assertTrue(delete_expense(eid))
+        self.assertEqual(self.search('supper'), [])
+
+    def test_only_own_expenses(self):
+        with quiet():
+            self.assertTrue(add_user('bob', 'secret', 'User'))
+        self.login('bob', 'secret')
+        with quiet():
+            self.assertTrue(add_expense('5', 'food', 'cash', '2024-01-08', 'Lunch with admin', []))
+        self.assertEqual(self.search('lunch'), ['[Lunch] with admin'])
+
+    def test_rebuild_keeps_the_index(self):
+        with quiet():
+            self.assertTrue(rebuild_rollups())
+        self.assertEqual(len(self.search('lunch')), 2)
+
+    def test_group_search(self):
+        with quiet():
+            self.assertTrue(create_group('trip', 'weekend'))
+            self.assertTrue(add_user('bob', 'secret', 'User'))
+            self.assertTrue(add_user_to_group('bob', 'trip'))
+            self.assertTrue(add_group_expense('90', 'trip', 'food', 'cash', '2024-01-05', 'Picnic lunch', [], ['bob']))
+        self.assertEqual(search_group_expenses('trip', 'lunch').column('description'), ['Picnic [lunch]'])
+        self.assertEqual(len(search_group_expenses('trip', 'dinner')), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+
+from app.commands import (add_category, add_expense, add_payment_method, current_user, delete_expense,
+                          import_expenses, update_expense)
+from app.db import db_connection
+from app.lookups import dimensions
+from app.tag_index import tag_index
+from support import DatabaseTestCase, quiet
+
+
+class TagIndexTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.login()
+        self.uid = current_user['uid']
+        with quiet():
+            add_category('food')
+            add_payment_method('cash')
+        self.eids = [self.add('10', ['a', 'b']), self.add('20', ['b']), self.add('30', ['a', 'c'])]
+
+    def add(self, amount, tags):
+        with quiet():
+            self.assertTrue(add_expense(amount, 'food', 'cash', '2024-01-01', 'x', tags))
+        with db_connection() as conn:
+            return conn.execute("SELECT MAX(eid) FROM expenses").fetchone()[0]
+
+    def match(self, tags, match_all=True):
+        with db_connection() as conn:
+            return tag_index.match(conn, self.uid, dimensions.tag_ids(conn, tags), match_all)
+
+    def test_match(self):
+        first, second, third = self.eids
+        self.assertEqual(self.match(['a', 'b']), [first])
+        self.assertEqual(self.match(['b', 'c'], match_all=False), [first, second, third])
+        self.assertEqual(self.match(['a']), [first, third])
+        self.assertEqual(self.match([]), [])
+
+    def test_writes_update_the_lists(self):
+        first, second, third = self.eids
+        self.match(['a'])
+        builds = tag_index.stats['builds']
+
+        fourth = self.add('40', ['a'])
+        with quiet():
+            self.assertTrue(update_expense(second, 'tags', ['a', 'c']))
+            self.assertTrue(delete_expense(first))
+
+        self.assertEqual(self.match(['a']), [second, third, fourth])
+        self.assertEqual(self.match(['b']), [])
+        self.assertEqual(self.match(['a', 'c']), [second, third])
+        self.assertEqual(tag_index.stats['builds'], builds)
+
+    def test_imports_update_the_lists(self):
+        self.match(['a'])
+        builds = tag_index.stats['builds']
+        csv_path = self.path('expenses.csv', "amount,category,payment_method,date,tags\n"
+                                             "5,food,cash,2024-02-01,\"a,d\"\n"
+                                             "6,food,cash,2024-02-02,d\n")
+        with quiet():
+            self.assertTrue(import_expenses(csv_path))
+
+        imported = [eid for eid, in self.query("SELECT eid FROM expenses WHERE amount IN (500, 600) ORDER BY eid")]
+        self.assertEqual(self.match(['d']), imported)
+        self.assertEqual(self.match(['a', 'd']), imported[:1])
+        self.assertEqual(tag_index.stats['builds'], builds)
+
+    def test_batch_sees_its_own_writes(self):
+        with db_connection() as conn:
+            conn.begin_batch()
+            try:
+                conn.begin_command()
+                self.match(['c'])
+                fourth = self.add('40', ['c'])
+                conn.end_command(True)
+                self.assertEqual(self.match(['c']), [self.eids[2], fourth])
+            finally:
+                conn.end_batch(commit=False)
+        # The rollback dropped the index along with the expense
+        self.assertEqual(self.match(['c']), [self.eids[2]])
+
+    def test_other_connections_rebuild_the_lists(self):
+        first, second, third = self.eids
+        self.match(['c'])
+        builds = tag_index.stats['builds']
+        with self.other_connection() as other:
+            other.execute("INSERT INTO expenses_tags (eid, tid) SELECT ?, tid FROM tags WHERE tag_name = 'c'",
+                          (first,))
+        self.assertEqual(self.match(['c']), [first, third])
+        self.assertEqual(tag_index.stats['builds'], builds + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()